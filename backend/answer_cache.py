@@ -0,0 +1,168 @@
+import os
+import uuid
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+try:
+    from backend.db import AnswerCacheEntry
+except Exception:
+    from db import AnswerCacheEntry
+
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "1") not in ("0", "false", "False")
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "1000"))
+# Cosine similarity a new question needs to an earlier one (with identical context) to reuse its answer.
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+# Also keep entries in the answer_cache table so they survive restarts and are shared across workers.
+ANSWER_CACHE_PERSIST = os.getenv("ANSWER_CACHE_PERSIST", "0") in ("1", "true", "True")
+
+
+def context_key(context_text: str) -> str:
+    return hashlib.sha256(context_text.encode("utf-8")).hexdigest()
+
+
+def _unit(vec):
+    vec = np.asarray(vec, dtype=np.float32).ravel()
+    norm = np.linalg.norm(vec)
+    return vec / norm if norm else vec
+
+
+class SemanticAnswerCache:
+    """LLM answers keyed by (retrieved context, query embedding), matched by cosine similarity.
+
+    A lookup only considers answers generated from exactly the same context
+    text, so a near-identical question with different retrieved chunks always
+    goes to the LLM. Entries are tied to the KB version they were produced
+    under; the first lookup/store with a new version drops everything older.
+    With no KB loaded (``kb_version`` None) the cache is bypassed entirely.
+    """
+
+    def __init__(self, maxsize: int = ANSWER_CACHE_SIZE, threshold: float = ANSWER_CACHE_THRESHOLD, session_factory=None):
+        self.maxsize = maxsize
+        self.threshold = threshold
+        self.session_factory = session_factory
+        self.kb_version = None
+        self._entries = OrderedDict()  # entry_key -> (context_key, unit vector, answer)
+        self._by_context = {}  # context_key -> set of entry_keys
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _add(self, key, ctx, vec, answer):
+        self._entries[key] = (ctx, vec, answer)
+        self._by_context.setdefault(ctx, set()).add(key)
+        evicted = []
+        while len(self._entries) > self.maxsize:
+            old_key, (old_ctx, _, _) = self._entries.popitem(last=False)
+            self._by_context[old_ctx].discard(old_key)
+            if not self._by_context[old_ctx]:
+                del self._by_context[old_ctx]
+            evicted.append(old_key)
+        self.evictions += len(evicted)
+        return evicted
+
+    def _sync_version(self, kb_version):
+        """Drop entries from another KB version and (re)load persisted ones for this version. Holds the lock."""
+        if kb_version == self.kb_version:
+            return
+        self._entries.clear()
+        self._by_context.clear()
+        self.kb_version = kb_version
+        if not self.session_factory:
+            return
+        db = self.session_factory()
+        try:
+            db.query(AnswerCacheEntry).filter(AnswerCacheEntry.kb_version != kb_version).delete()
+            db.commit()
+            rows = (
+                db.query(AnswerCacheEntry)
+                .filter(AnswerCacheEntry.kb_version == kb_version)
+                .order_by(AnswerCacheEntry.id.desc())
+                .limit(self.maxsize)
+                .all()
+            )
+            for row in reversed(rows):
+                vec = np.frombuffer(row.embedding, dtype=np.float32)
+                self._add(row.entry_key, row.context_key, vec, row.answer)
+        finally:
+            db.close()
+
+    def lookup(self, query_vec, context_text: str, kb_version):
+        """Return a cached answer for this query/context, or None."""
+        if kb_version is None:
+            return None
+        q = _unit(query_vec)
+        ctx = context_key(context_text)
+        with self._lock:
+            self._sync_version(kb_version)
+            keys = list(self._by_context.get(ctx, ()))
+            if keys:
+                sims = np.vstack([self._entries[k][1] for k in keys]) @ q
+                best = int(np.argmax(sims))
+                if sims[best] >= self.threshold:
+                    self._entries.move_to_end(keys[best])
+                    self.hits += 1
+                    return self._entries[keys[best]][2]
+            self.misses += 1
+            return None
+
+    def store(self, query_vec, context_text: str, kb_version, answer: str, question: str = None):
+        if kb_version is None:
+            # Not tied to any KB, and syncing to None would delete every persisted entry.
+            return
+        vec = _unit(query_vec)
+        ctx = context_key(context_text)
+        key = uuid.uuid4().hex
+        with self._lock:
+            self._sync_version(kb_version)
+            evicted = self._add(key, ctx, vec, answer)
+            if not self.session_factory:
+                return
+            db = self.session_factory()
+            try:
+                db.add(AnswerCacheEntry(
+                    entry_key=key,
+                    kb_version=kb_version,
+                    context_key=ctx,
+                    question=question,
+                    answer=answer,
+                    embedding=vec.tobytes(),
+                ))
+                if evicted:
+                    db.query(AnswerCacheEntry).filter(AnswerCacheEntry.entry_key.in_(evicted)).delete()
+                db.commit()
+            finally:
+                db.close()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_context.clear()
+            if self.session_factory:
+                db = self.session_factory()
+                try:
+                    db.query(AnswerCacheEntry).delete()
+                    db.commit()
+                finally:
+                    db.close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "enabled": ANSWER_CACHE_ENABLED,
+                "persisted": bool(self.session_factory),
+                "kb_version": self.kb_version,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "threshold": self.threshold,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                # Every hit is a Gemini round trip that did not happen.
+                "llm_calls_saved": self.hits,
+            }
@@ -1,11 +1,20 @@
 import os
-from fastapi import FastAPI, HTTPException, Depends
+import re
+import json
+import asyncio
+import functools
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import FastAPI, HTTPException, Depends, Request, Response, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from dotenv import load_dotenv
+from pydantic import ValidationError
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
 
 try:
-    from backend.db import get_db, ChatHistory, Lead, Enrollment, Base, engine
+    from backend.db import get_db, init_db, SessionLocal, ChatHistory, Lead, Enrollment, engine
     from backend.models import (
         ChatRequest,
         ChatResponse,
@@ -14,15 +23,44 @@ try:
         EnrollmentIn,
         EnrollmentOut,
         ChatSaveRequest,
+        ChatTurn,
         ChatHistoryOut,
         KBSearchRequest,
         KBSearchResponse,
+        KBBatchSearchRequest,
+        KBBatchSearchResponse,
+        CourseOutline,
+    )
+    from backend.kb_ingest import (
+        get_relevant_chunks,
+        get_relevant_chunks_batch,
+        load_kb,
+        ingest_kb,
+        query_cache,
+        encode_query,
+        encode_queries,
+        get_kb_version,
+        get_snapshot,
+        warm_encoder,
+    )
+    from backend.answer_cache import SemanticAnswerCache, ANSWER_CACHE_ENABLED, ANSWER_CACHE_PERSIST, context_key
+    from backend.singleflight import SingleFlight
+    from backend.history_writer import ChatHistoryWriter
+    from backend.session_cache import SessionHistoryCache, recent_turns_query
+    from backend.context_packer import CONTEXT_CANDIDATES, assemble_prompt
+    from backend.outlines import OutlineStore
+    from backend.intent_router import IntentRouter, INTENT_ROUTER_ENABLED, register_default_intents
+    from backend.pagination import ADMIN_PAGE_DEFAULT, ADMIN_PAGE_MAX, EXPORT_FORMATS, keyset_page, iter_rows, export_lines
+    from backend.llm_client import (
+        generate_gemini_response,
+        generate_gemini_response_async,
+        stream_gemini_response,
+        LLMError,
+        llm_client,
     )
-    from backend.kb_ingest import get_relevant_docs, load_kb
-    from backend.llm_client import generate_gemini_response
 except Exception:
     
-    from db import get_db, ChatHistory, Lead, Enrollment, Base, engine
+    from db import get_db, init_db, SessionLocal, ChatHistory, Lead, Enrollment, engine
     from models import (
         ChatRequest,
         ChatResponse,
@@ -31,12 +69,41 @@ except Exception:
         EnrollmentIn,
         EnrollmentOut,
         ChatSaveRequest,
+        ChatTurn,
         ChatHistoryOut,
         KBSearchRequest,
         KBSearchResponse,
+        KBBatchSearchRequest,
+        KBBatchSearchResponse,
+        CourseOutline,
+    )
+    from kb_ingest import (
+        get_relevant_chunks,
+        get_relevant_chunks_batch,
+        load_kb,
+        ingest_kb,
+        query_cache,
+        encode_query,
+        encode_queries,
+        get_kb_version,
+        get_snapshot,
+        warm_encoder,
+    )
+    from answer_cache import SemanticAnswerCache, ANSWER_CACHE_ENABLED, ANSWER_CACHE_PERSIST, context_key
+    from singleflight import SingleFlight
+    from history_writer import ChatHistoryWriter
+    from session_cache import SessionHistoryCache, recent_turns_query
+    from context_packer import CONTEXT_CANDIDATES, assemble_prompt
+    from outlines import OutlineStore
+    from intent_router import IntentRouter, INTENT_ROUTER_ENABLED, register_default_intents
+    from pagination import ADMIN_PAGE_DEFAULT, ADMIN_PAGE_MAX, EXPORT_FORMATS, keyset_page, iter_rows, export_lines
+    from llm_client import (
+        generate_gemini_response,
+        generate_gemini_response_async,
+        stream_gemini_response,
+        LLMError,
+        llm_client,
     )
-    from kb_ingest import get_relevant_docs, load_kb
-    from llm_client import generate_gemini_response
 
 
 load_dotenv()
@@ -45,6 +112,27 @@ GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 if not GEMINI_API_KEY:
     print("⚠️ Warning: GEMINI_API_KEY not set. Set it in your .env file.")
 
+KB_BATCH_MAX_QUERIES = int(os.getenv("KB_BATCH_MAX_QUERIES", "512"))
+# /chat/save inserts transcripts with one executemany per this many turns.
+CHAT_SAVE_CHUNK_ROWS = int(os.getenv("CHAT_SAVE_CHUNK_ROWS", "500"))
+
+# Blocking work in async routes (encoder, SQLAlchemy) runs here, never on the event loop.
+CHAT_WORKER_THREADS = int(os.getenv("CHAT_WORKER_THREADS", "8"))
+_blocking_pool = None  # created on first use, so a startup after a shutdown gets a working pool
+
+
+def _worker_pool() -> ThreadPoolExecutor:
+    global _blocking_pool
+    if _blocking_pool is None:
+        _blocking_pool = ThreadPoolExecutor(max_workers=CHAT_WORKER_THREADS, thread_name_prefix="chat-worker")
+    return _blocking_pool
+
+answer_cache = SemanticAnswerCache(session_factory=SessionLocal if ANSWER_CACHE_PERSIST else None)
+# Identical questions with identical retrieved context share one in-flight Gemini call.
+llm_flights = SingleFlight()
+# Chat turns are persisted off the response path in batched transactions (CHAT_HISTORY_DURABILITY).
+history_writer = ChatHistoryWriter(SessionLocal)
+
 app = FastAPI(title="Ahsan Courses Chatbot API")
 
 app.add_middleware(
@@ -53,18 +141,115 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
-Base.metadata.create_all(bind=engine)
 
+def _generate_outline(course: str, text: str):
+    """Gemini outline of one course from its whole markdown file; None (extractive fallback) on any error."""
+    reply = generate_gemini_response(f"Give a complete outline of the {course} course.", text)
+    return None if not reply or reply.startswith("[") else reply
 
-@app.on_event("startup")
-def on_startup():
- 
+
+# Outlines are generated once per course-file version after ingest/reload, never per click.
+outline_store = OutlineStore(generate=_generate_outline)
+
+# Flipped by the background warmup (and by a later ingest/reload); /ready reports 200 only once both are hot.
+_readiness = {"index": False, "encoder": False, "error": None}
+_readiness_errors = {}  # component -> last failure, cleared once that component comes up
+
+
+def _set_ready(component: str, ok: bool, error: str = None):
+    _readiness[component] = ok
+    if error:
+        _readiness_errors[component] = error
+    else:
+        _readiness_errors.pop(component, None)
+    _readiness["error"] = "; ".join(_readiness_errors.values()) or None
+
+
+def _warm_up():
     try:
-        load_kb()
+        loaded = load_kb() is not None
+        _set_ready("index", loaded)
+        if loaded:
+            outline_store.refresh_in_background()
     except Exception as e:
+        _set_ready("index", False, f"KB load failed: {e}")
         print("⚠️ KB load failed at startup:", e)
+    try:
+        warm_encoder()
+        _set_ready("encoder", True)
+    except Exception as e:
+        _set_ready("encoder", False, f"Encoder warmup failed: {e}")
+        print("⚠️ Encoder warmup failed at startup:", e)
+        return
+    try:
+        intent_router.warm()
+    except Exception as e:
+        print("⚠️ Intent centroids not built at startup, building them on first use:", e)
+
+
+@app.on_event("startup")
+async def on_startup():
+    await run_blocking(init_db, engine)
+    history_writer.start()  # reopens a writer closed by an earlier shutdown
+    # Model load and warmup run in the background so the worker starts accepting traffic (and /health) at once.
+    asyncio.get_running_loop().run_in_executor(_worker_pool(), _warm_up)
+
+
+@app.on_event("shutdown")
+def on_shutdown():
+    global _blocking_pool
+    history_writer.close()
+    pool, _blocking_pool = _blocking_pool, None
+    if pool is not None:
+        pool.shutdown(wait=True)
+
+
+@app.get("/ready")
+def readiness_check():
+    """Readiness probe: 200 once the KB index and encoder are loaded and warm, 503 until then."""
+    ready = _readiness["index"] and _readiness["encoder"]
+    body = {"ready": ready, **_readiness}
+    if not ready:
+        raise HTTPException(status_code=503, detail=body)
+    return body
+
+
+async def run_blocking(fn, *args, **kwargs):
+    """Await a blocking call on the bounded worker pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_worker_pool(), functools.partial(fn, *args, **kwargs))
+
+
+def _load_session_turns(session_id: str, limit: int):
+    """Last ``limit`` turns of a session, oldest first: committed rows plus turns still in the write-behind queue."""
+    pending = history_writer.pending_turns(session_id)
+    db = SessionLocal()
+    try:
+        rows = recent_turns_query(db, session_id, limit).all()
+    finally:
+        db.close()
+    turns = [{"user_message": r.user_message, "bot_reply": r.bot_reply, "created_at": r.created_at} for r in rows]
+    # A turn flushed between the two reads shows up in both.
+    seen = {(t["created_at"], t["user_message"], t["bot_reply"]) for t in turns}
+    turns += [t for t in pending if (t["created_at"], t["user_message"], t["bot_reply"]) not in seen]
+    return sorted(turns, key=lambda t: t["created_at"])[-limit:]
+
+
+# Recent turns per session, so the last-question path usually skips the database.
+session_history = SessionHistoryCache(_load_session_turns)
+
+
+def _last_user_question(session_id: str):
+    return session_history.last_user_message(session_id)
+
+
+def _save_chat_turn(session_id: str, user_message: str, bot_reply: str):
+    created_at = datetime.utcnow()
+    session_history.record(session_id, user_message, bot_reply, created_at)
+    history_writer.submit(session_id, user_message, bot_reply, created_at=created_at)
 
 @app.get("/")
 def home():
@@ -73,77 +258,292 @@ def home():
 
 @app.get("/kb/status")
 def kb_status():
-    """Return whether the KB is loaded and how many documents exist."""
+    """Report the live KB snapshot (version, size, build time, memory) without touching disk."""
+    snap = get_snapshot(load=False)
+    status = snap.status() if snap is not None else {"loaded": False, "documents": 0}
+    status["query_cache"] = query_cache.stats()
+    return status
+
+
+@app.post("/admin/kb/reload")
+async def reload_kb():
+    """Re-read the on-disk KB store into a fresh snapshot and swap it in atomically."""
+    snap = await run_blocking(load_kb)
+    if snap is None:
+        raise HTTPException(status_code=404, detail="No KB store found. Run the ingest first.")
+    _set_ready("index", True)
+    outline_store.refresh_in_background()
+    return {"status": "ok", **snap.status()}
+
+
+@app.post("/admin/kb/ingest")
+def trigger_kb_ingest(full: bool = False):
+    """Re-ingest the KB, encoding only added/changed files unless full=true."""
     try:
-        
-        load_kb()
-        from backend.kb_ingest import documents as docs
-    except Exception:
-        
-        try:
-            from kb_ingest import documents as docs
-        except Exception:
-            docs = []
-    return {"loaded": bool(docs), "documents": len(docs)}
+        report = ingest_kb(full=full)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    _set_ready("index", True)
+    # Only courses whose markdown changed get a new outline; the rest are kept.
+    outline_store.refresh_in_background()
+    return {"status": "ok", **report}
+
+
+# Runs before retrieval; messages it answers locally never reach the encoder index or Gemini.
+# The lambdas resolve the encoder at call time; the router embeds the raw message, so retrieval reuses its cached vector.
+intent_router = IntentRouter(
+    embed=(lambda text: encode_query(text)) if INTENT_ROUTER_ENABLED else None,
+    embed_batch=(lambda texts: encode_queries(texts)) if INTENT_ROUTER_ENABLED else None,
+)
+if INTENT_ROUTER_ENABLED:
+    register_default_intents(intent_router)
+
+
+@intent_router.intent(
+    "last_question",
+    patterns=[r".*what was my last (question|query).*", r".*last question"],
+)
+def _answer_last_question(session_id: str, user_message: str) -> str:
+    prev_message = _last_user_question(session_id)
+    if prev_message:
+        return f"Your last question was: {prev_message}"
+    return "I couldn't find any previous question in this session."
+
+
+# An explicit question, not any mention: every course answer lists "Next steps for enrollment".
+_ENROLL_OFFER_RE = re.compile(
+    r"\b((would|do) you (like|want) to|are you (interested in|ready to)|shall i help you) enrol",
+    re.IGNORECASE,
+)
+
+
+def _offered_enrollment(session_id: str) -> bool:
+    """True when the previous bot reply ended by asking whether the user wants to enroll."""
+    turns = session_history.recent(session_id)
+    reply = (turns[-1]["bot_reply"] or "").strip() if turns else ""
+    last_sentence = re.split(r"(?<=[.!?])\s+", reply)[-1] if reply else ""
+    return last_sentence.endswith("?") and bool(_ENROLL_OFFER_RE.search(last_sentence))
+
+
+@intent_router.intent("enroll_yes", patterns=[r"(yes|yeah|yep|ya|yea|y|haan)( please)?"])
+def _accept_enrollment(session_id: str, user_message: str):
+    """A bare "yes" right after a reply that asked about enrolling; otherwise the LLM reads it in context."""
+    if not _offered_enrollment(session_id):
+        return None
+    # Any client can act on this: the lead form is always on the page, unlike the enrollment form.
+    return (
+        "Great! Leave your name and email in the \"Interested in a Course?\" form and our team "
+        "will contact you to complete your enrollment."
+    )
+
+
+@intent_router.intent("enroll_no", patterns=[r"(no|nope|nah|not now|no thanks|nahi)( thank you| thanks)?"])
+def _decline_enrollment(session_id: str, user_message: str):
+    if not _offered_enrollment(session_id):
+        return None
+    return "No problem — let me know if you change your mind."
+
+
+async def _route_intent(session_id: str, user_message: str):
+    """Answer locally when the intent router can, recording the turn; None means retrieval + LLM."""
+    routed = await run_blocking(intent_router.route, session_id, user_message)
+    if routed is not None:
+        await run_blocking(_save_chat_turn, session_id, user_message, routed.reply)
+    return routed
+
+
+def _lookup_cached_answer(user_message: str, context_text: str):
+    """Return (query_vec, cached reply or None); the query vector is the one retrieval already cached."""
+    if not ANSWER_CACHE_ENABLED:
+        return None, None
+    query_vec = encode_query(user_message)
+    return query_vec, answer_cache.lookup(query_vec, context_text, get_kb_version())
+
+
+def _store_answer(query_vec, context_text: str, user_message: str, bot_reply: str):
+    # Placeholder/error replies ("[LLM error: ...]") must never be served from cache.
+    if query_vec is None or not bot_reply or bot_reply.startswith("["):
+        return
+    answer_cache.store(query_vec, context_text, get_kb_version(), bot_reply, question=user_message)
+
+
+_LLM_ERROR_STATUS = {"circuit_open": 503, "overloaded": 503, "timeout": 504}
+
+
+def _llm_http_error(err: LLMError) -> HTTPException:
+    """Map an LLMError to a structured HTTP error (503/504 carry Retry-After for clients to back off)."""
+    status = _LLM_ERROR_STATUS.get(err.code, 502)
+    headers = None
+    if status in (503, 504):
+        headers = {"Retry-After": str(max(1, round(llm_client.breaker.retry_after())))}
+    return HTTPException(status_code=status, detail=err.to_dict(), headers=headers)
+
+
+def _chunk_sources(chunks):
+    return list(dict.fromkeys(c["source"] for c in chunks if c.get("source")))
+
+
+def _prompt_inputs(session_id: str, user_message: str, chunks):
+    """Pack retrieved chunks and session memory into PROMPT_TOKEN_BUDGET.
+
+    Returns (packed_chunks, context_report, context_text, history_text, cache_context).
+    The answer depends on the conversation as well as the context, so the
+    answer cache and single-flight key on both (cache_context).
+    """
+    turns = session_history.recent(session_id)
+    query_vec = encode_query(user_message) if any("vector" in c for c in chunks) else None
+    packed, report, context_text, history = assemble_prompt(chunks, turns, query_vec)
+    cache_context = f"{history}\n\n{context_text}" if history else context_text
+    return packed, report, context_text, history, cache_context
+
+
+@app.get("/admin/metrics")
+def cache_metrics():
+    """Hit/miss counters for the query-embedding and answer caches, plus LLM client and chat-history writer state."""
+    return {
+        "query_cache": query_cache.stats(),
+        "answer_cache": answer_cache.stats(),
+        "llm": llm_client.stats(),
+        "llm_single_flight": llm_flights.stats(),
+        "chat_history_writer": history_writer.stats(),
+        "session_history": session_history.stats(),
+        "intents": intent_router.stats(),
+        "course_outlines": outline_store.stats(),
+    }
 
 
 @app.post("/chat", response_model=ChatResponse)
-async def chat_with_bot(request: ChatRequest, db: Session = Depends(get_db)):
+async def chat_with_bot(request: ChatRequest):
     """Main chatbot route — AI answers AI-related questions."""
     user_message = request.message.strip()
 
-    # Check for an explicit request asking for the user's last question.
-    # If detected, fetch the most recent user_message for this session and reply directly.
-    lower_msg = user_message.lower()
-    if (
-        "what was my last question" in lower_msg
-        or "what was my last query" in lower_msg
-        or "last question" == lower_msg
-        or lower_msg.endswith("last question?")
-    ):
-        prev = (
-            db.query(ChatHistory)
-            .filter(ChatHistory.session_id == request.session_id, ChatHistory.user_message != None)
-            .order_by(ChatHistory.created_at.desc())
-            .first()
-        )
-        if prev and prev.user_message:
-            bot_reply = f"Your last question was: {prev.user_message}"
-        else:
-            bot_reply = "I couldn't find any previous question in this session."
-
-        # Save the meta-question and the reply as a chat turn
-        chat_record = ChatHistory(
-            session_id=request.session_id,
-            user_message=user_message,
-            bot_reply=bot_reply,
-        )
-        db.add(chat_record)
-        db.commit()
-        db.refresh(chat_record)
+    # Greetings, thanks, "what was my last question" etc. are answered without retrieval or Gemini.
+    routed = await _route_intent(request.session_id, user_message)
+    if routed is not None:
+        return ChatResponse(reply=routed.reply, sources=[], context_used=[], intent=routed.intent)
 
-        return ChatResponse(reply=bot_reply, sources=[], context_used=[])
+    candidates = await run_blocking(get_relevant_chunks, user_message, top_k=CONTEXT_CANDIDATES, with_vectors=True)
+    chunks, report, context_text, history, cache_context = await run_blocking(
+        _prompt_inputs, request.session_id, user_message, candidates
+    )
 
-    context_docs = get_relevant_docs(user_message, top_k=3)
-    context_text = "\n\n".join(context_docs)
+    query_vec, bot_reply = await run_blocking(_lookup_cached_answer, user_message, cache_context)
+    if bot_reply is None:
+        async def generate():
+            reply = await generate_gemini_response_async(user_message, context_text, history)
+            await run_blocking(_store_answer, query_vec, cache_context, user_message, reply)
+            return reply
 
-    try:
-        bot_reply = generate_gemini_response(user_message, context_text)
-    except Exception as e:
-        print("LLM Error:", e)
-        raise HTTPException(status_code=500, detail="Gemini API call failed")
+        flight_key = (" ".join(user_message.lower().split()), context_key(cache_context))
+        try:
+            bot_reply = await llm_flights.do(flight_key, generate)
+        except LLMError as e:
+            print("LLM Error:", e.message)
+            raise _llm_http_error(e)
 
     # Save chat to DB
-    chat_record = ChatHistory(
-        session_id=request.session_id,
-        user_message=user_message,
-        bot_reply=bot_reply,
+    await run_blocking(_save_chat_turn, request.session_id, user_message, bot_reply)
+
+    return ChatResponse(
+        reply=bot_reply,
+        sources=_chunk_sources(chunks),
+        context_used=[c["text"] for c in chunks],
+        chunks=chunks,
+        context=report,
     )
-    db.add(chat_record)
-    db.commit()
-    db.refresh(chat_record)
 
-    return ChatResponse(reply=bot_reply, sources=context_docs, context_used=context_docs)
+
+def _sse(payload: dict) -> str:
+    return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+
+@app.post("/chat/stream")
+async def chat_with_bot_stream(request: ChatRequest):
+    """Streaming variant of /chat (server-sent events).
+
+    Emits ``{"type": "token", "text": ...}`` events as Gemini produces text and a
+    final ``{"type": "done", "reply", "sources"}`` event (plus ``intent`` when the
+    intent router answered locally); the ChatHistory row is written once the
+    answer is complete.
+    """
+    user_message = request.message.strip()
+
+    async def events():
+        routed = await _route_intent(request.session_id, user_message)
+        if routed is not None:
+            yield _sse({"type": "token", "text": routed.reply})
+            yield _sse({"type": "done", "reply": routed.reply, "sources": [], "intent": routed.intent})
+            return
+
+        candidates = await run_blocking(get_relevant_chunks, user_message, top_k=CONTEXT_CANDIDATES, with_vectors=True)
+        chunks, report, context_text, history, cache_context = await run_blocking(
+            _prompt_inputs, request.session_id, user_message, candidates
+        )
+        sources = _chunk_sources(chunks)
+        yield _sse({"type": "context", "sources": sources, "context": report})
+
+        query_vec, cached = await run_blocking(_lookup_cached_answer, user_message, cache_context)
+        if cached is not None:
+            await run_blocking(_save_chat_turn, request.session_id, user_message, cached)
+            yield _sse({"type": "token", "text": cached})
+            yield _sse({"type": "done", "reply": cached, "sources": sources})
+            return
+
+        parts = []
+        try:
+            async for piece in stream_gemini_response(user_message, context_text, history):
+                parts.append(piece)
+                yield _sse({"type": "token", "text": piece})
+        except LLMError as e:
+            print("LLM Error:", e.message)
+            yield _sse({"type": "error", "detail": e.to_dict()})
+            return
+
+        bot_reply = "".join(parts)
+        await run_blocking(_store_answer, query_vec, cache_context, user_message, bot_reply)
+        await run_blocking(_save_chat_turn, request.session_id, user_message, bot_reply)
+        yield _sse({"type": "done", "reply": bot_reply, "sources": sources})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _utc_naive(ts):
+    """ChatHistory.created_at holds naive UTC; convert client timestamps that carry an offset."""
+    if ts is None or ts.tzinfo is None:
+        return ts
+    return ts.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _turn_rows(session_id: str, turns, now=None):
+    now = now or datetime.utcnow()
+    return [
+        {
+            "session_id": session_id,
+            "user_message": t.user_message,
+            "bot_reply": t.bot_reply,
+            "created_at": _utc_naive(t.created_at) or now,
+        }
+        for t in turns
+    ]
+
+
+def _bulk_insert_turns(db: Session, rows):
+    """Core executemany inserts in CHAT_SAVE_CHUNK_ROWS chunks; the caller commits."""
+    for start in range(0, len(rows), CHAT_SAVE_CHUNK_ROWS):
+        db.execute(insert(ChatHistory), rows[start:start + CHAT_SAVE_CHUNK_ROWS])
+
+
+def _save_turn_rows(rows):
+    db = SessionLocal()
+    try:
+        _bulk_insert_turns(db, rows)
+        db.commit()
+    finally:
+        db.close()
 
 
 @app.post("/chat/save")
@@ -151,18 +551,58 @@ def save_chat_history(payload: ChatSaveRequest, db: Session = Depends(get_db)):
     """Save a list of chat turns (turns are objects with user_message and/or bot_reply).
 
     Expected payload: { session_id: str, turns: [{user_message, bot_reply, created_at?}, ...] }
+    A supplied created_at is kept; turns without one are stamped with the server time.
     """
-    count = 0
-    for t in payload.turns:
-        ch = ChatHistory(
-            session_id=payload.session_id,
-            user_message=t.user_message,
-            bot_reply=t.bot_reply,
-        )
-        db.add(ch)
-        count += 1
+    _bulk_insert_turns(db, _turn_rows(payload.session_id, payload.turns))
     db.commit()
-    return {"status": "ok", "saved": count}
+    session_history.invalidate(payload.session_id)
+    return {"status": "ok", "saved": len(payload.turns)}
+
+
+@app.post("/chat/save/ndjson")
+async def save_chat_history_ndjson(request: Request, session_id: str):
+    """Save a transcript streamed as NDJSON, one ChatTurn object per line.
+
+    Turns are inserted and committed every CHAT_SAVE_CHUNK_ROWS lines, so memory
+    does not grow with the transcript. A malformed line stops the upload with a
+    400 that reports the line number and how many turns were already saved.
+    """
+    saved, line_no, batch = 0, 0, []
+    buffer = b""
+    now = datetime.utcnow()
+
+    async def flush():
+        nonlocal saved, batch
+        if batch:
+            await run_blocking(_save_turn_rows, _turn_rows(session_id, batch, now))
+            session_history.invalidate(session_id)
+            saved += len(batch)
+            batch = []
+
+    async def take(line: bytes):
+        nonlocal line_no
+        line_no += 1
+        if not line.strip():
+            return
+        try:
+            batch.append(ChatTurn.model_validate_json(line))
+        except ValidationError as e:
+            await flush()
+            raise HTTPException(
+                status_code=400,
+                detail={"error": f"Invalid turn on line {line_no}", "line": line_no, "saved": saved, "errors": e.errors(include_url=False, include_context=False, include_input=False)},
+            )
+        if len(batch) >= CHAT_SAVE_CHUNK_ROWS:
+            await flush()
+
+    async for part in request.stream():
+        buffer += part
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            await take(line)
+    await take(buffer)
+    await flush()
+    return {"status": "ok", "saved": saved}
 
 
 @app.get("/chat/top5", response_model=list[ChatHistoryOut])
@@ -175,8 +615,34 @@ def get_top5_chats(db: Session = Depends(get_db)):
 @app.post("/kb/search", response_model=KBSearchResponse)
 def search_kb(req: KBSearchRequest):
     """Search KB for AI course info."""
-    results = get_relevant_docs(req.query, top_k=req.top_k)
-    return KBSearchResponse(documents=results)
+    try:
+        chunks = get_relevant_chunks(req.query, top_k=req.top_k, mode=req.mode)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return KBSearchResponse(documents=[c["text"] for c in chunks], chunks=chunks)
+
+
+@app.post("/kb/search/batch", response_model=KBBatchSearchResponse)
+def search_kb_batch(req: KBBatchSearchRequest):
+    """Search the KB for many queries in one encoder batch and one index search."""
+    if len(req.queries) > KB_BATCH_MAX_QUERIES:
+        raise HTTPException(status_code=400, detail=f"At most {KB_BATCH_MAX_QUERIES} queries per batch.")
+    try:
+        per_query = get_relevant_chunks_batch(req.queries, top_k=req.top_k, mode=req.mode)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return KBBatchSearchResponse(
+        results=[KBSearchResponse(documents=[c["text"] for c in chunks], chunks=chunks) for chunks in per_query]
+    )
+
+
+@app.get("/courses/{name}/outline", response_model=CourseOutline)
+def get_course_outline(name: str):
+    """Precomputed outline of one course ("Data Science", "data_science", ...); no retrieval, LLM call or chat turn."""
+    outline = outline_store.get(name)
+    if outline is None:
+        raise HTTPException(status_code=404, detail=f"Unknown course {name!r}.")
+    return outline
 
 
 # -----------------------------------------
@@ -198,12 +664,50 @@ def capture_lead(lead: LeadIn, db: Session = Depends(get_db)):
 
 
 # -----------------------------------------
-# 📜 Get All Leads (Admin)
+# 📜 Admin Listings (keyset-paginated) & Exports
 # -----------------------------------------
+LEAD_COLUMNS = ["id", "name", "email", "phone", "interest", "created_at"]
+ENROLLMENT_COLUMNS = ["id", "username", "email", "phone", "address", "course", "created_at"]
+CHAT_HISTORY_COLUMNS = ["id", "session_id", "user_message", "bot_reply", "created_at"]
+_EXPORT_MEDIA_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+
+def _admin_page(db: Session, model, response: Response, limit: int, cursor: str):
+    """Newest-first page of rows; the cursor for the next page goes in the X-Next-Cursor header."""
+    try:
+        rows, next_cursor = keyset_page(db, model, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return rows
+
+
+def _export(model, columns, name: str, fmt: str):
+    """Stream a whole table as CSV/NDJSON, reading it in keyset batches."""
+    if fmt not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown export format {fmt!r}; choose from {list(EXPORT_FORMATS)}.")
+    return StreamingResponse(
+        export_lines(iter_rows(SessionLocal, model), columns, fmt),
+        media_type=_EXPORT_MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{name}.{fmt}"'},
+    )
+
+
 @app.get("/admin/leads", response_model=list[LeadOut])
-def get_all_leads(db: Session = Depends(get_db)):
-    leads = db.query(Lead).order_by(Lead.created_at.desc()).all()
-    return leads
+def get_all_leads(
+    response: Response,
+    limit: int = Query(ADMIN_PAGE_DEFAULT, ge=1, le=ADMIN_PAGE_MAX),
+    cursor: str = None,
+    db: Session = Depends(get_db),
+):
+    """Latest leads, one page at a time; pass the X-Next-Cursor header back as ``cursor`` for older ones."""
+    return _admin_page(db, Lead, response, limit, cursor)
+
+
+@app.get("/admin/leads/export")
+def export_leads(format: str = "csv"):
+    return _export(Lead, LEAD_COLUMNS, "leads", format)
 
 
 # -----------------------------------------
@@ -249,8 +753,34 @@ def enroll_student(enroll: EnrollmentIn, db: Session = Depends(get_db)):
 
 
 @app.get("/admin/enrollments", response_model=list[EnrollmentOut])
-def get_all_enrollments(db: Session = Depends(get_db)):
-    rows = db.query(Enrollment).order_by(Enrollment.created_at.desc()).all()
-    return rows
+def get_all_enrollments(
+    response: Response,
+    limit: int = Query(ADMIN_PAGE_DEFAULT, ge=1, le=ADMIN_PAGE_MAX),
+    cursor: str = None,
+    db: Session = Depends(get_db),
+):
+    """Latest enrollments, keyset-paginated like /admin/leads."""
+    return _admin_page(db, Enrollment, response, limit, cursor)
+
+
+@app.get("/admin/enrollments/export")
+def export_enrollments(format: str = "csv"):
+    return _export(Enrollment, ENROLLMENT_COLUMNS, "enrollments", format)
+
+
+@app.get("/admin/chat_history", response_model=list[ChatHistoryOut])
+def get_chat_history(
+    response: Response,
+    limit: int = Query(ADMIN_PAGE_DEFAULT, ge=1, le=ADMIN_PAGE_MAX),
+    cursor: str = None,
+    db: Session = Depends(get_db),
+):
+    """Latest chat turns across sessions, keyset-paginated like /admin/leads."""
+    return _admin_page(db, ChatHistory, response, limit, cursor)
+
+
+@app.get("/admin/chat_history/export")
+def export_chat_history(format: str = "ndjson"):
+    return _export(ChatHistory, CHAT_HISTORY_COLUMNS, "chat_history", format)
 
 
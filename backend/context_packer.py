@@ -0,0 +1,120 @@
+import os
+import numpy as np
+
+try:
+    from backend.conversation import MEMORY_TOKEN_BUDGET, PROMPT_TOKEN_BUDGET, build_memory, count_tokens, truncate_tokens
+    from backend.vector_index import normalize_rows
+except Exception:
+    from conversation import MEMORY_TOKEN_BUDGET, PROMPT_TOKEN_BUDGET, build_memory, count_tokens, truncate_tokens
+    from vector_index import normalize_rows
+
+# Chunks retrieved per question; packing picks at most CONTEXT_MAX_CHUNKS of them.
+CONTEXT_CANDIDATES = int(os.getenv("CONTEXT_CANDIDATES", "8"))
+CONTEXT_MAX_CHUNKS = int(os.getenv("CONTEXT_MAX_CHUNKS", "3"))
+# 1.0 ranks purely by relevance; lower values favour chunks unlike those already picked.
+CONTEXT_MMR_LAMBDA = float(os.getenv("CONTEXT_MMR_LAMBDA", "0.7"))
+# Cosine similarity at which a candidate counts as a near-duplicate of a picked chunk.
+CONTEXT_DUP_THRESHOLD = float(os.getenv("CONTEXT_DUP_THRESHOLD", "0.95"))
+# Share of a chunk's relevance taken from the retrieval ranking (hybrid BM25 + dense); the rest is cosine to the query.
+CONTEXT_RETRIEVAL_WEIGHT = float(os.getenv("CONTEXT_RETRIEVAL_WEIGHT", "0.5"))
+
+
+def _retrieval_relevance(chunks):
+    """Retrieval score min-max scaled to [0, 1] (1 for the top hit); rank order when scores are missing or flat."""
+    scores = [c.get("score") for c in chunks]
+    if None not in scores and max(scores) > min(scores):
+        scores = np.asarray(scores, dtype=np.float32)
+        return (scores - scores.min()) / (scores.max() - scores.min())
+    return 1.0 - np.arange(len(chunks)) / len(chunks)
+
+
+def _overlaps(a, b) -> bool:
+    """Same passage: overlapping offsets in the same file, or one text containing the other."""
+    if a.get("source") and a.get("source") == b.get("source") and None not in (a.get("start"), a.get("end"), b.get("start"), b.get("end")):
+        if a["start"] < b["end"] and b["start"] < a["end"]:
+            return True
+    ta, tb = " ".join(a["text"].split()), " ".join(b["text"].split())
+    return ta in tb or tb in ta
+
+
+def pack_context(chunks, query_vec=None, budget: int = None, max_chunks: int = CONTEXT_MAX_CHUNKS,
+                 mmr_lambda: float = CONTEXT_MMR_LAMBDA, dup_threshold: float = CONTEXT_DUP_THRESHOLD,
+                 retrieval_weight: float = CONTEXT_RETRIEVAL_WEIGHT):
+    """Choose the chunks to send to the LLM: MMR-reranked, de-duplicated and within a token budget.
+
+    ``chunks`` are retrieval results in rank order; a ``vector`` key (the stored
+    chunk embedding) enables similarity-based reranking and duplicate detection,
+    otherwise rank order and text overlap are used. Relevance blends the
+    retrieval score with cosine to ``query_vec`` when given, and the top
+    retrieval hit is always picked first: exact-term hits (course codes,
+    prices) that BM25 ranked first must not lose to chunks that merely embed
+    closer to the query. Returns ``(packed_chunks, report)`` where the report
+    lists tokens spent per source.
+    """
+    report = {"candidates": len(chunks), "duplicates_dropped": 0, "over_budget_dropped": 0, "tokens": 0, "sources": []}
+    if not chunks:
+        return [], report
+
+    vectors = None
+    if all(c.get("vector") is not None for c in chunks):
+        vectors = normalize_rows(np.vstack([c["vector"] for c in chunks]))
+    relevance = _retrieval_relevance(chunks)
+    if vectors is not None and query_vec is not None:
+        cosine = vectors @ normalize_rows(np.asarray(query_vec, dtype=np.float32)[None, :])[0]
+        relevance = retrieval_weight * relevance + (1.0 - retrieval_weight) * cosine
+    sims = vectors @ vectors.T if vectors is not None else np.zeros((len(chunks), len(chunks)), dtype=np.float32)
+
+    remaining = budget if budget is not None else float("inf")
+    picked, open_, cut = [], list(range(len(chunks))), {}
+    while open_ and len(picked) < max_chunks:
+        if len(open_) == len(chunks):
+            best = open_.pop(0)  # candidates arrive in retrieval order: the top hit goes first
+        else:
+            if picked:
+                redundancy = sims[np.ix_(open_, picked)].max(axis=1)
+            else:
+                redundancy = np.zeros(len(open_))
+            scores = mmr_lambda * relevance[open_] - (1.0 - mmr_lambda) * redundancy
+            best = open_.pop(int(np.argmax(scores)))
+        if any(sims[best, p] >= dup_threshold or _overlaps(chunks[best], chunks[p]) for p in picked):
+            report["duplicates_dropped"] += 1
+            continue
+        cost = count_tokens(chunks[best]["text"]) + 1
+        if cost > remaining:
+            # The best chunk is always kept, cut to size; later ones are skipped in favour of smaller candidates.
+            if not picked and remaining > 20:
+                picked.append(best)
+                cut[best] = truncate_tokens(chunks[best]["text"], int(remaining) - 1)
+                remaining = 0
+            else:
+                report["over_budget_dropped"] += 1
+            continue
+        picked.append(best)
+        remaining -= cost
+
+    packed = []
+    for i in picked:
+        chunk = {k: v for k, v in chunks[i].items() if k != "vector"}
+        if i in cut:
+            chunk["text"] = cut[i]
+        packed.append(chunk)
+    per_source = {}
+    for c in packed:
+        usage = per_source.setdefault(c.get("source"), {"source": c.get("source"), "chunks": 0, "tokens": 0})
+        usage["chunks"] += 1
+        usage["tokens"] += count_tokens(c["text"])
+    report["sources"] = list(per_source.values())
+    report["tokens"] = sum(u["tokens"] for u in report["sources"])
+    return packed, report
+
+
+def assemble_prompt(chunks, turns, query_vec=None, budget: int = PROMPT_TOKEN_BUDGET, memory_budget: int = MEMORY_TOKEN_BUDGET):
+    """Split one token budget between conversation memory and packed KB context.
+
+    Memory (at most ``memory_budget``) is rendered first; the context gets the
+    rest. Returns ``(packed_chunks, report, context_text, history_text)``.
+    """
+    history = build_memory(turns, min(memory_budget, budget))
+    packed, report = pack_context(chunks, query_vec, budget=budget - count_tokens(history))
+    report["memory_tokens"] = count_tokens(history)
+    return packed, report, "\n\n".join(c["text"] for c in packed), history
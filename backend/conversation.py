@@ -0,0 +1,86 @@
+import os
+
+# Everything variable in a /chat prompt (KB context + conversation memory) must fit in this many tokens.
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "2000"))
+# Share of the budget conversation memory may take; the KB context gets whatever memory leaves.
+MEMORY_TOKEN_BUDGET = int(os.getenv("MEMORY_TOKEN_BUDGET", "600"))
+# Newest turns quoted verbatim (each message capped); older ones are folded into a one-line summary.
+MEMORY_TURNS = int(os.getenv("MEMORY_TURNS", "4"))
+MEMORY_MESSAGE_TOKENS = int(os.getenv("MEMORY_MESSAGE_TOKENS", "120"))
+
+# Gemini averages roughly four characters of English per token.
+_CHARS_PER_TOKEN = 4
+
+
+def count_tokens(text: str) -> int:
+    """Cheap token estimate (no tokenizer round trip); errs high for short words."""
+    return (len(text) + _CHARS_PER_TOKEN - 1) // _CHARS_PER_TOKEN if text else 0
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    """Cut text to about ``max_tokens`` at a word boundary, marking the cut with an ellipsis."""
+    if count_tokens(text) <= max_tokens:
+        return text
+    if max_tokens <= 0:
+        return ""
+    cut = text[: max(0, max_tokens * _CHARS_PER_TOKEN - 1)]
+    space = cut.rfind(" ")
+    if space > len(cut) // 2:
+        cut = cut[:space]
+    return cut.rstrip() + "…"
+
+
+def _quote(turn) -> str:
+    lines = []
+    if turn.get("user_message"):
+        lines.append("User: " + truncate_tokens(" ".join(turn["user_message"].split()), MEMORY_MESSAGE_TOKENS))
+    if turn.get("bot_reply"):
+        lines.append("Assistant: " + truncate_tokens(" ".join(turn["bot_reply"].split()), MEMORY_MESSAGE_TOKENS))
+    return "\n".join(lines)
+
+
+def _summarize(turns, budget: int) -> str:
+    """Extractive summary of older turns: their questions, newest first, for as many as fit.
+
+    Done without an LLM call on purpose; the point of memory here is fewer calls, not more.
+    """
+    prefix = "Earlier in this conversation the user asked about: "
+    remaining = budget - count_tokens(prefix) - 1
+    picked = []
+    for turn in reversed(turns):
+        question = " ".join((turn.get("user_message") or "").split())
+        if not question:
+            continue
+        question = truncate_tokens(question, 30)
+        cost = count_tokens(question) + 1
+        if cost > remaining:
+            break
+        picked.append(question)
+        remaining -= cost
+    if not picked:
+        return ""
+    return prefix + "; ".join(reversed(picked)) + "."
+
+
+def build_memory(turns, budget: int = MEMORY_TOKEN_BUDGET, recent: int = MEMORY_TURNS) -> str:
+    """Render a session's turns (oldest first) as prompt memory of at most ``budget`` tokens.
+
+    The newest ``recent`` turns are quoted while they fit; everything older is
+    summarized into one line, so the size is bounded however long the session is.
+    """
+    if not turns or budget <= 0:
+        return ""
+    quoted = []
+    used = 0
+    older = list(turns)
+    while older and len(quoted) < recent:
+        text = _quote(older[-1])
+        cost = count_tokens(text) + 1
+        if used + cost > budget:
+            break
+        quoted.append(text)
+        used += cost
+        older.pop()
+    summary = _summarize(older, budget - used) if older else ""
+    parts = ([summary] if summary else []) + list(reversed(quoted))
+    return "\n".join(parts)
@@ -1,23 +1,100 @@
-from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime
+import os
+from sqlalchemy import create_engine, event, inspect, Column, Index, Integer, String, Text, DateTime, LargeBinary
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from datetime import datetime
 
-DATABASE_URL = "sqlite:///./chat_history.db"
+PROJECT_DB_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "chat_history.db")
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+
+def default_database_path() -> str:
+    """The project-root SQLite file, unless the working directory already has a chat_history.db.
+
+    Before DATABASE_URL existed the file was created in the working directory
+    (backend/ for deployments started from there); such a file keeps being used
+    instead of silently starting over with an empty database.
+    """
+    legacy = os.path.abspath("chat_history.db")
+    if legacy != PROJECT_DB_PATH and os.path.exists(legacy):
+        print(f"ℹ️ Using the existing {legacy}; set DATABASE_URL to move it.")
+        return legacy
+    return PROJECT_DB_PATH
+
+
+# Any SQLAlchemy URL; the default is the SQLite file from default_database_path().
+DATABASE_URL = os.getenv("DATABASE_URL") or "sqlite:///" + default_database_path()
+# Sized for the request thread pools plus the chat-history writer, so workers don't queue for a connection.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "16"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "16"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+
+# SQLite only. Set SQLITE_TUNING=0 to keep SQLite's defaults (rollback journal, synchronous=FULL).
+SQLITE_TUNING = os.getenv("SQLITE_TUNING", "1") not in ("0", "false", "False")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_CACHE_KB = int(os.getenv("SQLITE_CACHE_KB", "20000"))
+SQLITE_MMAP_BYTES = int(os.getenv("SQLITE_MMAP_BYTES", str(256 * 1024 * 1024)))
+
+
+def _sqlite_pragmas(dbapi_conn, _record):
+    """Per-connection SQLite settings: WAL lets readers run alongside the single writer, and
+    synchronous=NORMAL only fsyncs at checkpoints (still crash-safe in WAL mode)."""
+    cur = dbapi_conn.cursor()
+    try:
+        cur.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        if SQLITE_TUNING:
+            cur.execute("PRAGMA journal_mode=WAL")
+            cur.execute("PRAGMA synchronous=NORMAL")
+            cur.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_KB}")
+            cur.execute(f"PRAGMA mmap_size={SQLITE_MMAP_BYTES}")
+            cur.execute("PRAGMA temp_store=MEMORY")
+    finally:
+        cur.close()
+
+
+def make_engine(url: str = DATABASE_URL):
+    """Create the engine for ``url``: tuned pragmas for SQLite files, a pre-pinged recycling pool elsewhere."""
+    parsed = make_url(url)
+    if parsed.get_backend_name() != "sqlite":
+        return create_engine(
+            url,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+            pool_pre_ping=True,
+        )
+    connect_args = {"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000}
+    if parsed.database in (None, "", ":memory:"):
+        # In-memory databases live in one connection; the default single-connection pool is required.
+        return create_engine(url, connect_args=connect_args)
+    sqlite_engine = create_engine(
+        url,
+        connect_args=connect_args,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+    )
+    event.listen(sqlite_engine, "connect", _sqlite_pragmas)
+    return sqlite_engine
+
+
+engine = make_engine()
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
 Base = declarative_base()
 
 
 class ChatHistory(Base):
     __tablename__ = "chat_history"
+    # Per-session history newest-first (last question, conversation memory) is a backwards index range scan.
+    __table_args__ = (Index("ix_chat_history_session_created", "session_id", "created_at"),)
 
     id = Column(Integer, primary_key=True, index=True)
     session_id = Column(String(100), index=True)
     user_message = Column(Text)
     bot_reply = Column(Text)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
 
 
 class Lead(Base):
@@ -28,7 +105,7 @@ class Lead(Base):
     email = Column(String(100))
     phone = Column(String(50))
     interest = Column(String(100))
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
 
 
 class Enrollment(Base):
@@ -40,9 +117,40 @@ class Enrollment(Base):
     phone = Column(String(50), nullable=False, index=True)
     address = Column(Text, nullable=False)
     course = Column(String(100), nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+
+class AnswerCacheEntry(Base):
+    """Persisted semantic answer cache rows (see backend/answer_cache.py)."""
+    __tablename__ = "answer_cache"
+
+    id = Column(Integer, primary_key=True, index=True)
+    entry_key = Column(String(32), unique=True, nullable=False)
+    kb_version = Column(String(32), index=True)
+    context_key = Column(String(64), index=True)
+    question = Column(Text)
+    answer = Column(Text, nullable=False)
+    embedding = Column(LargeBinary, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
 
 
+def init_db(bind=None):
+    """Create missing tables, then any indexes the model declares that an existing database lacks.
+
+    create_all() skips tables that already exist (and with them their indexes), so
+    databases created before an index was added get it here with CREATE INDEX.
+    """
+    bind = bind or engine
+    Base.metadata.create_all(bind=bind)
+    inspector = inspect(bind)
+    for table in Base.metadata.sorted_tables:
+        existing = {ix["name"] for ix in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                print(f"🔧 Creating index {index.name} on {table.name}...")
+                index.create(bind=bind)
+
+
 def get_db():
     """Provides a database session for FastAPI routes"""
     db = SessionLocal()
@@ -0,0 +1,155 @@
+import os
+import numpy as np
+
+try:
+    from backend.vector_index import normalize_rows, top_k_rows
+except Exception:
+    from vector_index import normalize_rows, top_k_rows
+
+# "torch" (sentence-transformers, default), "onnx" (exported graph on onnxruntime, no PyTorch import)
+# or "int8" (the ONNX graph with dynamically int8-quantized weights).
+ENCODER_BACKEND = os.getenv("KB_ENCODER_BACKEND", "torch")
+ENCODER_HF_REPO = os.getenv("KB_ENCODER_HF_REPO", "sentence-transformers/all-MiniLM-L6-v2")
+# Exported model.onnx to use instead of the one published on the hub.
+ONNX_MODEL_PATH = os.getenv("KB_ONNX_MODEL_PATH")
+# Where the int8-quantized graph is written the first time the int8 backend loads.
+ONNX_CACHE_DIR = os.getenv("KB_ONNX_CACHE_DIR", os.path.join(os.path.dirname(__file__), "onnx_models"))
+ONNX_THREADS = int(os.getenv("KB_ONNX_THREADS", "0"))
+ENCODER_MAX_TOKENS = 256  # all-MiniLM-L6-v2's max_seq_length
+
+
+def encoder_id(model_name: str, backend: str = None) -> str:
+    """Identity stored with KB vectors. torch and onnx run the same fp32 graph; int8 vectors differ."""
+    backend = (backend or ENCODER_BACKEND).lower()
+    return f"{model_name}:{backend}" if backend == "int8" else model_name
+
+
+def mean_pool(hidden, attention_mask):
+    """Mask-aware mean over the token axis of a (batch, tokens, dim) output, as sentence-transformers pools."""
+    mask = attention_mask[..., None].astype(np.float32)
+    return (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+
+
+class TorchEncoder:
+    """The reference backend: full PyTorch sentence-transformers."""
+
+    name = "torch"
+
+    def __init__(self, model_name: str):
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(model_name)
+
+    def encode(self, texts, convert_to_numpy=True, batch_size: int = 32):
+        return self.model.encode(texts, convert_to_numpy=True, batch_size=batch_size)
+
+
+class ONNXEncoder:
+    """MiniLM on onnxruntime + the fast tokenizer: mean pooling and L2 norm done in NumPy.
+
+    Never imports torch, which is most of the resident memory of the torch
+    backend on CPU-only pods.
+    """
+
+    name = "onnx"
+
+    def __init__(self, model_path: str, tokenizer_path: str, threads: int = ONNX_THREADS):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        self.tokenizer = Tokenizer.from_file(tokenizer_path)
+        self.tokenizer.enable_truncation(ENCODER_MAX_TOKENS)
+        self.tokenizer.enable_padding(pad_id=0, pad_token="[PAD]")
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            opts.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(model_path, opts, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def encode(self, texts, convert_to_numpy=True, batch_size: int = 32):
+        if isinstance(texts, str):
+            return self.encode([texts], batch_size=batch_size)[0]
+        out = []
+        for s in range(0, len(texts), batch_size):
+            enc = self.tokenizer.encode_batch(list(texts[s:s + batch_size]))
+            feeds = {
+                "input_ids": np.array([e.ids for e in enc], dtype=np.int64),
+                "attention_mask": np.array([e.attention_mask for e in enc], dtype=np.int64),
+                "token_type_ids": np.array([e.type_ids for e in enc], dtype=np.int64),
+            }
+            hidden = self.session.run(None, {k: v for k, v in feeds.items() if k in self.input_names})[0]
+            out.append(normalize_rows(mean_pool(hidden, feeds["attention_mask"])))
+        return np.vstack(out) if out else np.empty((0, 0), dtype=np.float32)
+
+
+def _onnx_files():
+    """(model.onnx, tokenizer.json): the exported graph published with the model on the hub, unless overridden."""
+    from huggingface_hub import hf_hub_download
+
+    tokenizer = hf_hub_download(ENCODER_HF_REPO, "tokenizer.json")
+    model_path = ONNX_MODEL_PATH or hf_hub_download(ENCODER_HF_REPO, "onnx/model.onnx")
+    return model_path, tokenizer
+
+
+def _quantized_model(model_path: str) -> str:
+    """Dynamically int8-quantize the graph's weights once and reuse the result."""
+    out = os.path.join(ONNX_CACHE_DIR, "model_int8.onnx")
+    if not os.path.exists(out):
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        os.makedirs(ONNX_CACHE_DIR, exist_ok=True)
+        tmp = out + ".tmp.onnx"
+        quantize_dynamic(model_path, tmp, weight_type=QuantType.QInt8)
+        os.replace(tmp, out)
+    return out
+
+
+def load_encoder(model_name: str, backend: str = None):
+    """Build the configured encoder (KB_ENCODER_BACKEND). All backends share the ``encode(texts)`` call."""
+    backend = (backend or ENCODER_BACKEND).lower()
+    if backend == "torch":
+        return TorchEncoder(model_name)
+    if backend in ("onnx", "int8"):
+        model_path, tokenizer = _onnx_files()
+        if backend == "int8":
+            encoder = ONNXEncoder(_quantized_model(model_path), tokenizer)
+            encoder.name = "int8"
+            return encoder
+        return ONNXEncoder(model_path, tokenizer)
+    raise ValueError(f"Unknown KB encoder backend {backend!r}; choose from torch, onnx, int8.")
+
+
+def parity_report(reference, candidate, documents, queries, k: int = 5) -> dict:
+    """Compare a candidate encoder with the reference one on retrieval over the same documents.
+
+    Each encoder embeds the documents and the queries itself; reported are the
+    mean top-k overlap, the share of queries with an identical top-1 hit, the
+    mean Spearman correlation of the full document rankings (which still moves
+    on a KB smaller than k), and the worst cosine between the two encoders'
+    vectors for the same text.
+    """
+    ref_docs = normalize_rows(reference.encode(documents, convert_to_numpy=True))
+    cand_docs = normalize_rows(candidate.encode(documents, convert_to_numpy=True))
+    ref_q = normalize_rows(reference.encode(queries, convert_to_numpy=True))
+    cand_q = normalize_rows(candidate.encode(queries, convert_to_numpy=True))
+    k = min(k, len(documents))
+    ref_top = top_k_rows(ref_q @ ref_docs.T, k)[1]
+    cand_top = top_k_rows(cand_q @ cand_docs.T, k)[1]
+    overlap = [len(set(r) & set(c)) / k for r, c in zip(ref_top, cand_top)]
+    # Spearman per query: Pearson correlation of the document ranks under each encoder.
+    ref_rank = np.argsort(np.argsort(-(ref_q @ ref_docs.T), axis=1), axis=1).astype(np.float64)
+    cand_rank = np.argsort(np.argsort(-(cand_q @ cand_docs.T), axis=1), axis=1).astype(np.float64)
+    ref_rank -= ref_rank.mean(axis=1, keepdims=True)
+    cand_rank -= cand_rank.mean(axis=1, keepdims=True)
+    denom = np.sqrt((ref_rank ** 2).sum(axis=1) * (cand_rank ** 2).sum(axis=1))
+    spearman = np.divide((ref_rank * cand_rank).sum(axis=1), denom, out=np.ones_like(denom), where=denom > 0)
+    cosines = np.concatenate([(ref_docs * cand_docs).sum(axis=1), (ref_q * cand_q).sum(axis=1)])
+    return {
+        "k": k,
+        "queries": len(queries),
+        "topk_overlap": round(float(np.mean(overlap)), 4),
+        "top1_agreement": round(float(np.mean(ref_top[:, 0] == cand_top[:, 0])), 4),
+        "rank_correlation": round(float(np.mean(spearman)), 4),
+        "min_cosine": round(float(cosines.min()), 4),
+    }
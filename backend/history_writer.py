@@ -0,0 +1,202 @@
+import os
+import time
+import queue
+import threading
+from collections import deque
+from datetime import datetime
+
+try:
+    from backend.db import ChatHistory
+except Exception:
+    from db import ChatHistory
+
+# "async": /chat returns once the turn is queued. "sync": it waits for the batch containing the turn to commit.
+CHAT_HISTORY_DURABILITY = os.getenv("CHAT_HISTORY_DURABILITY", "async")
+CHAT_HISTORY_QUEUE_SIZE = int(os.getenv("CHAT_HISTORY_QUEUE_SIZE", "10000"))
+CHAT_HISTORY_BATCH_SIZE = int(os.getenv("CHAT_HISTORY_BATCH_SIZE", "200"))
+# How long a producer waits for queue space before writing its turn itself (back-pressure).
+CHAT_HISTORY_PUT_TIMEOUT = float(os.getenv("CHAT_HISTORY_PUT_TIMEOUT", "1.0"))
+CHAT_HISTORY_MAX_RETRIES = int(os.getenv("CHAT_HISTORY_MAX_RETRIES", "3"))
+
+
+class _Turn:
+    __slots__ = ("session_id", "user_message", "bot_reply", "created_at", "done")
+
+    def __init__(self, session_id, user_message, bot_reply, done=None, created_at=None):
+        self.session_id = session_id
+        self.user_message = user_message
+        self.bot_reply = bot_reply
+        # Stamped on submit, so rows keep request order however late they are flushed.
+        self.created_at = created_at or datetime.utcnow()
+        self.done = done
+
+
+class ChatHistoryWriter:
+    """Write-behind persister for ChatHistory rows.
+
+    Turns go onto a bounded queue and a background thread inserts them in
+    batched transactions (one commit per batch instead of one per request).
+    Turns that are queued but not yet committed stay visible through
+    ``pending_turns`` so "what was my last question" never misses one.
+    When the queue stays full for ``put_timeout`` the caller writes its turn
+    itself, which slows producers down to the speed of the database.
+    """
+
+    def __init__(
+        self,
+        session_factory,
+        durability: str = CHAT_HISTORY_DURABILITY,
+        maxsize: int = CHAT_HISTORY_QUEUE_SIZE,
+        batch_size: int = CHAT_HISTORY_BATCH_SIZE,
+        put_timeout: float = CHAT_HISTORY_PUT_TIMEOUT,
+    ):
+        if durability not in ("async", "sync"):
+            raise ValueError(f"Unknown chat history durability {durability!r}; choose 'async' or 'sync'.")
+        self.session_factory = session_factory
+        self.durability = durability
+        self.batch_size = batch_size
+        self.put_timeout = put_timeout
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._pending = {}  # session_id -> deque of unflushed _Turns, oldest first
+        self._lock = threading.Lock()
+        self._thread = None
+        self._closed = False
+        self.written = 0
+        self.batches = 0
+        self.failed = 0
+        self.inline_writes = 0
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._closed = False
+                self._thread = threading.Thread(target=self._run, name="chat-history-writer", daemon=True)
+                self._thread.start()
+
+    def submit(self, session_id: str, user_message: str, bot_reply: str, created_at=None):
+        """Persist a chat turn according to the durability setting. Blocking; call it off the event loop."""
+        if self._closed:
+            self._write([_Turn(session_id, user_message, bot_reply, created_at=created_at)])
+            return
+        self.start()
+        done = threading.Event() if self.durability == "sync" else None
+        turn = _Turn(session_id, user_message, bot_reply, done, created_at)
+        with self._lock:
+            self._pending.setdefault(session_id, deque()).append(turn)
+        try:
+            self._queue.put(turn, timeout=self.put_timeout)
+        except queue.Full:
+            with self._lock:
+                self.inline_writes += 1
+            self._write([turn])
+            self._forget([turn])
+            return
+        if turn.done is not None:
+            turn.done.wait()
+
+    def pending_turns(self, session_id: str):
+        """Unflushed turns of the session, oldest first, as dicts with user_message/bot_reply/created_at."""
+        with self._lock:
+            return [
+                {"user_message": t.user_message, "bot_reply": t.bot_reply, "created_at": t.created_at}
+                for t in self._pending.get(session_id, ())
+            ]
+
+    def flush(self, timeout: float = None) -> bool:
+        """Block until everything queued so far is committed. Returns False on timeout."""
+        if self._thread is None or not self._thread.is_alive():
+            return self._queue.empty()
+        marker = threading.Event()
+        self._queue.put(marker)
+        return marker.wait(timeout)
+
+    def close(self, timeout: float = 10.0):
+        """Flush the queue and stop the worker; later submits are written synchronously."""
+        flushed = self.flush(timeout)
+        self._closed = True
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout)
+        if not flushed:
+            print(f"⚠️ Chat history writer closed with {self._queue.qsize()} turns unflushed.")
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            batch, markers, stop = [], [], False
+            while True:
+                if item is None:
+                    stop = True
+                elif isinstance(item, _Turn):
+                    batch.append(item)
+                else:
+                    markers.append(item)
+                if stop or len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            if batch:
+                self._write(batch)
+                self._forget(batch)
+            for marker in markers:
+                marker.set()
+            if stop:
+                return
+
+    def _write(self, batch):
+        """Insert a batch in one transaction, retrying transient failures with backoff."""
+        for attempt in range(CHAT_HISTORY_MAX_RETRIES + 1):
+            db = self.session_factory()
+            try:
+                db.add_all([
+                    ChatHistory(
+                        session_id=t.session_id,
+                        user_message=t.user_message,
+                        bot_reply=t.bot_reply,
+                        created_at=t.created_at,
+                    )
+                    for t in batch
+                ])
+                db.commit()
+                with self._lock:
+                    self.written += len(batch)
+                    self.batches += 1
+                return
+            except Exception as e:
+                db.rollback()
+                if attempt == CHAT_HISTORY_MAX_RETRIES:
+                    print(f"❌ Dropping {len(batch)} chat history rows after {attempt + 1} attempts:", e)
+                    with self._lock:
+                        self.failed += len(batch)
+                    return
+                time.sleep(0.05 * 2 ** attempt)
+            finally:
+                db.close()
+
+    def _forget(self, batch):
+        with self._lock:
+            for turn in batch:
+                turns = self._pending.get(turn.session_id)
+                if turns is not None:
+                    try:
+                        turns.remove(turn)
+                    except ValueError:
+                        pass
+                    if not turns:
+                        del self._pending[turn.session_id]
+                if turn.done is not None:
+                    turn.done.set()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "durability": self.durability,
+                "queued": self._queue.qsize(),
+                "unflushed": sum(len(t) for t in self._pending.values()),
+                "written": self.written,
+                "batches": self.batches,
+                "failed": self.failed,
+                "inline_writes": self.inline_writes,
+            }
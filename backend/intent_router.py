@@ -0,0 +1,241 @@
+import os
+import re
+import threading
+
+import numpy as np
+
+try:
+    from backend.vector_index import normalize_rows
+except Exception:
+    from vector_index import normalize_rows
+
+# Set to 0 to keep only the session intents (last question, enrollment yes/no); everything else goes to retrieval + LLM.
+INTENT_ROUTER_ENABLED = os.getenv("INTENT_ROUTER_ENABLED", "1") == "1"
+# Minimum cosine between a message and an intent's centroid for the centroid match to count.
+INTENT_CENTROID_THRESHOLD = float(os.getenv("INTENT_CENTROID_THRESHOLD", "0.6"))
+# Messages longer than this many words are real questions; only rules apply to them.
+INTENT_CENTROID_MAX_WORDS = int(os.getenv("INTENT_CENTROID_MAX_WORDS", "12"))
+
+COURSES = ("AI Automation", "Data Science", "Agentic AI", "Generative AI")
+
+
+def normalize_message(text: str) -> str:
+    """Lowercase, collapse whitespace and drop surrounding punctuation/emoji, so rules can match whole messages."""
+    text = " ".join(text.lower().split())
+    return re.sub(r"^[^\w]+|[^\w]+$", "", text)
+
+
+class Intent:
+    __slots__ = ("name", "handler", "patterns", "examples", "threshold")
+
+    def __init__(self, name, handler, patterns=(), examples=(), threshold=None):
+        self.name = name
+        self.handler = handler
+        self.patterns = [re.compile(p) for p in patterns]
+        self.examples = list(examples)
+        self.threshold = threshold
+
+
+class RoutedReply:
+    __slots__ = ("intent", "reply", "method", "score")
+
+    def __init__(self, intent, reply, method, score=None):
+        self.intent = intent
+        self.reply = reply
+        self.method = method
+        self.score = score
+
+
+class IntentRouter:
+    """Cheap pre-retrieval classifier that answers canned/templated intents locally.
+
+    Each registered intent has full-message regex ``patterns`` (tried first, in
+    registration order) and/or ``examples`` whose mean embedding is its
+    centroid. A message no rule claims is embedded as-is with ``embed`` (the
+    cached query encoder, so retrieval reuses the vector) and assigned to the
+    nearest centroid above its threshold. ``embed_batch(texts)`` encodes all
+    examples in one call; without it they are embedded one by one. ``handler(session_id, message)`` returns the
+    reply, or None to decline; an intent without a handler is a reject class
+    that sends the message on to retrieval + LLM.
+    """
+
+    def __init__(
+        self,
+        embed=None,
+        embed_batch=None,
+        threshold: float = INTENT_CENTROID_THRESHOLD,
+        max_words: int = INTENT_CENTROID_MAX_WORDS,
+    ):
+        self.embed = embed
+        self.embed_batch = embed_batch
+        self.threshold = threshold
+        self.max_words = max_words
+        self._intents = {}
+        self._centroids = None  # (names, matrix), built on first use
+        self._lock = threading.Lock()
+        self.routed = {}
+        self.declined = {}
+        self.passed = 0
+
+    def register(self, name: str, handler=None, patterns=(), examples=(), threshold: float = None):
+        """Add or replace an intent. Replacing one rebuilds the centroids on the next message."""
+        with self._lock:
+            self._intents[name] = Intent(name, handler, patterns, examples, threshold)
+            self._centroids = None
+
+    def intent(self, name: str, patterns=(), examples=(), threshold: float = None):
+        """Decorator form of ``register`` for a handler function."""
+        def decorator(handler):
+            self.register(name, handler, patterns, examples, threshold)
+            return handler
+        return decorator
+
+    @property
+    def intents(self):
+        return list(self._intents)
+
+    def _build_centroids(self):
+        intents = [i for i in list(self._intents.values()) if i.examples]
+        if not intents:
+            return [], np.zeros((0, 0), dtype=np.float32)
+        examples = [e for i in intents for e in i.examples]
+        if self.embed_batch is not None:
+            vecs = np.asarray(self.embed_batch(examples), dtype=np.float32)
+        else:
+            vecs = np.vstack([self.embed(e) for e in examples]).astype(np.float32)
+        vecs = normalize_rows(vecs)
+        rows, start = [], 0
+        for intent in intents:
+            rows.append(vecs[start:start + len(intent.examples)].mean(axis=0))
+            start += len(intent.examples)
+        return [i.name for i in intents], normalize_rows(np.vstack(rows))
+
+    def warm(self):
+        """Build the centroids now (at startup) instead of on the first message that needs them. Blocking."""
+        if self.embed is not None:
+            self._centroids = self._build_centroids()
+
+    def _nearest(self, message: str):
+        """(intent name, cosine) of the closest centroid, or None."""
+        query = np.asarray(self.embed(message), dtype=np.float32)
+        centroids = self._centroids
+        if centroids is None or centroids[1].shape[1:] != query.shape:
+            # Built lazily (and rebuilt if the encoder changed) so the router costs nothing at import.
+            centroids = self._centroids = self._build_centroids()
+        names, matrix = centroids
+        if not names:
+            return None
+        scores = matrix @ normalize_rows(query[None, :])[0]
+        best = int(np.argmax(scores))
+        return names[best], float(scores[best])
+
+    def match(self, message: str):
+        """Classify without answering: (intent name, "rule"|"centroid", score) or None."""
+        text = normalize_message(message)
+        for intent in list(self._intents.values()):
+            if any(p.fullmatch(text) for p in intent.patterns):
+                return intent.name, "rule", None
+        if self.embed is None or not text or len(text.split()) > self.max_words:
+            return None
+        try:
+            # The raw message, as retrieval encodes it, so both share one query-cache entry.
+            nearest = self._nearest(message)
+        except Exception as e:
+            print("⚠️ Intent centroid match failed, using rules only:", e)
+            return None
+        if nearest is None:
+            return None
+        name, score = nearest
+        intent = self._intents.get(name)
+        threshold = intent.threshold if intent is not None and intent.threshold is not None else self.threshold
+        if score < threshold:
+            return None
+        return name, "centroid", score
+
+    def route(self, session_id: str, message: str):
+        """A RoutedReply if a local handler answers the message, else None (go to retrieval + LLM). Blocking."""
+        matched = self.match(message)
+        intent = self._intents.get(matched[0]) if matched else None
+        reply = intent.handler(session_id, message) if intent is not None and intent.handler is not None else None
+        with self._lock:
+            if reply is None:
+                self.passed += 1
+                if intent is not None and intent.handler is not None:
+                    self.declined[intent.name] = self.declined.get(intent.name, 0) + 1
+                return None
+            self.routed[intent.name] = self.routed.get(intent.name, 0) + 1
+        return RoutedReply(intent.name, reply, matched[1], matched[2])
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": INTENT_ROUTER_ENABLED,
+                "centroids": self.embed is not None,
+                "intents": self.intents,
+                "routed": dict(self.routed),
+                "declined": dict(self.declined),
+                "passed_to_llm": self.passed,
+                # Every routed message would otherwise have cost one retrieval and one Gemini call.
+                "llm_calls_saved": sum(self.routed.values()),
+            }
+
+
+def _canned(reply: str):
+    return lambda session_id, message: reply
+
+
+def register_default_intents(router: IntentRouter) -> IntentRouter:
+    """Session-independent intents: small talk and off-topic requests, plus the in-domain reject class."""
+    router.register(
+        "greeting",
+        _canned(
+            "Hello! 👋 I'm the Ahsan Courses assistant. Ask me about our "
+            + ", ".join(COURSES[:-1]) + f" or {COURSES[-1]} courses — duration, fees, outline or enrollment."
+        ),
+        patterns=[r"(hi+|hello+|hey+|hiya|salaa?m|as+ala+m[ou]* ?[ao]?l[ae]i?kum|good (morning|afternoon|evening))( there| bot| ahsanbot)?"],
+        examples=["hi", "hello there", "hey, how are you?", "good morning", "assalamualaikum", "hi, anyone here?"],
+    )
+    router.register(
+        "thanks",
+        _canned("You're welcome! Let me know if you have any other questions about our courses. 😊"),
+        patterns=[r"(thanks?|thank you|thanks a lot|thank you so much|thx|ty|shukriya|jazakallah( khair)?)( so much| very much)?( bot)?"],
+        examples=["thank you", "thanks a lot", "that was helpful, thanks", "great, thank you so much", "shukriya"],
+    )
+    router.register(
+        "goodbye",
+        _canned("Goodbye! 👋 Come back any time you have questions about our courses."),
+        patterns=[r"(bye+|goodbye|good bye|see you|see ya|allah hafiz|khuda hafiz)( later| soon)?"],
+        examples=["bye", "goodbye", "see you later", "that's all for now, bye", "allah hafiz"],
+    )
+    router.register(
+        "off_topic",
+        _canned(
+            "I can only help with questions about Ahsan Courses — "
+            + ", ".join(COURSES) + ". Ask me about a course's content, duration, fees or enrollment."
+        ),
+        examples=[
+            "what's the weather like today",
+            "tell me a joke",
+            "write a poem about the sea",
+            "who won the cricket match yesterday",
+            "what is the capital of france",
+            "recommend a good movie to watch",
+            "what's the bitcoin price",
+        ],
+        threshold=INTENT_CENTROID_THRESHOLD + 0.05,
+    )
+    # Reject class: anything nearest to these goes to retrieval + LLM even if it also resembles small talk.
+    router.register(
+        "course_question",
+        None,
+        examples=[
+            "tell me about the data science course",
+            "how long is the generative ai course",
+            "what are the fees for agentic ai",
+            "what will I learn in ai automation",
+            "course outline and duration",
+            "how do I enroll",
+            "is there a certificate",
+        ],
+    )
+    return router
@@ -1,94 +1,689 @@
 import os
+import re
+import sys
+import json
 import pickle
+import uuid
+import hashlib
+import threading
+from datetime import datetime, timezone
 import numpy as np
 
+try:
+    from backend.cache import LRUCache
+    from backend.lexical_index import BM25Index, reciprocal_rank_fusion
+    from backend.vector_index import INDEX_QUANT, build_index, normalize_rows, quantize_rows
+    from backend.encoders import ENCODER_BACKEND, encoder_id, load_encoder
+except Exception:
+    from cache import LRUCache
+    from lexical_index import BM25Index, reciprocal_rank_fusion
+    from vector_index import INDEX_QUANT, build_index, normalize_rows, quantize_rows
+    from encoders import ENCODER_BACKEND, encoder_id, load_encoder
+
 os.environ.setdefault("TRANSFORMERS_NO_TF", "1")
 
 KB_DIR = os.path.join(os.path.dirname(__file__), "..", "kb")
-VECTOR_STORE_PATH = os.path.join(os.path.dirname(__file__), "kb_vectors.pkl")
+# On-disk vector store: embeddings.<generation>.npy (memory-mapped at load) + documents.json sidecar + manifest.json.
+KB_STORE_DIR = os.getenv("KB_STORE_DIR", os.path.join(os.path.dirname(__file__), "kb_store"))
+STORE_FORMAT_VERSION = 2
+# float16 halves the matrix on disk and in the page cache; float32 is the default.
+STORE_DTYPE = os.getenv("KB_STORE_DTYPE", "float32")
+# Pre-v1 pickle store, migrated into KB_STORE_DIR the first time it is found.
+LEGACY_PICKLE_PATH = os.path.join(os.path.dirname(__file__), "kb_vectors.pkl")
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+# What the stored vectors were produced with; switching to the int8 encoder re-encodes the KB.
+EMBEDDING_MODEL_ID = encoder_id(EMBEDDING_MODEL_NAME)
+
+# Chunks are cut at markdown headings first, then packed by paragraph/line up to this size.
+CHUNK_MAX_CHARS = int(os.getenv("KB_CHUNK_MAX_CHARS", "800"))
+CHUNK_MIN_CHARS = int(os.getenv("KB_CHUNK_MIN_CHARS", "40"))
+
+# "hybrid" fuses BM25 and dense rankings (RRF); "lexical" skips the encoder entirely; "dense" is vector-only.
+RETRIEVAL_MODES = ("hybrid", "dense", "lexical")
+RETRIEVAL_MODE = os.getenv("KB_RETRIEVAL_MODE", "hybrid")
+# Each ranking contributes this many candidates (at least) to the fusion step.
+HYBRID_CANDIDATES = int(os.getenv("KB_HYBRID_CANDIDATES", "20"))
+
+# Normalized query text -> embedding, in front of the encoder. TTL of 0/unset means no expiry.
+QUERY_CACHE_SIZE = int(os.getenv("KB_QUERY_CACHE_SIZE", "2048"))
+QUERY_CACHE_TTL = float(os.getenv("KB_QUERY_CACHE_TTL", "0")) or None
+
+_HEADING_RE = re.compile(r"^(#{1,6})[ \t]+(.+?)[ \t]*#*[ \t]*$", re.MULTILINE)
 
 
 model = None
-nn_model = None
-documents = []
-embeddings = None
+# The live KBSnapshot. Readers take the reference once; reloads build a new one and swap it in.
+_snapshot = None
+# Serializes writers (ingest/reload); readers never take it.
+_reload_lock = threading.Lock()
+query_cache = LRUCache(QUERY_CACHE_SIZE, QUERY_CACHE_TTL)
+
+
+def _utcnow() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+class KBSnapshot:
+    """Immutable view of one loaded KB: chunks, vectors, both indexes and their provenance.
+
+    A request grabs a single snapshot (get_snapshot()) and uses only that, so
+    a concurrent reload can never hand it the documents of one KB and the
+    index of another. Everything /kb/status reports is computed here once.
+    """
+
+    __slots__ = ("documents", "metadata", "embeddings", "index", "lexical", "version", "built_at", "loaded_at", "memory")
+
+    def __init__(self, documents, metadata, embeddings, index, lexical, built_at=None):
+        self.documents = tuple(documents)
+        self.metadata = tuple(metadata)
+        self.embeddings = embeddings
+        self.index = index
+        self.lexical = lexical
+        # Content fingerprint; anything derived from retrieval results keys on it.
+        self.version = _kb_fingerprint(self.documents)
+        self.built_at = built_at
+        self.loaded_at = _utcnow()
+        self.memory = self._memory_usage()
+
+    def __len__(self):
+        return len(self.documents)
+
+    def _memory_usage(self) -> dict:
+        heap = mapped = 0
+        seen = set()
+        for arr in [self.embeddings, *self.index.arrays(), *self.lexical.arrays()]:
+            if arr is None or id(arr) in seen:
+                continue
+            seen.add(id(arr))
+            if isinstance(arr, np.memmap):
+                mapped += arr.nbytes
+            else:
+                heap += arr.nbytes
+        # Python-object overhead of the chunk text and metadata (approximate, shallow per dict).
+        heap += sum(sys.getsizeof(d) for d in self.documents)
+        heap += sum(sys.getsizeof(m) for m in self.metadata)
+        return {"heap_bytes": heap, "mapped_bytes": mapped}
+
+    def status(self) -> dict:
+        return {
+            "loaded": True,
+            "version": self.version,
+            "documents": len(self.documents),
+            "sources": len({m.get("source") for m in self.metadata}),
+            "index": self.index.name,
+            "built_at": self.built_at,
+            "loaded_at": self.loaded_at,
+            "memory": self.memory,
+        }
+
+
+def _split_sections(text: str):
+    """Split markdown into (start, end, heading_trail) sections at heading lines."""
+    sections = []
+    trail = []
+    start = 0
+    current_trail = []
+    for m in _HEADING_RE.finditer(text):
+        if m.start() > start:
+            sections.append((start, m.start(), list(current_trail)))
+        level = len(m.group(1))
+        trail = [h for h in trail if h[0] < level] + [(level, m.group(2).strip())]
+        current_trail = [h[1] for h in trail]
+        start = m.start()
+    if start < len(text):
+        sections.append((start, len(text), list(current_trail)))
+    return sections
+
+
+_SPLIT_SEPARATORS = (re.compile(r"\n[ \t]*\n"), re.compile(r"\n"))
+
+
+def _atomic_pieces(text: str, start: int, end: int, max_chars: int, level: int = 0):
+    """Break text[start:end] at paragraphs, then lines, then hard cuts until every piece fits max_chars."""
+    if end - start <= max_chars:
+        return [(start, end)]
+    if level >= len(_SPLIT_SEPARATORS):
+        return [(s, min(s + max_chars, end)) for s in range(start, end, max_chars)]
+
+    pieces = []
+    pos = start
+    for m in _SPLIT_SEPARATORS[level].finditer(text, start, end):
+        pieces.append((pos, m.end()))
+        pos = m.end()
+    if pos < end:
+        pieces.append((pos, end))
+
+    out = []
+    for p_start, p_end in pieces:
+        out.extend(_atomic_pieces(text, p_start, p_end, max_chars, level + 1))
+    return out
+
+
+def _pack_pieces(text: str, start: int, end: int, max_chars: int):
+    """Greedily pack the atomic pieces of text[start:end] into spans <= max_chars."""
+    spans = []
+    cur_start = cur_end = None
+    for p_start, p_end in _atomic_pieces(text, start, end, max_chars):
+        if cur_start is None:
+            cur_start, cur_end = p_start, p_end
+        elif p_end - cur_start <= max_chars:
+            cur_end = p_end
+        else:
+            spans.append((cur_start, cur_end))
+            cur_start, cur_end = p_start, p_end
+    if cur_start is not None:
+        spans.append((cur_start, cur_end))
+    return spans
+
+
+def chunk_markdown(text: str, source: str, max_chars: int = CHUNK_MAX_CHARS, min_chars: int = CHUNK_MIN_CHARS):
+    """Split a markdown document into heading- and size-aware chunks.
+
+    Each chunk is a dict with the chunk ``text``, its ``source`` file, the
+    ``start``/``end`` character offsets into that file and the ``heading`` trail
+    it sits under. Sections that are only a heading (or shorter than
+    ``min_chars``) are merged into the following section.
+    """
+    chunks = []
+    pending_start = None
+    for sec_start, sec_end, trail in _split_sections(text):
+        if pending_start is not None:
+            sec_start = pending_start
+            pending_start = None
+        if len(text[sec_start:sec_end].strip()) < min_chars and sec_end < len(text):
+            pending_start = sec_start
+            continue
+        for s, e in _pack_pieces(text, sec_start, sec_end, max_chars):
+            body = text[s:e]
+            stripped = body.strip()
+            if not stripped:
+                continue
+            # Tighten offsets to the stripped text so they point at real content.
+            s += len(body) - len(body.lstrip())
+            chunks.append({
+                "text": stripped,
+                "source": source,
+                "start": s,
+                "end": s + len(stripped),
+                "heading": " > ".join(trail),
+            })
+    return chunks
+
+
+def _embedding_text(chunk: dict) -> str:
+    """Text fed to the encoder: the heading trail gives sub-chunks their section context."""
+    heading = chunk.get("heading") or ""
+    if heading and not chunk["text"].startswith("#"):
+        return f"{heading}\n{chunk['text']}"
+    return chunk["text"]
+
+
+def _get_model():
+    global model
+    if model is None:
+        model = load_encoder(EMBEDDING_MODEL_NAME)
+        print(f"🧠 Loaded {ENCODER_BACKEND} encoder for {EMBEDDING_MODEL_NAME}.")
+        query_cache.clear()
+    return model
+
+
+def _normalize_query(query: str) -> str:
+    # MiniLM's tokenizer is uncased, so lowercasing does not change the embedding.
+    return " ".join(query.lower().split())
+
+
+def encode_queries(queries):
+    """Embed many queries: cache hits are reused, all misses go through one encoder batch."""
+    keys = [_normalize_query(q) for q in queries]
+    vecs = [query_cache.get(k) for k in keys]
+    missing = list(dict.fromkeys(k for k, v in zip(keys, vecs) if v is None))
+    if missing:
+        encoded = dict(zip(missing, _get_model().encode(missing, convert_to_numpy=True)))
+        for k, v in encoded.items():
+            v.setflags(write=False)
+            query_cache.put(k, v)
+        vecs = [encoded[k] if v is None else v for k, v in zip(keys, vecs)]
+    return np.vstack(vecs) if vecs else np.empty((0, 0), dtype=np.float32)
+
+
+def encode_query(query: str):
+    """Embed a query, serving repeats from the LRU query cache."""
+    return encode_queries([query])[0]
+
+
+def warm_encoder():
+    """Load the sentence encoder and run one encode so the first real query pays no setup cost."""
+    _get_model().encode(["warmup"], convert_to_numpy=True)
+
+
+def _file_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _kb_fingerprint(docs) -> str:
+    h = hashlib.sha256(EMBEDDING_MODEL_ID.encode("utf-8"))
+    for d in docs:
+        h.update(b"\0")
+        h.update(d.encode("utf-8"))
+    return h.hexdigest()[:16]
+
+
+def get_kb_version():
+    """Fingerprint of the currently loaded KB (None until one is loaded)."""
+    snap = _snapshot
+    return snap.version if snap is not None else None
+
+
+def _store_path(name: str) -> str:
+    return os.path.join(KB_STORE_DIR, name)
+
+
+def _atomic_write(path: str, write):
+    """Write via a temp file + os.replace so readers (and live mmaps) never see a partial file."""
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        write(f)
+    os.replace(tmp, path)
+
+
+def _load_manifest():
+    path = _store_path("manifest.json")
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print("⚠️ KB manifest unreadable, doing a full re-ingest:", e)
+        return None
+
+
+def ingested_files():
+    """{file name: (path, sha256)} of the markdown files in the built store; empty before the first ingest."""
+    manifest = _load_manifest() or {}
+    return {fname: (os.path.join(KB_DIR, fname), entry.get("sha256")) for fname, entry in manifest.get("files", {}).items()}
 
 
-def ingest_kb():
-    global nn_model, documents, embeddings
+def _write_manifest(manifest: dict):
+    os.makedirs(KB_STORE_DIR, exist_ok=True)
+    data = json.dumps(manifest, indent=2, sort_keys=True).encode("utf-8")
+    _atomic_write(_store_path("manifest.json"), lambda f: f.write(data))
+
+
+def _build_lexical(docs, metas):
+    return BM25Index.build([_embedding_text({"text": d, **m}) for d, m in zip(docs, metas)])
+
+
+# Data files are named after the store generation, so a sidecar can only ever pair with the files written with it.
+def _matrix_path(generation: str) -> str:
+    return _store_path(f"embeddings.{generation}.npy")
+
+
+def _lexical_path(generation: str) -> str:
+    return _store_path(f"lexical.{generation}.npz")
+
+
+def _quant_paths(generation: str):
+    return (
+        _store_path(f"embeddings.{generation}.{INDEX_QUANT}.npy"),
+        _store_path(f"embeddings.{generation}.{INDEX_QUANT}.scales.npy"),
+    )
+
+
+def _remove_other_generations(generation: str):
+    """Delete data files of earlier stores (and of pre-generation layouts) once the sidecar points past them."""
+    for name in os.listdir(KB_STORE_DIR):
+        if name.startswith(("embeddings.", "lexical.")) and f".{generation}." not in name and not name.endswith(".tmp"):
+            os.remove(_store_path(name))
+
+
+def _write_quantized(embs, generation: str):
+    """Write the compact scan copy (KB_INDEX_QUANT) next to the matrix; returns (codes, scales) or (None, None)."""
+    if INDEX_QUANT == "none":
+        return None, None
+    codes, scales = quantize_rows(np.asarray(embs, dtype=np.float32), INDEX_QUANT)
+    codes_path, scales_path = _quant_paths(generation)
+    _atomic_write(codes_path, lambda f: np.save(f, codes))
+    if scales is not None:
+        _atomic_write(scales_path, lambda f: np.save(f, scales))
+    return codes, scales
+
+
+def _read_quantized(count: int, generation: str):
+    """Memory-map the stored compact scan copy, or (None, None) if absent or not for this matrix."""
+    codes_path, scales_path = _quant_paths(generation)
+    if INDEX_QUANT == "none" or not os.path.exists(codes_path):
+        return None, None
+    codes = np.load(codes_path, mmap_mode="r")
+    scales = np.load(scales_path, mmap_mode="r") if os.path.exists(scales_path) else None
+    if codes.shape[0] != count or (INDEX_QUANT == "int8" and (scales is None or scales.shape[0] != count)):
+        return None, None
+    return codes, scales
+
+
+def _write_store(docs, embs, metas, lexical=None, built_at=None, generation=None):
+    """Persist the KB as an embeddings matrix, a BM25 lexical index and a JSON documents/metadata sidecar.
+
+    Every data file carries ``generation`` in its name and the sidecar records it,
+    as does the manifest written after the store (see _ingest_kb).
+    Returns the (codes, scales) of the compact scan copy, if KB_INDEX_QUANT enables one.
+    """
+    os.makedirs(KB_STORE_DIR, exist_ok=True)
+    generation = generation or uuid.uuid4().hex
+    matrix = np.ascontiguousarray(embs, dtype=STORE_DTYPE)
+    _atomic_write(_matrix_path(generation), lambda f: np.save(f, matrix))
+    quantized = _write_quantized(embs, generation)
+    lexical = lexical or _build_lexical(docs, metas)
+    _atomic_write(_lexical_path(generation), lexical.save)
+    sidecar = {
+        "version": STORE_FORMAT_VERSION,
+        "model": EMBEDDING_MODEL_ID,
+        "dtype": str(matrix.dtype),
+        "count": int(matrix.shape[0]),
+        "dim": int(matrix.shape[1]),
+        "quant": INDEX_QUANT,
+        "built_at": built_at or _utcnow(),
+        "generation": generation,
+        "documents": list(docs),
+        "metadata": list(metas),
+    }
+    # The sidecar is written last: switching it to the new generation is what publishes the new files.
+    data = json.dumps(sidecar, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    _atomic_write(_store_path("documents.json"), lambda f: f.write(data))
+    _remove_other_generations(generation)
+    return quantized
+
+
+def _migrate_legacy_pickle():
+    """One-time conversion of the old kb_vectors.pkl store into the mmap format."""
+    print("🔁 Migrating legacy KB pickle to the memory-mapped store...")
+    with open(LEGACY_PICKLE_PATH, "rb") as f:
+        stored = pickle.load(f)
+    if len(stored) == 2:
+        # Pre-chunking stores hold one whole file per row and no metadata.
+        docs, embs = stored
+        metas = [{"source": None, "start": 0, "end": len(d), "heading": ""} for d in docs]
+    else:
+        docs, embs, metas = stored
+    generation = uuid.uuid4().hex
+    _write_store(docs, normalize_rows(embs), metas, generation=generation)
+    legacy_manifest = os.path.join(os.path.dirname(LEGACY_PICKLE_PATH), "kb_manifest.json")
+    if os.path.exists(legacy_manifest):
+        with open(legacy_manifest, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        # Its row ranges describe the rows just migrated.
+        _write_manifest({**manifest, "generation": generation})
+        os.remove(legacy_manifest)
+    os.replace(LEGACY_PICKLE_PATH, LEGACY_PICKLE_PATH + ".migrated")
+    print(f"✅ Migrated {len(docs)} rows into {KB_STORE_DIR}.")
+
+
+def _read_stored_kb():
+    """Return (documents, embeddings, metadata, built_at, generation) from the vector store, or None.
+
+    The embeddings come back as a read-only memory map, so loading is O(1) in
+    the matrix size and pages are shared between processes via the OS cache.
+    """
+    sidecar_path = _store_path("documents.json")
+    if not os.path.exists(sidecar_path):
+        if not os.path.exists(LEGACY_PICKLE_PATH):
+            return None
+        _migrate_legacy_pickle()
+    with open(sidecar_path, "r", encoding="utf-8") as f:
+        sidecar = json.load(f)
+    if sidecar.get("version") != STORE_FORMAT_VERSION:
+        print(f"⚠️ KB store version {sidecar.get('version')} not supported (expected {STORE_FORMAT_VERSION}).")
+        return None
+    if sidecar.get("model") != EMBEDDING_MODEL_ID:
+        # Its vectors live in another encoder's space; searching them with this encoder's queries is meaningless.
+        print(f"⚠️ KB store was built with {sidecar.get('model')}, but the encoder is {EMBEDDING_MODEL_ID}.")
+        return None
+    matrix_path = _matrix_path(sidecar["generation"])
+    if not os.path.exists(matrix_path):
+        print("⚠️ KB store is inconsistent (matrix for this sidecar missing). Re-run ingest_kb().")
+        return None
+    embs = np.load(matrix_path, mmap_mode="r")
+    if embs.shape[0] != sidecar["count"]:
+        print("⚠️ KB store is inconsistent (matrix/sidecar row counts differ). Re-run ingest_kb().")
+        return None
+    return sidecar["documents"], embs, sidecar["metadata"], sidecar.get("built_at"), sidecar["generation"]
+
+
+def ingest_kb(full: bool = False):
+    """(Re)build the vector store, only encoding KB files that were added or changed.
+
+    A manifest next to the vector store records each file's mtime, content hash
+    and the row range its chunks occupy, so unchanged files keep their vectors.
+    Pass ``full=True`` to re-encode everything. Returns a report dict.
+    The new KB is swapped in atomically once it is fully built.
+    """
+    with _reload_lock:
+        return _ingest_kb(full)
+
+
+def _ingest_kb(full: bool):
+    global _snapshot
     print("📘 Ingesting Knowledge Base...")
 
-    docs = []
-    for fname in os.listdir(KB_DIR):
-        if fname.endswith(".md"):
-            with open(os.path.join(KB_DIR, fname), "r", encoding="utf-8") as f:
-                text = f.read()
-                docs.append(text)
+    fnames = sorted(f for f in os.listdir(KB_DIR) if f.endswith(".md"))
+    if not fnames:
+        raise ValueError("No KB markdown files found in kb/ folder!")
+
+    manifest = None if full else _load_manifest()
+    stored = None
+    if manifest and manifest.get("model") == EMBEDDING_MODEL_ID:
+        try:
+            stored = _read_stored_kb()
+        except Exception as e:
+            print("⚠️ Existing vector store unreadable, doing a full re-ingest:", e)
+    if stored is not None and stored[4] != manifest.get("generation"):
+        # The store was rewritten but the manifest was not (crash in between): its row ranges
+        # would pair files with another file's chunks.
+        print("⚠️ KB manifest does not match the vector store, doing a full re-ingest.")
+        stored = None
+    if stored is None:
+        manifest = None
+    old_files = manifest["files"] if manifest else {}
+
+    report = {"added": [], "changed": [], "unchanged": [], "removed": [], "encoded_chunks": 0}
+    # Per file: (chunks, embeddings or None if it still needs encoding, manifest entry)
+    plan = []
+    for fname in fnames:
+        path = os.path.join(KB_DIR, fname)
+        mtime = os.path.getmtime(path)
+        old = old_files.get(fname)
+        if old and old.get("mtime") == mtime:
+            # Same mtime: trust the manifest without re-reading the file.
+            rows = slice(*old["rows"])
+            chunks = [{"text": d, **m} for d, m in zip(stored[0][rows], stored[2][rows])]
+            plan.append((chunks, stored[1][rows], dict(old)))
+            report["unchanged"].append(fname)
+            continue
+
+        with open(path, "rb") as f:
+            raw = f.read()
+        digest = _file_hash(raw)
+        if old and old.get("sha256") == digest:
+            rows = slice(*old["rows"])
+            chunks = [{"text": d, **m} for d, m in zip(stored[0][rows], stored[2][rows])]
+            plan.append((chunks, stored[1][rows], {**old, "mtime": mtime}))
+            report["unchanged"].append(fname)
+            continue
+
+        chunks = chunk_markdown(raw.decode("utf-8"), fname)
+        plan.append((chunks, None, {"mtime": mtime, "sha256": digest}))
+        report["changed" if old else "added"].append(fname)
+
+    report["removed"] = sorted(set(old_files) - set(fnames))
+
+    to_encode = [c for chunks, embs, _ in plan if embs is None for c in chunks]
+    if to_encode:
+        fresh = _get_model().encode([_embedding_text(c) for c in to_encode], convert_to_numpy=True)
+        report["encoded_chunks"] = len(to_encode)
+    else:
+        fresh = None
+
+    all_chunks, parts = [], []
+    offset = 0
+    for chunks, embs, entry in plan:
+        if embs is None:
+            embs = fresh[offset:offset + len(chunks)]
+            offset += len(chunks)
+        entry["rows"] = [len(all_chunks), len(all_chunks) + len(chunks)]
+        entry["chunks"] = len(chunks)
+        all_chunks.extend(chunks)
+        if chunks:
+            parts.append(np.asarray(embs, dtype=np.float32))
+    files = {fname: entry for fname, (_, _, entry) in zip(fnames, plan)}
 
-    if not docs:
+    if not all_chunks:
         raise ValueError("No KB markdown files found in kb/ folder!")
 
-    global model
-    from sentence_transformers import SentenceTransformer
-    from sklearn.neighbors import NearestNeighbors
+    # Rows are stored unit-norm so the exact index can search the memmap without a copy.
+    embeddings = normalize_rows(np.vstack(parts))
+    documents = [c["text"] for c in all_chunks]
+    metadata = [{k: v for k, v in c.items() if k != "text"} for c in all_chunks]
+    lexical = _build_lexical(documents, metadata)
 
-    model = SentenceTransformer("all-MiniLM-L6-v2")
+    changed = report["added"] or report["changed"] or report["removed"] or manifest is None
+    built_at = _utcnow() if changed or _snapshot is None else _snapshot.built_at
+    if changed:
+        generation = uuid.uuid4().hex
+        codes, scales = _write_store(documents, embeddings, metadata, lexical, built_at=built_at, generation=generation)
+    else:
+        generation = stored[4]
+        codes, scales = _read_quantized(len(embeddings), generation)
+    _write_manifest({"model": EMBEDDING_MODEL_ID, "generation": generation, "files": files})
 
-   
-    embeddings = model.encode(docs, convert_to_numpy=True)
+    index = build_index(embeddings, quant=INDEX_QUANT, codes=codes, scales=scales)
+    snap = KBSnapshot(documents, metadata, embeddings, index, lexical, built_at=built_at)
+    _snapshot = snap
+    query_cache.clear()
 
-    
-    nn_model = NearestNeighbors(n_neighbors=3, metric="cosine")
-    nn_model.fit(embeddings)
-    documents = docs
+    report["total_chunks"] = len(snap)
+    report["kb_version"] = snap.version
+    print(
+        f"✅ KB ingested: {len(snap)} chunks from {len(fnames)} files "
+        f"(added {len(report['added'])}, changed {len(report['changed'])}, "
+        f"removed {len(report['removed'])}, unchanged {len(report['unchanged'])}; "
+        f"encoded {report['encoded_chunks']} chunks)."
+    )
+    return report
 
-    
-    with open(VECTOR_STORE_PATH, "wb") as f:
-        pickle.dump((docs, embeddings), f)
 
-    print("✅ KB ingested and saved without FAISS!")
+def _load_lexical(docs, metas, generation: str):
+    path = _lexical_path(generation)
+    lexical = BM25Index.load(path) if os.path.exists(path) else None
+    if lexical is None or len(lexical) != len(docs):
+        print("⚠️ Lexical index missing or stale; rebuilding it from the stored chunks.")
+        lexical = _build_lexical(docs, metas)
+    return lexical
 
 
 def load_kb():
-    global nn_model, documents, embeddings
-    if os.path.exists(VECTOR_STORE_PATH):
-        from sklearn.neighbors import NearestNeighbors
-
-        with open(VECTOR_STORE_PATH, "rb") as f:
-            docs, embs = pickle.load(f)
-            documents = docs
-            embeddings = embs
-            nn_model = NearestNeighbors(n_neighbors=3, metric="cosine")
-            nn_model.fit(embeddings)
-        print("✅ KB loaded successfully (using sklearn NearestNeighbors).")
-    else:
-        print("⚠️ No KB found. Run ingest_kb() first.")
+    """Load the on-disk store into a new snapshot and swap it in. Returns the snapshot, or None.
 
+    A store built by another encoder (e.g. after switching KB_ENCODER_BACKEND) or
+    in an older format is re-ingested first.
+    """
+    global _snapshot
+    with _reload_lock:
+        stored = _read_stored_kb()
+        if stored is None and os.path.exists(_store_path("documents.json")):
+            # A store this process cannot serve (other encoder or format): rebuild it from the KB files.
+            print("🔁 Re-ingesting the KB into a store this version can serve...")
+            try:
+                _ingest_kb(full=True)
+            except ValueError as e:
+                print("⚠️ KB re-ingest failed:", e)
+                return None
+            return _snapshot
+        if stored is None:
+            print("⚠️ No KB found. Run ingest_kb() first.")
+            return None
+        documents, embeddings, metadata, built_at, generation = stored
+        codes, scales = _read_quantized(len(embeddings), generation)
+        snap = KBSnapshot(
+            documents,
+            metadata,
+            embeddings,
+            build_index(embeddings, quant=INDEX_QUANT, codes=codes, scales=scales),
+            _load_lexical(documents, metadata, generation),
+            built_at=built_at,
+        )
+        _snapshot = snap
+    print(f"✅ KB loaded successfully ({len(snap)} chunks, {snap.index.name} index, version {snap.version}).")
+    return snap
 
-def get_relevant_docs(query: str, top_k: int = 3):
-    """Return the top_k most relevant documents from the KB for a query."""
-    global nn_model, documents, embeddings
-    
-    if nn_model is None or not documents:
-        load_kb()
-        if nn_model is None:
-       
-            print("⚠️ KB not available: returning empty context for query.")
-            return []
-
-    
-    global model
-    if model is None:
-        from sentence_transformers import SentenceTransformer
 
-        model = SentenceTransformer("all-MiniLM-L6-v2")
+def get_snapshot(load: bool = True):
+    """Return the live KB snapshot, loading it from disk on first use unless ``load`` is False."""
+    snap = _snapshot
+    if snap is None and load:
+        snap = load_kb()
+    return snap
+
+
+def _hits_to_chunks(snap, scores, indices, with_vectors: bool = False):
+    results = []
+    for score, i in zip(scores, indices):
+        if i < 0:
+            continue
+        chunk = {"text": snap.documents[i], **snap.metadata[i], "score": float(score)}
+        if with_vectors:
+            # Taken from the same snapshot as the text, so it always matches the chunk.
+            chunk["vector"] = np.asarray(snap.embeddings[i], dtype=np.float32)
+        results.append(chunk)
+    return results
+
+
+def _resolve_mode(mode: str = None) -> str:
+    mode = (mode or RETRIEVAL_MODE).lower()
+    if mode not in RETRIEVAL_MODES:
+        raise ValueError(f"Unknown retrieval mode {mode!r}; choose from {list(RETRIEVAL_MODES)}.")
+    return mode
+
 
-    query_vec = model.encode([query], convert_to_numpy=True)
-    distances, indices = nn_model.kneighbors(query_vec, n_neighbors=min(top_k, len(documents)))
+def get_relevant_chunks_batch(queries, top_k: int = 3, mode: str = None, with_vectors: bool = False):
+    """Search many queries at once: one encoder batch and one index search for the whole list.
 
-    results = [documents[i] for i in indices[0]]
+    ``mode`` is "hybrid" (BM25 + dense, reciprocal-rank fused), "dense" or
+    "lexical" (BM25 only, never touches the encoder); defaults to KB_RETRIEVAL_MODE.
+    ``with_vectors`` adds each chunk's stored embedding under "vector" (for context packing).
+    """
+    mode = _resolve_mode(mode)
+    if not queries:
+        return []
+    snap = get_snapshot()
+    if snap is None or not len(snap):
+        print("⚠️ KB not available: returning empty context for query.")
+        return [[] for _ in queries]
+    if mode == "lexical":
+        scores, indices = snap.lexical.search(queries, top_k)
+        return [_hits_to_chunks(snap, s, i, with_vectors) for s, i in zip(scores, indices)]
+
+    n_cand = top_k if mode == "dense" else max(top_k, HYBRID_CANDIDATES)
+    scores, indices = snap.index.search(encode_queries(queries), n_cand)
+    if mode == "dense":
+        return [_hits_to_chunks(snap, s, i, with_vectors) for s, i in zip(scores, indices)]
+
+    lex_indices = snap.lexical.search(queries, n_cand)[1]
+    results = []
+    for dense_row, lex_row in zip(indices, lex_indices):
+        fused = reciprocal_rank_fusion([dense_row, lex_row])[:top_k]
+        results.append(_hits_to_chunks(snap, [score for _, score in fused], [i for i, _ in fused], with_vectors))
     return results
 
 
+def get_relevant_chunks(query: str, top_k: int = 3, mode: str = None, with_vectors: bool = False):
+    """Return the top_k most relevant chunks as dicts with text, source, offsets, heading and score."""
+    return get_relevant_chunks_batch([query], top_k=top_k, mode=mode, with_vectors=with_vectors)[0]
+
+
+def get_relevant_docs(query: str, top_k: int = 3):
+    """Return the top_k most relevant chunk texts from the KB for a query."""
+    return [c["text"] for c in get_relevant_chunks(query, top_k=top_k)]
+
+
 if __name__ == "__main__":
-    ingest_kb()
+    ingest_kb(full="--full" in sys.argv[1:])
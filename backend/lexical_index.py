@@ -0,0 +1,127 @@
+import re
+import numpy as np
+
+try:
+    from backend.vector_index import top_k_rows
+except Exception:
+    from vector_index import top_k_rows
+
+LEXICAL_FORMAT_VERSION = 1
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:[.\-][a-z0-9]+)*")
+# Kept short on purpose: course names like "AI" or "Data" must stay searchable.
+_STOPWORDS = frozenset(
+    "a an and are as at be by do does for from how i in is it me my of on or that the this to what when "
+    "where which who why will with you your".split()
+)
+
+
+def tokenize(text: str):
+    """Lower-case word tokens; dotted/hyphenated codes and prices (e.g. ds-101, 49.99) stay whole."""
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in _STOPWORDS]
+
+
+class BM25Index:
+    """Okapi BM25 over the KB chunks, stored as a CSR-style inverted index.
+
+    Per-posting BM25 weights are precomputed at build time, so a query is just
+    a gather-and-add over the postings of its terms (no encoder involved).
+    """
+
+    name = "bm25"
+
+    def __init__(self, terms, offsets, doc_ids, weights, n_docs: int):
+        self.terms = list(terms)
+        self.term_ids = {t: i for i, t in enumerate(self.terms)}
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.doc_ids = np.asarray(doc_ids, dtype=np.int32)
+        self.weights = np.asarray(weights, dtype=np.float32)
+        self.n_docs = int(n_docs)
+
+    @classmethod
+    def build(cls, texts, k1: float = 1.5, b: float = 0.75):
+        postings = {}
+        doc_lens = np.zeros(len(texts), dtype=np.float32)
+        for doc, text in enumerate(texts):
+            tokens = tokenize(text)
+            doc_lens[doc] = len(tokens)
+            counts = {}
+            for tok in tokens:
+                counts[tok] = counts.get(tok, 0) + 1
+            for tok, tf in counts.items():
+                postings.setdefault(tok, []).append((doc, tf))
+
+        n = len(texts)
+        avgdl = float(doc_lens.mean()) if n else 0.0
+        terms = sorted(postings)
+        offsets = [0]
+        doc_ids, weights = [], []
+        for term in terms:
+            plist = postings[term]
+            idf = np.log(1.0 + (n - len(plist) + 0.5) / (len(plist) + 0.5))
+            for doc, tf in plist:
+                norm = tf + k1 * (1.0 - b + b * doc_lens[doc] / (avgdl or 1.0))
+                doc_ids.append(doc)
+                weights.append(idf * tf * (k1 + 1.0) / norm)
+            offsets.append(len(doc_ids))
+        return cls(terms, offsets, doc_ids, weights, n)
+
+    def __len__(self):
+        return self.n_docs
+
+    def arrays(self):
+        return [self.offsets, self.doc_ids, self.weights]
+
+    def score(self, query: str):
+        scores = np.zeros(self.n_docs, dtype=np.float32)
+        for tok in tokenize(query):
+            t = self.term_ids.get(tok)
+            if t is None:
+                continue
+            s, e = self.offsets[t], self.offsets[t + 1]
+            np.add.at(scores, self.doc_ids[s:e], self.weights[s:e])
+        return scores
+
+    def search(self, queries, k: int):
+        """Return (scores, indices) like the vector indexes; rows with no term overlap are padded with -1."""
+        if isinstance(queries, str):
+            queries = [queries]
+        k = min(k, self.n_docs)
+        scores = np.zeros((len(queries), k), dtype=np.float32)
+        indices = np.full((len(queries), k), -1, dtype=np.int64)
+        for i, q in enumerate(queries):
+            s, j = top_k_rows(self.score(q)[None, :], k)
+            hit = s[0] > 0
+            n = int(hit.sum())
+            scores[i, :n] = s[0][hit]
+            indices[i, :n] = j[0][hit]
+        return scores, indices
+
+    def save(self, f):
+        np.savez(
+            f,
+            version=np.array(LEXICAL_FORMAT_VERSION),
+            n_docs=np.array(self.n_docs),
+            terms=np.array(self.terms, dtype=str),
+            offsets=self.offsets,
+            doc_ids=self.doc_ids,
+            weights=self.weights,
+        )
+
+    @classmethod
+    def load(cls, path: str):
+        with np.load(path, allow_pickle=False) as data:
+            if int(data["version"]) != LEXICAL_FORMAT_VERSION:
+                return None
+            return cls(data["terms"].tolist(), data["offsets"], data["doc_ids"], data["weights"], int(data["n_docs"]))
+
+
+def reciprocal_rank_fusion(rankings, k: int = 60):
+    """Fuse ranked lists of row ids: score(d) = sum over lists of 1 / (k + rank). Returns [(id, score)] best first."""
+    fused = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking):
+            if doc < 0:
+                continue
+            fused[int(doc)] = fused.get(int(doc), 0.0) + 1.0 / (k + rank + 1)
+    return sorted(fused.items(), key=lambda kv: kv[1], reverse=True)
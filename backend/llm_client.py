@@ -1,10 +1,27 @@
 import os
-import google.generativeai as genai
+import time
+import random
+import asyncio
+import threading
 from dotenv import load_dotenv
 
 load_dotenv()
 
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+_genai = None
+_genai_lock = threading.Lock()
+
+
+def _get_genai():
+    """Import and configure google.generativeai on first use; it costs ~1s of import time."""
+    global _genai
+    if _genai is None:
+        with _genai_lock:
+            if _genai is None:
+                import google.generativeai as genai
+
+                genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+                _genai = genai
+    return _genai
 
 
 def _extract_text_from_genai_resp(resp) -> str:
@@ -32,17 +49,44 @@ def _extract_text_from_genai_resp(resp) -> str:
         return str(resp)
 
 
-def generate_gemini_response(user_input, context):
-    
-    if os.getenv("GEMINI_API_KEY") in (None, "", "None"):
-        return "[GEMINI_API_KEY not configured — set it in .env to enable live responses]"
-    
-    try:
-        
-        model = genai.GenerativeModel('gemini-2.5-flash')
-        
-        
-        prompt = f"""You are Ahsan Courses AI Chatbot assistant. You help users learn about our AI courses.
+GEMINI_MODEL_NAME = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
+# Max Gemini calls in flight per process; callers beyond this queue (within their deadline).
+LLM_MAX_IN_FLIGHT = int(os.getenv("LLM_MAX_IN_FLIGHT", "16"))
+# Overall per-call deadline in seconds, covering queueing, retries and backoff.
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "30"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))
+# Consecutive failed calls that open the circuit, and how long it stays open before a trial call.
+LLM_BREAKER_THRESHOLD = int(os.getenv("LLM_BREAKER_THRESHOLD", "5"))
+LLM_BREAKER_RESET = float(os.getenv("LLM_BREAKER_RESET", "30"))
+
+_GENERATION_CONFIG = dict(
+    temperature=0.7,
+    top_p=0.8,
+    top_k=40,
+    max_output_tokens=2048,
+)
+
+_SAFETY_SETTINGS = [
+    {
+        "category": "HARM_CATEGORY_HARASSMENT",
+        "threshold": "BLOCK_MEDIUM_AND_ABOVE"
+    },
+    {
+        "category": "HARM_CATEGORY_HATE_SPEECH",
+        "threshold": "BLOCK_MEDIUM_AND_ABOVE"
+    },
+    {
+        "category": "HARM_CATEGORY_SEXUALLY_EXPLICIT",
+        "threshold": "BLOCK_MEDIUM_AND_ABOVE"
+    },
+    {
+        "category": "HARM_CATEGORY_DANGEROUS_CONTENT",
+        "threshold": "BLOCK_MEDIUM_AND_ABOVE"
+    },
+]
+
+_PROMPT_TEMPLATE = """You are Ahsan Courses AI Chatbot assistant. You help users learn about our AI courses.
         You ONLY answer questions about these course categories:
         - AI Automation
         - Data Science
@@ -61,43 +105,396 @@ def generate_gemini_response(user_input, context):
 
         Use this course context to answer accurately:
         {context}
-
+{history}
         User Question: {user_input}
         """
 
-        
-        response = model.generate_content(
-            prompt,
-            generation_config=genai.types.GenerationConfig(
-                temperature=0.7,
-                top_p=0.8,
-                top_k=40,
-                max_output_tokens=2048,
-            ),
-            safety_settings=[
-                {
-                    "category": "HARM_CATEGORY_HARASSMENT",
-                    "threshold": "BLOCK_MEDIUM_AND_ABOVE"
-                },
-                {
-                    "category": "HARM_CATEGORY_HATE_SPEECH",
-                    "threshold": "BLOCK_MEDIUM_AND_ABOVE"
-                },
-                {
-                    "category": "HARM_CATEGORY_SEXUALLY_EXPLICIT",
-                    "threshold": "BLOCK_MEDIUM_AND_ABOVE"
-                },
-                {
-                    "category": "HARM_CATEGORY_DANGEROUS_CONTENT",
-                    "threshold": "BLOCK_MEDIUM_AND_ABOVE"
-                },
-            ]
+_HISTORY_TEMPLATE = """
+        Conversation so far (use it to resolve follow-up questions):
+        {history}
+"""
+
+_MISSING_KEY_REPLY = "[GEMINI_API_KEY not configured — set it in .env to enable live responses]"
+
+
+def _api_key_missing() -> bool:
+    return os.getenv("GEMINI_API_KEY") in (None, "", "None")
+
+
+def _build_prompt(user_input, context, history=""):
+    history = _HISTORY_TEMPLATE.format(history=history) if history else ""
+    return _PROMPT_TEMPLATE.format(context=context, history=history, user_input=user_input)
+
+
+def _response_text(response) -> str:
+    if response.text:
+        return response.text
+    return _extract_text_from_genai_resp(response)
+
+
+class LLMError(Exception):
+    """A Gemini call that did not produce an answer; ``code`` is machine-readable for API clients."""
+
+    def __init__(self, code: str, message: str, retryable: bool = False):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+        self.retryable = retryable
+
+    def to_dict(self) -> dict:
+        return {"error": self.code, "message": self.message, "retryable": self.retryable}
+
+
+def _retryable_exceptions():
+    errors = (asyncio.TimeoutError, TimeoutError, ConnectionError)
+    try:
+        from google.api_core import exceptions as gexc
+
+        errors += (
+            gexc.ServiceUnavailable,
+            gexc.TooManyRequests,
+            gexc.ResourceExhausted,
+            gexc.DeadlineExceeded,
+            gexc.InternalServerError,
         )
-        
-        if response.text:
-            return response.text
-        return _extract_text_from_genai_resp(response)
-        
-    except Exception as e:
-        print(f"LLM Error: {str(e)}")
-        return f"[LLM error: {str(e)}]"
+    except Exception:
+        pass
+    return errors
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker: open after ``threshold`` failures, half-open after ``reset_timeout``."""
+
+    def __init__(self, threshold: int = LLM_BREAKER_THRESHOLD, reset_timeout: float = LLM_BREAKER_RESET):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def admit(self):
+        """'closed' or 'trial' (the one half-open probe) if a call may go ahead, else None."""
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return "closed"
+            if state == "half_open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return "trial"
+            return None
+
+    def abandon_trial(self):
+        """The half-open probe ended without reaching Gemini (cancelled, or queued out); let the next call probe."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def retry_after(self) -> float:
+        if self.opened_at is None:
+            return 0.0
+        return max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.failures >= self.threshold or self.opened_at is not None:
+                self.opened_at = time.monotonic()
+
+
+class GeminiClient:
+    """Long-lived Gemini client: one reusable model, bounded concurrency, deadlines, retries, circuit breaker.
+
+    ``model_factory`` returns an object with Gemini's ``generate_content`` /
+    ``generate_content_async`` interface, so tests can point the client at a
+    local stub instead of the real API.
+    """
+
+    def __init__(
+        self,
+        model_name: str = GEMINI_MODEL_NAME,
+        max_in_flight: int = LLM_MAX_IN_FLIGHT,
+        timeout: float = LLM_TIMEOUT,
+        max_retries: int = LLM_MAX_RETRIES,
+        backoff_base: float = LLM_BACKOFF_BASE,
+        breaker: CircuitBreaker = None,
+        model_factory=None,
+    ):
+        self.model_name = model_name
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.breaker = breaker or CircuitBreaker()
+        self._model_factory = model_factory or self._default_model
+        self._model = None
+        self._model_lock = threading.Lock()
+        # asyncio semaphores bind to one event loop; keep one per loop.
+        self._semaphores = {}
+        self._sync_semaphore = threading.BoundedSemaphore(max_in_flight)
+        self._retryable = None
+        self.in_flight = 0
+
+    def _default_model(self):
+        genai = _get_genai()
+        return genai.GenerativeModel(
+            self.model_name,
+            generation_config=genai.types.GenerationConfig(**_GENERATION_CONFIG),
+            safety_settings=_SAFETY_SETTINGS,
+        )
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    self._model = self._model_factory()
+        return self._model
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        sem = self._semaphores.get(loop)
+        if sem is None:
+            sem = self._semaphores[loop] = asyncio.Semaphore(self.max_in_flight)
+        return sem
+
+    def _check_breaker(self) -> bool:
+        """Raise if the breaker is open; return True when this call is the half-open trial."""
+        admitted = self.breaker.admit()
+        if admitted is None:
+            raise LLMError(
+                "circuit_open",
+                f"Gemini is failing; not calling it for another {self.breaker.retry_after():.0f}s.",
+                retryable=True,
+            )
+        return admitted == "trial"
+
+    def _backoff(self, attempt: int, remaining: float) -> float:
+        # Full jitter keeps synchronized clients from retrying in lockstep.
+        return min(remaining, random.uniform(0, self.backoff_base * (2 ** attempt)))
+
+    def _failure(self, exc) -> LLMError:
+        if isinstance(exc, LLMError):
+            return exc
+        if isinstance(exc, (asyncio.TimeoutError, TimeoutError)):
+            return LLMError("timeout", f"Gemini did not answer within {self.timeout:.0f}s.", retryable=True)
+        if self._retryable is None:
+            self._retryable = _retryable_exceptions()
+        if isinstance(exc, self._retryable):
+            return LLMError("upstream_unavailable", f"Gemini is unavailable: {exc}", retryable=True)
+        return LLMError("upstream_error", f"Gemini call failed: {exc}")
+
+    def _finish(self, err: LLMError = None):
+        if err is None:
+            self.breaker.record_success()
+        elif err.code == "overloaded":
+            # Our own in-flight limit, not Gemini: local queueing must not open the circuit.
+            return
+        elif err.retryable:
+            self.breaker.record_failure()
+        else:
+            # The service answered (e.g. bad request); that says nothing about its health.
+            self.breaker.record_success()
+
+    async def generate(self, user_input, context, history="") -> str:
+        """Return the answer text or raise LLMError."""
+        if _api_key_missing() and self._model_factory == self._default_model:
+            return _MISSING_KEY_REPLY
+        trial = self._check_breaker()
+        try:
+            return await self._generate(user_input, context, history)
+        except BaseException as e:
+            # Cancellation never reaches _finish and an overload never reached Gemini; free the half-open slot.
+            if trial and _no_outcome(e):
+                self.breaker.abandon_trial()
+            raise
+
+    async def _generate(self, user_input, context, history):
+        prompt = _build_prompt(user_input, context, history)
+        deadline = time.monotonic() + self.timeout
+        attempt = 0
+        while True:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    raise asyncio.TimeoutError()
+                async with _acquire(self._semaphore(), remaining):
+                    self.in_flight += 1
+                    try:
+                        response = await asyncio.wait_for(
+                            self.model.generate_content_async(prompt, request_options={"timeout": remaining}),
+                            deadline - time.monotonic(),
+                        )
+                    finally:
+                        self.in_flight -= 1
+                text = _response_text(response)
+                self._finish()
+                return text
+            except Exception as e:
+                err = self._failure(e)
+                remaining = deadline - time.monotonic()
+                if not err.retryable or attempt >= self.max_retries or remaining <= 0:
+                    self._finish(err)
+                    raise err from e
+                await asyncio.sleep(self._backoff(attempt, remaining))
+                attempt += 1
+
+    async def stream(self, user_input, context, history=""):
+        """Yield answer text pieces; retries only happen before the first piece is sent.
+
+        The deadline applies to the first piece and then to each gap between pieces.
+        """
+        if _api_key_missing() and self._model_factory == self._default_model:
+            yield _MISSING_KEY_REPLY
+            return
+        trial = self._check_breaker()
+        pieces = self._stream(user_input, context, history)
+        try:
+            async for piece in pieces:
+                yield piece
+        except BaseException as e:
+            # A client disconnect closes the generator (GeneratorExit) or cancels it mid-call.
+            if trial and _no_outcome(e):
+                self.breaker.abandon_trial()
+            raise
+        finally:
+            await pieces.aclose()
+
+    async def _stream(self, user_input, context, history):
+        prompt = _build_prompt(user_input, context, history)
+        attempt = 0
+        deadline = time.monotonic() + self.timeout
+        while True:
+            sent_any = False
+            try:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise asyncio.TimeoutError()
+                async with _acquire(self._semaphore(), remaining):
+                    self.in_flight += 1
+                    try:
+                        response = await asyncio.wait_for(
+                            self.model.generate_content_async(
+                                prompt, stream=True, request_options={"timeout": self.timeout}
+                            ),
+                            max(deadline - time.monotonic(), 0.001),
+                        )
+                        chunks = response.__aiter__()
+                        while True:
+                            try:
+                                chunk = await asyncio.wait_for(chunks.__anext__(), self.timeout)
+                            except StopAsyncIteration:
+                                break
+                            try:
+                                text = chunk.text
+                            except ValueError:
+                                # Chunks without text parts (e.g. a trailing safety/finish chunk) raise on .text.
+                                text = ""
+                            if text:
+                                sent_any = True
+                                yield text
+                    finally:
+                        self.in_flight -= 1
+                self._finish()
+                return
+            except Exception as e:
+                err = self._failure(e)
+                remaining = deadline - time.monotonic()
+                if sent_any or not err.retryable or attempt >= self.max_retries or remaining <= 0:
+                    self._finish(err)
+                    raise err from e
+                await asyncio.sleep(self._backoff(attempt, remaining))
+                attempt += 1
+
+    def generate_sync(self, user_input, context, history="") -> str:
+        """Blocking variant for scripts and non-async callers (same limits, no async retry loop)."""
+        if _api_key_missing() and self._model_factory == self._default_model:
+            return _MISSING_KEY_REPLY
+        trial = self._check_breaker()
+        if not self._sync_semaphore.acquire(timeout=self.timeout):
+            if trial:
+                self.breaker.abandon_trial()
+            raise LLMError("overloaded", "Too many Gemini calls in flight.", retryable=True)
+        try:
+            response = self.model.generate_content(
+                _build_prompt(user_input, context, history), request_options={"timeout": self.timeout}
+            )
+            text = _response_text(response)
+        except Exception as e:
+            err = self._failure(e)
+            self._finish(err)
+            raise err from e
+        finally:
+            self._sync_semaphore.release()
+        self._finish()
+        return text
+
+    def stats(self) -> dict:
+        return {
+            "model": self.model_name,
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "timeout": self.timeout,
+            "breaker_state": self.breaker.state,
+            "consecutive_failures": self.breaker.failures,
+        }
+
+
+def _no_outcome(exc) -> bool:
+    """True when a call ended without Gemini's answer deciding it: cancelled, closed, or never admitted locally."""
+    return not isinstance(exc, Exception) or (isinstance(exc, LLMError) and exc.code == "overloaded")
+
+
+class _acquire:
+    """``async with`` a semaphore, giving up with LLMError('overloaded') after ``timeout`` seconds."""
+
+    def __init__(self, sem: asyncio.Semaphore, timeout: float):
+        self.sem = sem
+        self.timeout = timeout
+
+    async def __aenter__(self):
+        try:
+            await asyncio.wait_for(self.sem.acquire(), self.timeout)
+        except asyncio.TimeoutError:
+            raise LLMError("overloaded", "Too many Gemini calls in flight; try again shortly.", retryable=True)
+
+    async def __aexit__(self, *exc):
+        self.sem.release()
+        return False
+
+
+llm_client = GeminiClient()
+
+
+def generate_gemini_response(user_input, context, history=""):
+    """Blocking call kept for scripts; returns error text instead of raising, as it always has."""
+    try:
+        return llm_client.generate_sync(user_input, context, history)
+    except LLMError as e:
+        print(f"LLM Error: {e.message}")
+        return f"[LLM error: {e.message}]"
+
+
+async def generate_gemini_response_async(user_input, context, history=""):
+    """Return the answer via the shared client; raises LLMError on failure."""
+    return await llm_client.generate(user_input, context, history)
+
+
+async def stream_gemini_response(user_input, context, history=""):
+    """Yield the Gemini answer as text pieces as soon as they arrive; raises LLMError on failure."""
+    async for piece in llm_client.stream(user_input, context, history):
+        yield piece
@@ -1,7 +1,10 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
 from typing import List, Optional
 from datetime import datetime
 
+# Largest top_k a /kb/search or /kb/search/batch request may ask for.
+KB_SEARCH_MAX_TOP_K = 100
+
 
 
 class ChatRequest(BaseModel):
@@ -9,13 +12,53 @@ class ChatRequest(BaseModel):
     message: str
 
 
+class KBChunk(BaseModel):
+    text: str
+    source: Optional[str] = None
+    start: Optional[int] = None
+    end: Optional[int] = None
+    heading: Optional[str] = None
+    score: Optional[float] = None
+
+
+class ContextSourceUsage(BaseModel):
+    source: Optional[str] = None
+    chunks: int
+    tokens: int
+
+
+class ContextReport(BaseModel):
+    candidates: int
+    duplicates_dropped: int
+    over_budget_dropped: int
+    tokens: int
+    memory_tokens: int = 0
+    sources: List[ContextSourceUsage] = []
+
+
 class ChatResponse(BaseModel):
     reply: str
     sources: Optional[List[str]] = None
     context_used: Optional[List[str]] = None
+    chunks: Optional[List[KBChunk]] = None
+    context: Optional[ContextReport] = None
+    # Set when the intent router answered locally (no retrieval, no LLM call).
+    intent: Optional[str] = None
 
 
 
+class CourseOutline(BaseModel):
+    course: str
+    source: str
+    outline: str
+    # "llm" (Gemini, generated after ingest) or "extractive" (the course file itself, used until/unless that succeeds)
+    method: str
+    kb_version: Optional[str] = None
+    generated_at: Optional[str] = None
+    # True while a changed course file's outline is being regenerated in the background.
+    stale: bool = False
+
+
 class LeadIn(BaseModel):
     name: str
     email: EmailStr
@@ -48,12 +91,25 @@ class EnrollmentOut(EnrollmentIn):
 
 class KBSearchRequest(BaseModel):
     query: str
-    top_k: int = 3
+    top_k: int = Field(3, ge=1, le=KB_SEARCH_MAX_TOP_K)
+    # "hybrid", "dense" or "lexical"; None uses the server default (KB_RETRIEVAL_MODE).
+    mode: Optional[str] = None
 
 
 class KBSearchResponse(BaseModel):
     
     documents: List[str]
+    chunks: List[KBChunk] = []
+
+
+class KBBatchSearchRequest(BaseModel):
+    queries: List[str]
+    top_k: int = Field(3, ge=1, le=KB_SEARCH_MAX_TOP_K)
+    mode: Optional[str] = None
+
+
+class KBBatchSearchResponse(BaseModel):
+    results: List[KBSearchResponse]
 
 
 class ChatTurn(BaseModel):
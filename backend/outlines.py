@@ -0,0 +1,218 @@
+import os
+import re
+import json
+import hashlib
+import threading
+from datetime import datetime, timezone
+
+try:
+    from backend.kb_ingest import KB_STORE_DIR, ingested_files, get_kb_version
+except Exception:
+    from kb_ingest import KB_STORE_DIR, ingested_files, get_kb_version
+
+# Precomputed outlines live next to the vector store, one entry per course markdown file.
+COURSE_OUTLINE_PATH = os.getenv("COURSE_OUTLINE_PATH", os.path.join(KB_STORE_DIR, "outlines.json"))
+
+
+def course_slug(name: str) -> str:
+    """Lookup key for a course: 'Data Science', 'data-science' and 'data_science.md' all give 'data_science'."""
+    name = re.sub(r"\.md$", "", name.strip().lower())
+    return re.sub(r"[^a-z0-9]+", "_", name).strip("_")
+
+
+def course_title(text: str, fname: str) -> str:
+    match = re.search(r"^#[ \t]+(.+?)[ \t]*#*[ \t]*$", text, re.MULTILINE)
+    return match.group(1) if match else os.path.splitext(fname)[0].replace("_", " ").title()
+
+
+def extractive_outline(text: str, course: str) -> str:
+    """The course file itself as an outline: no LLM, so it is always available."""
+    body = re.sub(r"^#[ \t]+.*\n?", "", text.strip(), count=1)
+    body = re.sub(r"\n{3,}", "\n\n", body).strip()
+    return f"**{course} — course outline**\n\n{body}"
+
+
+class OutlineStore:
+    """Course outlines computed once per version of each course file and served from disk.
+
+    Each entry records the sha256 of the markdown it was generated from, so
+    ``refresh`` (run after every ingest/reload) regenerates only courses whose
+    file changed. Until it finishes the previous outline is served, marked
+    stale. ``generate(course, text)`` returns outline text or None, in which
+    case the extractive outline is used and retried on the next refresh.
+    """
+
+    def __init__(self, generate=None, path: str = COURSE_OUTLINE_PATH):
+        self.generate = generate
+        self.path = path
+        self._entries = None  # source file -> outline entry, loaded on first use
+        self._files = None  # source file -> (course, sha256) as of the last scan
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._thread = None
+        self._dirty = False
+        self.generated = 0
+        self.failed = 0
+
+    def _load(self):
+        if self._entries is not None:
+            return
+        entries = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    entries = json.load(f)
+            except (OSError, ValueError) as e:
+                print("⚠️ Course outline store unreadable, regenerating outlines:", e)
+        self._entries = entries
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self._entries, f, indent=2, sort_keys=True, ensure_ascii=False)
+        os.replace(tmp, self.path)
+
+    def _scan(self):
+        """{file: (course, ingested sha256, markdown on disk or None, disk copy is the ingested version)}.
+
+        Covers every file in the manifest: one edited (or deleted) since the last
+        ingest is still part of the live KB, so it keeps its outline, served stale.
+        """
+        files = {}
+        for fname, (path, sha256) in ingested_files().items():
+            try:
+                with open(path, "rb") as f:
+                    raw = f.read()
+            except OSError:
+                files[fname] = (course_title("", fname), sha256, None, False)
+                continue
+            text = raw.decode("utf-8")
+            files[fname] = (course_title(text, fname), sha256, text, hashlib.sha256(raw).hexdigest() == sha256)
+        return files
+
+    def _build(self, fname: str, course: str, sha256: str, text: str, generate: bool = True) -> dict:
+        outline, method = None, "extractive"
+        if generate and self.generate is not None:
+            try:
+                outline = self.generate(course, text)
+            except Exception as e:
+                print(f"⚠️ Outline generation failed for {course}:", e)
+            if outline:
+                method = "llm"
+            else:
+                with self._lock:
+                    self.failed += 1
+        return {
+            "course": course,
+            "source": fname,
+            "sha256": sha256,
+            "kb_version": get_kb_version(),
+            "outline": outline or extractive_outline(text, course),
+            "method": method,
+            "generated_at": datetime.now(timezone.utc).isoformat(),
+        }
+
+    def refresh(self) -> dict:
+        """Regenerate outlines for new/changed courses (and extractive fallbacks); drop removed ones. Blocking."""
+        with self._refresh_lock:
+            files = self._scan()
+            with self._lock:
+                self._load()
+                self._files = {f: (course, sha, fresh) for f, (course, sha, _, fresh) in files.items()}
+                current = dict(self._entries)
+            # Only files that left the manifest lose their outline.
+            report = {"regenerated": [], "unchanged": [], "not_ingested": [], "removed": sorted(set(current) - set(files))}
+            for fname, (course, sha256, text, fresh) in sorted(files.items()):
+                entry = current.get(fname)
+                if not fresh:
+                    # Edited since the last ingest: the outline follows the KB, not the working copy.
+                    report["not_ingested"].append(fname)
+                    continue
+                if entry and entry["sha256"] == sha256 and (entry["method"] == "llm" or self.generate is None):
+                    report["unchanged"].append(fname)
+                    continue
+                entry = self._build(fname, course, sha256, text)
+                with self._lock:
+                    self._entries[fname] = entry
+                    self._save()
+                    self.generated += 1
+                report["regenerated"].append(fname)
+            if report["removed"]:
+                with self._lock:
+                    for fname in report["removed"]:
+                        self._entries.pop(fname, None)
+                    self._save()
+        if report["regenerated"] or report["removed"]:
+            print(f"📘 Course outlines refreshed: {report}")
+        if report["not_ingested"]:
+            print(f"⚠️ Course files changed since the last ingest, serving their previous outlines: {report['not_ingested']}")
+        return report
+
+    def refresh_in_background(self):
+        """Start a refresh on a daemon thread; a request during a running refresh queues one more pass."""
+        with self._lock:
+            self._dirty = True
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="course-outlines", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._dirty:
+                    return
+                self._dirty = False
+            try:
+                self.refresh()
+            except Exception as e:
+                print("⚠️ Course outline refresh failed:", e)
+
+    def wait(self, timeout: float = None) -> bool:
+        """Block until no background refresh is running. Returns False on timeout."""
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+            return not thread.is_alive()
+        return True
+
+    def get(self, name: str):
+        """Outline entry (plus a ``stale`` flag) for a course title or file name, or None for an unknown course.
+
+        Never calls the LLM: a course whose outline is still being generated is
+        served its extractive outline in the meantime. ``stale`` is set while the
+        outline lags the course file (regeneration pending, or edited but not ingested).
+        """
+        if self._files is None:
+            files = self._scan()
+            with self._lock:
+                if self._files is None:
+                    self._files = {f: (course, sha, fresh) for f, (course, sha, _, fresh) in files.items()}
+            self.refresh_in_background()
+        slug = course_slug(name)
+        with self._lock:
+            self._load()
+            for fname, (course, sha256, fresh) in self._files.items():
+                entry = self._entries.get(fname)
+                titles = (fname, course) + ((entry["course"],) if entry else ())
+                if slug in {course_slug(t) for t in titles}:
+                    break
+            else:
+                return None
+        if entry is None:
+            course, _, text, _ = self._scan().get(fname, (course, sha256, None, False))
+            if text is None:
+                return None
+            entry = self._build(fname, course, sha256, text, generate=False)
+        return {**entry, "stale": entry["sha256"] != sha256 or not fresh}
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "courses": len(self._files or {}),
+                "outlines": len(self._entries or {}),
+                "generated": self.generated,
+                "failed": self.failed,
+                "refreshing": self._thread is not None and self._thread.is_alive(),
+            }
@@ -0,0 +1,95 @@
+import io
+import os
+import csv
+import json
+import base64
+from datetime import datetime
+
+from sqlalchemy import and_, or_
+
+ADMIN_PAGE_DEFAULT = int(os.getenv("ADMIN_PAGE_DEFAULT", "50"))
+ADMIN_PAGE_MAX = int(os.getenv("ADMIN_PAGE_MAX", "500"))
+# Rows fetched per keyset query while streaming an export.
+EXPORT_BATCH_ROWS = int(os.getenv("EXPORT_BATCH_ROWS", "1000"))
+EXPORT_FORMATS = ("csv", "ndjson")
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    """Opaque cursor for the position just after (created_at, id) in newest-first order."""
+    raw = f"{created_at.isoformat() if created_at else ''}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    """Inverse of encode_cursor; raises ValueError on anything it did not produce."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8")
+        ts, row_id = raw.rsplit("|", 1)
+        return (datetime.fromisoformat(ts) if ts else None), int(row_id)
+    except Exception:
+        raise ValueError(f"Invalid cursor {cursor!r}.")
+
+
+def _after(model, cursor):
+    """Rows strictly after the cursor in (created_at desc, id desc) order; NULL created_at sorts last."""
+    created_at, row_id = cursor
+    if created_at is None:
+        return and_(model.created_at.is_(None), model.id < row_id)
+    return or_(
+        model.created_at < created_at,
+        and_(model.created_at == created_at, model.id < row_id),
+        model.created_at.is_(None),
+    )
+
+
+def keyset_page(db, model, limit: int, cursor: str = None):
+    """One newest-first page of ``model`` rows and the cursor of the next page (None on the last one).
+
+    Seeks on (created_at, id) instead of OFFSET, so every page costs the same
+    however deep into the table it is.
+    """
+    query = db.query(model)
+    if cursor:
+        query = query.filter(_after(model, decode_cursor(cursor)))
+    rows = query.order_by(model.created_at.desc(), model.id.desc()).limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1].created_at, rows[-1].id)
+
+
+def iter_rows(session_factory, model, batch: int = EXPORT_BATCH_ROWS):
+    """Yield every row newest-first, one keyset query (and one short-lived session) per batch."""
+    cursor = None
+    while True:
+        db = session_factory()
+        try:
+            rows, cursor = keyset_page(db, model, batch, cursor)
+            db.expunge_all()
+        finally:
+            db.close()
+        yield from rows
+        if cursor is None:
+            return
+
+
+def _plain(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def export_lines(rows, columns, fmt: str):
+    """Serialize rows lazily as CSV (with header) or NDJSON, yielding one chunk of text per row."""
+    if fmt == "ndjson":
+        for row in rows:
+            yield json.dumps({c: _plain(getattr(row, c)) for c in columns}, ensure_ascii=False) + "\n"
+        return
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(columns)
+    for row in rows:
+        writer.writerow([_plain(getattr(row, c)) for c in columns])
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue()
@@ -0,0 +1,115 @@
+import os
+import time
+import threading
+from collections import OrderedDict, deque
+
+try:
+    from backend.db import ChatHistory
+except Exception:
+    from db import ChatHistory
+
+SESSION_CACHE_SESSIONS = int(os.getenv("SESSION_CACHE_SESSIONS", "10000"))
+SESSION_CACHE_TURNS = int(os.getenv("SESSION_CACHE_TURNS", "20"))
+# Other workers may add turns to the same session; a loaded tail is trusted for this long.
+SESSION_CACHE_TTL = float(os.getenv("SESSION_CACHE_TTL", "300"))
+
+
+def recent_turns_query(db, session_id: str, limit: int):
+    """Newest-first turns of one session; served by ix_chat_history_session_created."""
+    return (
+        db.query(ChatHistory)
+        .filter(ChatHistory.session_id == session_id)
+        .order_by(ChatHistory.created_at.desc(), ChatHistory.id.desc())
+        .limit(limit)
+    )
+
+
+def _key(turn):
+    return turn["created_at"], turn["user_message"], turn["bot_reply"]
+
+
+class _Session:
+    __slots__ = ("turns", "loaded_at")
+
+    def __init__(self, maxlen, turns=(), loaded_at=None):
+        self.turns = deque(turns, maxlen=maxlen)
+        # None until the tail has been read from the database: only then is the buffer complete.
+        self.loaded_at = loaded_at
+
+
+class SessionHistoryCache:
+    """Per-session ring buffer of the most recent chat turns, in front of the chat_history table.
+
+    Turns this process saves are appended as they happen; a session read for
+    the first time (or after ``ttl``) is filled by ``loader(session_id, n)``,
+    which returns that session's last n turns oldest-first. Sessions are
+    evicted least-recently-used beyond ``max_sessions``.
+    """
+
+    def __init__(self, loader, max_sessions: int = SESSION_CACHE_SESSIONS, max_turns: int = SESSION_CACHE_TURNS, ttl: float = SESSION_CACHE_TTL):
+        self.loader = loader
+        self.max_sessions = max_sessions
+        self.max_turns = max_turns
+        self.ttl = ttl
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _put(self, session_id, entry):
+        self._sessions[session_id] = entry
+        self._sessions.move_to_end(session_id)
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+
+    def record(self, session_id: str, user_message: str, bot_reply: str, created_at):
+        turn = {"user_message": user_message, "bot_reply": bot_reply, "created_at": created_at}
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                entry = _Session(self.max_turns)
+            entry.turns.append(turn)
+            self._put(session_id, entry)
+
+    def invalidate(self, session_id: str):
+        """Forget a session, e.g. after turns were written for it out of band (bulk uploads)."""
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def recent(self, session_id: str):
+        """The session's last ``max_turns`` turns, oldest first, as dicts with user_message/bot_reply/created_at."""
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is not None and entry.loaded_at is not None and time.monotonic() - entry.loaded_at < self.ttl:
+                self._sessions.move_to_end(session_id)
+                self.hits += 1
+                return list(entry.turns)
+            self.misses += 1
+        loaded = self.loader(session_id, self.max_turns)
+        with self._lock:
+            # Keep turns recorded while the loader ran; the database may not have them yet.
+            entry = self._sessions.get(session_id)
+            seen = {_key(t) for t in loaded}
+            extra = [t for t in (entry.turns if entry else ()) if _key(t) not in seen]
+            turns = sorted(loaded + extra, key=lambda t: t["created_at"])
+            self._put(session_id, _Session(self.max_turns, turns, time.monotonic()))
+            return turns[-self.max_turns:]
+
+    def last_user_message(self, session_id: str):
+        for turn in reversed(self.recent(session_id)):
+            if turn["user_message"] is not None:
+                return turn["user_message"]
+        return None
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "sessions": len(self._sessions),
+                "max_sessions": self.max_sessions,
+                "max_turns": self.max_turns,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            }
@@ -0,0 +1,232 @@
+import os
+import numpy as np
+
+# "exact" (default), "ivf", or "auto" (ivf once the KB has at least KB_IVF_MIN_ROWS chunks).
+INDEX_BACKEND = os.getenv("KB_INDEX_BACKEND", "exact")
+IVF_MIN_ROWS = int(os.getenv("KB_IVF_MIN_ROWS", "100000"))
+IVF_NPROBE = int(os.getenv("KB_IVF_NPROBE", "8"))
+# Compact scan copy for the exact backend: "none" (default), "float16", or "int8" (per-row scale).
+INDEX_QUANT = os.getenv("KB_INDEX_QUANT", "none")
+QUANT_MODES = ("none", "float16", "int8")
+# The compact scan keeps k * KB_RESCORE_FACTOR candidates (at least KB_RESCORE_MIN) for full-precision re-scoring.
+RESCORE_FACTOR = int(os.getenv("KB_RESCORE_FACTOR", "4"))
+RESCORE_MIN = int(os.getenv("KB_RESCORE_MIN", "32"))
+# Rows per block when a float16 store is scanned in place (each block is widened to float32 on the fly).
+SCAN_BATCH = int(os.getenv("KB_SCAN_BATCH", "16384"))
+# Unit-norm tolerance per stored dtype; float16 rounding alone moves a 384-dim norm by ~1e-3.
+_NORM_TOLERANCE = {np.dtype(np.float32): 1e-3, np.dtype(np.float16): 1e-2}
+
+
+def normalize_rows(x):
+    """Return x scaled to unit L2 norm per row (float32); zero rows stay zero."""
+    x = np.asarray(x, dtype=np.float32)
+    norms = np.linalg.norm(x, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return x / norms
+
+
+def top_k_rows(scores, k: int):
+    """Row-wise top-k of a (q, n) score matrix via argpartition, sorted by descending score."""
+    k = min(k, scores.shape[1])
+    if k <= 0:
+        return np.empty((scores.shape[0], 0), dtype=np.float32), np.empty((scores.shape[0], 0), dtype=np.int64)
+    if k < scores.shape[1]:
+        idx = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        idx = np.tile(np.arange(scores.shape[1]), (scores.shape[0], 1))
+    part = np.take_along_axis(scores, idx, axis=1)
+    order = np.argsort(-part, axis=1)
+    return np.take_along_axis(part, order, axis=1), np.take_along_axis(idx, order, axis=1)
+
+
+class ExactIndex:
+    """Brute-force cosine search: one matrix product against pre-normalized rows.
+
+    Unit-norm float32 or float16 rows (what ingest_kb writes, per
+    KB_STORE_DTYPE) are searched in place, so a memory-mapped store stays
+    shared and off the heap; float16 is widened block by block at query time.
+    """
+
+    name = "exact"
+
+    def __init__(self, embeddings, batch: int = SCAN_BATCH):
+        emb = np.asanyarray(embeddings)
+        norms = np.linalg.norm(emb[: min(len(emb), 64)].astype(np.float32), axis=1)
+        tolerance = _NORM_TOLERANCE.get(emb.dtype)
+        if tolerance is not None and np.allclose(norms, 1.0, atol=tolerance):
+            self.matrix = emb
+        else:
+            self.matrix = normalize_rows(emb)
+        self.batch = batch
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+    def arrays(self):
+        return [self.matrix]
+
+    def _scores(self, q):
+        if self.matrix.dtype == np.float32:
+            return q @ self.matrix.T
+        out = np.empty((q.shape[0], len(self)), dtype=np.float32)
+        for s in range(0, len(self), self.batch):
+            out[:, s:s + self.batch] = q @ np.asarray(self.matrix[s:s + self.batch], dtype=np.float32).T
+        return out
+
+    def search(self, queries, k: int):
+        """Return (scores, indices), each shaped (len(queries), min(k, len(self)))."""
+        q = normalize_rows(np.atleast_2d(queries))
+        return top_k_rows(self._scores(q), k)
+
+
+def quantize_rows(x, mode: str, batch: int = 65536):
+    """Compact copy of a (n, dim) matrix: (float16 codes, None) or (int8 codes, float32 per-row scales)."""
+    if mode == "float16":
+        return np.asarray(x, dtype=np.float16), None
+    if mode != "int8":
+        raise ValueError(f"Unknown KB index quantization {mode!r}; choose from {list(QUANT_MODES)}.")
+    codes = np.empty(x.shape, dtype=np.int8)
+    scales = np.empty(x.shape[0], dtype=np.float32)
+    for s in range(0, x.shape[0], batch):
+        block = np.asarray(x[s:s + batch], dtype=np.float32)
+        scale = np.abs(block).max(axis=1) / 127.0
+        scale[scale == 0] = 1.0
+        codes[s:s + batch] = np.rint(block / scale[:, None])
+        scales[s:s + batch] = scale
+    return codes, scales
+
+
+class QuantizedIndex:
+    """Exact search that scans a float16/int8 copy of the matrix, then re-scores the best candidates in float32.
+
+    Only the compact codes are read for every query; the full-precision rows
+    (usually the memory-mapped store) are touched for the few candidates, so
+    the resident working set is 2x (float16) or ~4x (int8) smaller.
+    """
+
+    name = "quantized"
+
+    def __init__(self, embeddings, mode: str = "int8", codes=None, scales=None, rescore: int = RESCORE_FACTOR):
+        self.matrix = ExactIndex(embeddings).matrix
+        self.mode = mode
+        if codes is None:
+            codes, scales = quantize_rows(self.matrix, mode)
+        self.codes = codes
+        self.scales = scales
+        self.rescore = max(1, rescore)
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+    def arrays(self):
+        return [self.matrix, self.codes, self.scales]
+
+    def _approx_scores(self, q, batch: int = 4096):
+        out = np.empty((q.shape[0], len(self)), dtype=np.float32)
+        for s in range(0, len(self), batch):
+            block = self.codes[s:s + batch].astype(np.float32) @ q.T
+            if self.scales is not None:
+                block *= self.scales[s:s + batch, None]
+            out[:, s:s + batch] = block.T
+        return out
+
+    def search(self, queries, k: int):
+        q = normalize_rows(np.atleast_2d(queries))
+        k = min(k, len(self))
+        n_cand = min(len(self), max(k * self.rescore, RESCORE_MIN))
+        candidates = top_k_rows(self._approx_scores(q), n_cand)[1]
+        scores = np.empty((len(q), k), dtype=np.float32)
+        indices = np.empty((len(q), k), dtype=np.int64)
+        for i, cand in enumerate(candidates):
+            cand = np.sort(cand)  # ascending row order keeps memmap reads sequential
+            s, j = top_k_rows((np.asarray(self.matrix[cand], dtype=np.float32) @ q[i])[None, :], k)
+            scores[i], indices[i] = s[0], cand[j[0]]
+        return scores, indices
+
+
+class IVFIndex:
+    """Inverted-file index: k-means coarse quantizer, exact re-scoring inside the nprobe nearest lists.
+
+    Pure NumPy. Built for KBs with 100k+ chunks where scanning every row per
+    query stops being cheap; recall is tuned with ``nprobe``.
+    """
+
+    name = "ivf"
+
+    def __init__(self, embeddings, nlist: int = None, nprobe: int = IVF_NPROBE, iters: int = 10, seed: int = 0):
+        self.matrix = normalize_rows(embeddings)
+        n = self.matrix.shape[0]
+        self.nlist = max(1, min(n, nlist or int(np.sqrt(n))))
+        self.nprobe = max(1, min(nprobe, self.nlist))
+        self.centroids = self._train(iters, seed)
+        assign = self._assign(self.matrix)
+        order = np.argsort(assign, kind="stable")
+        bounds = np.searchsorted(assign[order], np.arange(self.nlist + 1))
+        self.lists = [order[bounds[c]:bounds[c + 1]] for c in range(self.nlist)]
+
+    def _train(self, iters: int, seed: int):
+        rng = np.random.default_rng(seed)
+        n = self.matrix.shape[0]
+        # Train on a sample; the quantizer does not need every row to be useful.
+        sample = self.matrix[rng.choice(n, size=min(n, self.nlist * 64), replace=False)]
+        centroids = sample[rng.choice(len(sample), size=self.nlist, replace=False)].copy()
+        for _ in range(iters):
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            for c in range(self.nlist):
+                members = sample[assign == c]
+                if len(members):
+                    centroids[c] = members.mean(axis=0)
+                else:
+                    centroids[c] = sample[rng.integers(len(sample))]
+            centroids = normalize_rows(centroids)
+        return centroids
+
+    def _assign(self, x, batch: int = 65536):
+        out = np.empty(x.shape[0], dtype=np.int64)
+        for s in range(0, x.shape[0], batch):
+            out[s:s + batch] = np.argmax(x[s:s + batch] @ self.centroids.T, axis=1)
+        return out
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+    def arrays(self):
+        return [self.matrix, self.centroids, *self.lists]
+
+    def search(self, queries, k: int, nprobe: int = None):
+        q = normalize_rows(np.atleast_2d(queries))
+        nprobe = max(1, min(nprobe or self.nprobe, self.nlist))
+        k = min(k, len(self))
+        probes = top_k_rows(q @ self.centroids.T, nprobe)[1]
+        scores = np.full((len(q), k), -np.inf, dtype=np.float32)
+        indices = np.full((len(q), k), -1, dtype=np.int64)
+        for i, lists in enumerate(probes):
+            cand = np.concatenate([self.lists[c] for c in lists])
+            if not len(cand):
+                continue
+            s, j = top_k_rows((self.matrix[cand] @ q[i])[None, :], k)
+            scores[i, : s.shape[1]] = s[0]
+            indices[i, : j.shape[1]] = cand[j[0]]
+        return scores, indices
+
+
+BACKENDS = {"exact": ExactIndex, "ivf": IVFIndex}
+
+
+def build_index(embeddings, backend: str = None, quant: str = None, codes=None, scales=None):
+    """Build the configured search index (KB_INDEX_BACKEND) over the KB embeddings.
+
+    With a quantization mode (KB_INDEX_QUANT) the exact backend scans compact
+    codes and re-scores; pass precomputed ``codes``/``scales`` to skip quantizing.
+    """
+    backend = (backend or INDEX_BACKEND).lower()
+    quant = (quant or INDEX_QUANT).lower()
+    if backend == "auto":
+        backend = "ivf" if len(embeddings) >= IVF_MIN_ROWS else "exact"
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown KB index backend {backend!r}; choose from {sorted(BACKENDS)} or 'auto'.")
+    if quant not in QUANT_MODES:
+        raise ValueError(f"Unknown KB index quantization {quant!r}; choose from {list(QUANT_MODES)}.")
+    if backend == "exact" and quant != "none":
+        return QuantizedIndex(embeddings, quant, codes=codes, scales=scales)
+    return BACKENDS[backend](embeddings)
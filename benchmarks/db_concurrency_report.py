@@ -0,0 +1,86 @@
+"""Mixed read/write load against the database-backed endpoints, SQLite defaults vs. tuned.
+
+Usage: python benchmarks/db_concurrency_report.py [requests] [concurrency]
+
+Each configuration runs in a fresh interpreter against its own temporary
+SQLite file (DATABASE_URL), since the engine is built at import. The load is
+a shuffled mix of /lead, /enroll and /chat/save writes with /chat/top5,
+/admin/leads and /admin/enrollments reads, fired through the ASGI app with a
+bounded number in flight. Reported: throughput, latency and failed requests
+(e.g. "database is locked" surfacing as 500s).
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+
+_PROBE = """
+import asyncio, json, random, sys, time
+import httpx
+import numpy as np
+from backend import app as app_module
+from backend.db import Base, engine
+
+n, concurrency = int(sys.argv[1]), int(sys.argv[2])
+Base.metadata.create_all(bind=engine)
+
+def request(i):
+    kind = i % 6
+    if kind == 0:
+        return "POST", "/lead", {"name": f"n{i}", "email": f"lead{i}@example.com", "phone": str(i)}
+    if kind == 1:
+        return "POST", "/enroll", {"username": f"u{i}", "email": f"enr{i}@example.com", "phone": f"p{i}",
+                                   "address": "Street 1", "course": "Data Science"}
+    if kind == 2:
+        return "POST", "/chat/save", {"session_id": f"s{i % 50}",
+                                      "turns": [{"user_message": f"q{i}-{j}", "bot_reply": "a"} for j in range(5)]}
+    return "GET", ["/chat/top5", "/admin/leads", "/admin/enrollments"][kind - 3], None
+
+async def main():
+    plan = [request(i) for i in range(n)]
+    random.Random(0).shuffle(plan)
+    sem = asyncio.Semaphore(concurrency)
+    latencies, failures = [], 0
+    transport = httpx.ASGITransport(app=app_module.app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def one(method, path, body):
+            nonlocal failures
+            async with sem:
+                t0 = time.perf_counter()
+                r = await client.request(method, path, json=body)
+                latencies.append(time.perf_counter() - t0)
+                failures += r.status_code >= 500
+        t0 = time.perf_counter()
+        await asyncio.gather(*[one(*req) for req in plan])
+        elapsed = time.perf_counter() - t0
+    ms = np.array(latencies) * 1000
+    print(json.dumps({"rps": n / elapsed, "p50": float(np.percentile(ms, 50)), "p95": float(np.percentile(ms, 95)),
+                      "p99": float(np.percentile(ms, 99)), "failed": failures}))
+
+asyncio.run(main())
+"""
+
+
+def run(tuned: bool, n: int, concurrency: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'bench.db')}", SQLITE_TUNING="1" if tuned else "0")
+        proc = subprocess.run([sys.executable, "-c", _PROBE, str(n), str(concurrency)], cwd=ROOT, env=env,
+                              capture_output=True, text=True, check=True)
+        return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1200
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 32
+    print(f"{n} requests (1/2 writes, 1/2 reads), {concurrency} in flight")
+    print(f"{'sqlite':<10}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'failed':>8}")
+    for label, tuned in (("defaults", False), ("tuned", True)):
+        r = run(tuned, n, concurrency)
+        print(f"{label:<10}{r['rps']:>9.1f}{r['p50']:>9.1f}{r['p95']:>9.1f}{r['p99']:>9.1f}{r['failed']:>8}")
+
+
+if __name__ == "__main__":
+    main()
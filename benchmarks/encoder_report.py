@@ -0,0 +1,119 @@
+"""Latency / memory / parity report for the KB encoder backends.
+
+Usage: python benchmarks/encoder_report.py [backend ...]   (default: torch onnx int8)
+
+Every backend runs in a fresh interpreter so resident memory is not shared
+between them. Each one embeds the KB chunks and a set of course questions;
+the parent then checks the top-k retrieval of the onnx/int8 backends against
+the torch reference on the real KB (see encoders.parity_report). k is kept
+well below the chunk count so the overlap can actually drop; the rank
+correlation compares the full orderings.
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+sys.path.insert(0, ROOT)
+
+from backend import kb_ingest  # noqa: E402
+from backend.encoders import parity_report  # noqa: E402
+
+QUERIES = [
+    "How long is the data science course?",
+    "What does the generative AI course cost?",
+    "Which modules are in the agentic AI program?",
+    "What will I learn in AI automation?",
+    "Is there a certificate after finishing?",
+    "What are the prerequisites for data science?",
+    "Do you cover LLM agents and tool use?",
+    "Which course teaches workflow automation?",
+]
+
+_PROBE = """
+import json, resource, sys, time
+import numpy as np
+from backend.encoders import load_encoder
+backend, texts_path, queries_path, out_path = sys.argv[1:5]
+texts = json.load(open(texts_path)); queries = json.load(open(queries_path))
+t0 = time.perf_counter()
+enc = load_encoder("all-MiniLM-L6-v2", backend)
+enc.encode(["warmup"])
+load_s = time.perf_counter() - t0
+t0 = time.perf_counter()
+docs = enc.encode(texts)
+docs_s = time.perf_counter() - t0
+lat = []
+for _ in range(5):
+    for q in queries:
+        t0 = time.perf_counter()
+        enc.encode([q])
+        lat.append(time.perf_counter() - t0)
+qv = enc.encode(queries)
+np.savez(out_path, docs=docs, queries=qv)
+rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+print(json.dumps({"load_s": load_s, "docs_s": docs_s, "p50_ms": float(np.percentile(lat, 50)) * 1000,
+                  "p95_ms": float(np.percentile(lat, 95)) * 1000, "rss_mb": rss_mb}))
+"""
+
+
+class _Precomputed:
+    def __init__(self, texts, vectors):
+        self.lookup = dict(zip(texts, vectors))
+
+    def encode(self, texts, convert_to_numpy=True):
+        return np.vstack([self.lookup[t] for t in texts])
+
+
+def kb_texts():
+    chunks = []
+    for fname in sorted(f for f in os.listdir(kb_ingest.KB_DIR) if f.endswith(".md")):
+        with open(os.path.join(kb_ingest.KB_DIR, fname), encoding="utf-8") as f:
+            chunks.extend(kb_ingest.chunk_markdown(f.read(), fname))
+    return [kb_ingest._embedding_text(c) for c in chunks]
+
+
+def main():
+    backends = sys.argv[1:] or ["torch", "onnx", "int8"]
+    texts = kb_texts()
+    with tempfile.TemporaryDirectory() as tmp:
+        texts_path, queries_path = os.path.join(tmp, "texts.json"), os.path.join(tmp, "queries.json")
+        json.dump(texts, open(texts_path, "w"))
+        json.dump(QUERIES, open(queries_path, "w"))
+        results, vectors = {}, {}
+        for backend in backends:
+            out_path = os.path.join(tmp, f"{backend}.npz")
+            proc = subprocess.run(
+                [sys.executable, "-c", _PROBE, backend, texts_path, queries_path, out_path],
+                cwd=ROOT, capture_output=True, text=True,
+            )
+            if proc.returncode:
+                print(f"{backend}: failed\n{proc.stderr.strip().splitlines()[-1]}")
+                continue
+            results[backend] = json.loads(proc.stdout.strip().splitlines()[-1])
+            with np.load(out_path) as data:
+                vectors[backend] = (data["docs"], data["queries"])
+
+    # A k at or above the chunk count makes the overlap 1.0 whatever the encoder does.
+    k = max(1, min(5, len(texts) // 4))
+    print(f"KB: {len(texts)} chunks, {len(QUERIES)} queries")
+    print(
+        f"{'backend':<8}{'load s':>8}{'ingest s':>10}{'p50 ms':>9}{'p95 ms':>9}{'RSS MB':>9}"
+        f"{f'top{k} overlap':>14}{'top1 agree':>12}{'rank corr':>11}"
+    )
+    for backend, r in results.items():
+        parity = ""
+        if backend != "torch" and "torch" in vectors:
+            ref = _Precomputed(texts + QUERIES, np.vstack(vectors["torch"]))
+            cand = _Precomputed(texts + QUERIES, np.vstack(vectors[backend]))
+            p = parity_report(ref, cand, texts, QUERIES, k=k)
+            parity = f"{p['topk_overlap']:>14.3f}{p['top1_agreement']:>12.3f}{p['rank_correlation']:>11.3f}"
+        print(f"{backend:<8}{r['load_s']:>8.2f}{r['docs_s']:>10.2f}{r['p50_ms']:>9.2f}{r['p95_ms']:>9.2f}{r['rss_mb']:>9.0f}{parity}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Memory-vs-recall report for the compact (float16 / int8) KB scan copies.
+
+Usage: python benchmarks/quantized_store_report.py [n_rows] [dim] [n_queries]
+
+Uses the same synthetic clustered corpus as vector_index_report.py. The exact
+float32 index is the ground truth; for each quantization mode and re-score
+factor it reports the bytes scanned per query (the resident working set),
+recall@10 and latency. The scan keeps max(k * factor, KB_RESCORE_MIN)
+candidates, so factors that clamp to the same count are reported once.
+"""
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from backend.vector_index import RESCORE_MIN, ExactIndex, QuantizedIndex, quantize_rows  # noqa: E402
+from vector_index_report import synthetic_corpus, time_queries  # noqa: E402
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    dim = int(sys.argv[2]) if len(sys.argv) > 2 else 384
+    n_queries = int(sys.argv[3]) if len(sys.argv) > 3 else 200
+    k = 10
+
+    print(f"Corpus: {n} rows x {dim} dims, {n_queries} queries, recall@{k}")
+    rows, queries = synthetic_corpus(n, dim, n_queries)
+    exact = ExactIndex(rows)
+    truth, exact_ms = time_queries(exact, queries, k)
+
+    mb = 1024 * 1024
+    print(f"{'index':<22}{'scan MB':>9}{'saving':>8}{'recall':>9}{'p50 ms':>9}{'p95 ms':>9}")
+    print(f"{'exact float32':<22}{rows.nbytes / mb:>9.1f}{1.0:>7.1f}x{1.0:>9.3f}"
+          f"{np.percentile(exact_ms, 50):>9.2f}{np.percentile(exact_ms, 95):>9.2f}")
+    for mode in ("float16", "int8"):
+        codes, scales = quantize_rows(rows, mode)
+        scan_bytes = codes.nbytes + (scales.nbytes if scales is not None else 0)
+        seen = set()
+        for factor in (1, 2, 4, 8):
+            candidates = max(k * factor, RESCORE_MIN)
+            if candidates in seen:
+                continue  # clamped to the same candidate count as a smaller factor: an identical run
+            seen.add(candidates)
+            index = QuantizedIndex(rows, mode, codes=codes, scales=scales, rescore=factor)
+            found, ms = time_queries(index, queries, k)
+            recall = np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)])
+            label = f"{mode} {candidates} cand"
+            print(f"{label:<22}{scan_bytes / mb:>9.1f}{rows.nbytes / scan_bytes:>7.1f}x{recall:>9.3f}"
+                  f"{np.percentile(ms, 50):>9.2f}{np.percentile(ms, 95):>9.2f}")
+    print(f"(cand = full-precision re-score candidates per query: max(k * factor, KB_RESCORE_MIN={RESCORE_MIN}))")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Cold-start report for the backend: import time and startup-to-ready time.
+
+Usage: python benchmarks/startup_benchmark.py [runs]
+
+Each run uses a fresh interpreter. "import" is the wall time of
+``import backend.app``; "ready" is the time from entering the app lifespan
+(startup hook) until GET /ready returns 200, i.e. KB index loaded and the
+encoder warmed. Heavy modules found in sys.modules right after the import are
+listed, since any of them there means a regression in lazy loading.
+"""
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+HEAVY_MODULES = ["google.generativeai", "sentence_transformers", "torch", "sklearn"]
+
+_PROBE = f"""
+import json, sys, time
+t0 = time.perf_counter()
+import backend.app as app_module
+imported = time.perf_counter() - t0
+heavy = [m for m in {HEAVY_MODULES!r} if m in sys.modules]
+from fastapi.testclient import TestClient
+t1 = time.perf_counter()
+ready = None
+with TestClient(app_module.app) as client:
+    while time.perf_counter() - t1 < 300:
+        r = client.get("/ready")
+        if r.status_code == 200:
+            ready = time.perf_counter() - t1
+            break
+        if r.json()["detail"].get("error"):
+            break
+        time.sleep(0.01)
+print(json.dumps({{"import": imported, "ready": ready, "heavy": heavy}}))
+"""
+
+
+def run_once():
+    out = subprocess.run([sys.executable, "-c", _PROBE], cwd=ROOT, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    results = [run_once() for _ in range(runs)]
+    imports = np.array([r["import"] for r in results]) * 1000
+    readies = [r["ready"] for r in results if r["ready"] is not None]
+    print(f"{runs} fresh interpreters")
+    print(f"import backend.app   p50 {np.percentile(imports, 50):8.0f} ms   max {imports.max():8.0f} ms")
+    if readies:
+        readies = np.array(readies) * 1000
+        print(f"startup -> /ready    p50 {np.percentile(readies, 50):8.0f} ms   max {readies.max():8.0f} ms")
+    else:
+        print("startup -> /ready    never became ready (missing KB store or encoder?)")
+    heavy = sorted({m for r in results for m in r["heavy"]})
+    print("heavy modules at import:", ", ".join(heavy) if heavy else "none")
+
+
+if __name__ == "__main__":
+    main()
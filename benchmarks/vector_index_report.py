@@ -0,0 +1,68 @@
+"""Recall-vs-latency report for the KB vector index backends.
+
+Usage: python benchmarks/vector_index_report.py [n_rows] [dim] [n_queries]
+
+Builds a synthetic clustered corpus (MiniLM-sized vectors by default), uses the
+exact backend as ground truth and reports recall@10 and per-query latency for
+the IVF backend across several nprobe settings.
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from backend.vector_index import ExactIndex, IVFIndex, normalize_rows  # noqa: E402
+
+
+def synthetic_corpus(n, dim, n_queries, n_topics=1000, seed=0):
+    rng = np.random.default_rng(seed)
+    topics = rng.normal(size=(n_topics, dim)).astype(np.float32)
+    rows = topics[rng.integers(n_topics, size=n)] + 1.25 * rng.normal(size=(n, dim)).astype(np.float32)
+    queries = topics[rng.integers(n_topics, size=n_queries)] + 1.25 * rng.normal(size=(n_queries, dim)).astype(np.float32)
+    return normalize_rows(rows), normalize_rows(queries)
+
+
+def time_queries(index, queries, k, **kwargs):
+    latencies = []
+    results = []
+    for q in queries:
+        t0 = time.perf_counter()
+        _, idx = index.search(q, k, **kwargs)
+        latencies.append(time.perf_counter() - t0)
+        results.append(idx[0])
+    return np.array(results), np.array(latencies) * 1000
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    dim = int(sys.argv[2]) if len(sys.argv) > 2 else 384
+    n_queries = int(sys.argv[3]) if len(sys.argv) > 3 else 200
+    k = 10
+
+    print(f"Corpus: {n} rows x {dim} dims, {n_queries} queries, recall@{k}")
+    rows, queries = synthetic_corpus(n, dim, n_queries)
+
+    t0 = time.perf_counter()
+    exact = ExactIndex(rows)
+    exact_build = time.perf_counter() - t0
+    truth, exact_ms = time_queries(exact, queries, k)
+
+    t0 = time.perf_counter()
+    ivf = IVFIndex(rows)
+    ivf_build = time.perf_counter() - t0
+
+    print(f"{'backend':<18}{'build s':>9}{'recall':>9}{'p50 ms':>9}{'p95 ms':>9}")
+    print(f"{'exact':<18}{exact_build:>9.2f}{1.0:>9.3f}{np.percentile(exact_ms, 50):>9.2f}{np.percentile(exact_ms, 95):>9.2f}")
+    for nprobe in (1, 4, 8, 16, 32):
+        found, ms = time_queries(ivf, queries, k, nprobe=nprobe)
+        recall = np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)])
+        label = f"ivf nprobe={nprobe}"
+        print(f"{label:<18}{ivf_build:>9.2f}{recall:>9.3f}{np.percentile(ms, 50):>9.2f}{np.percentile(ms, 95):>9.2f}")
+    print(f"(ivf nlist={ivf.nlist})")
+
+
+if __name__ == "__main__":
+    main()
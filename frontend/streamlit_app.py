@@ -3,6 +3,7 @@ import streamlit as st
 import requests
 import uuid
 import os
+import json
 
 API_URL = os.getenv("BACKEND_URL", "http://localhost:8000")
 
@@ -50,6 +51,21 @@ st.markdown("""
 </div>
 """, unsafe_allow_html=True)
 
+def stream_chat(payload):
+    """Yield reply text pieces from the backend's /chat/stream server-sent events."""
+    with requests.post(f"{API_URL}/chat/stream", json=payload, stream=True, timeout=(10, 180)) as r:
+        r.raise_for_status()
+        for line in r.iter_lines(decode_unicode=True):
+            if not line or not line.startswith("data: "):
+                continue
+            event = json.loads(line[len("data: "):])
+            if event.get("type") == "token":
+                yield event["text"]
+            elif event.get("type") == "error":
+                detail = event.get("detail") or {}
+                raise RuntimeError(detail.get("message") if isinstance(detail, dict) else detail)
+
+
 if "session_id" not in st.session_state:
     st.session_state.session_id = str(uuid.uuid4())
 if "chat_history" not in st.session_state:
@@ -148,26 +164,30 @@ with col1:
                     st.session_state.awaiting_enroll_response = False
                     st.rerun()
 
-            # Normal chat flow
+            # Normal chat flow: render the reply token by token as the backend streams it
             payload = {"session_id": st.session_state.session_id, "message": user_text}
+            st.markdown(f"<div class='msg-user'>{user_text}</div>", unsafe_allow_html=True)
+            reply_box = st.empty()
+            reply = ""
             try:
-                r = requests.post(f"{API_URL}/chat", json=payload)
-                if r.ok:
-                    data = r.json()
-                    # detect if this was the very first user message in the session
-                    user_count = sum(1 for role, _ in st.session_state.chat_history if role == "You")
-                    is_first_user = user_count == 0
+                for piece in stream_chat(payload):
+                    reply += piece
+                    reply_box.markdown(f"<div class='msg-bot'>{reply}▌</div>", unsafe_allow_html=True)
 
-                    st.session_state.chat_history.append(("You", user_text))
-                    st.session_state.chat_history.append(("AhsanBot", data["reply"]))
+                # detect if this was the very first user message in the session
+                user_count = sum(1 for role, _ in st.session_state.chat_history if role == "You")
+                is_first_user = user_count == 0
 
-                    # after first reply, ask about enrollment automatically
-                    if is_first_user and not st.session_state.asked_enroll:
-                        st.session_state.chat_history.append(("AhsanBot", "Would you like to enroll in a course?"))
-                        st.session_state.awaiting_enroll_response = True
-                        st.session_state.asked_enroll = True
-                else:
-                    st.session_state.chat_history.append(("System", "⚠️ Backend error"))
+                st.session_state.chat_history.append(("You", user_text))
+                st.session_state.chat_history.append(("AhsanBot", reply))
+
+                # after first reply, ask about enrollment automatically
+                if is_first_user and not st.session_state.asked_enroll:
+                    st.session_state.chat_history.append(("AhsanBot", "Would you like to enroll in a course?"))
+                    st.session_state.awaiting_enroll_response = True
+                    st.session_state.asked_enroll = True
+            except requests.HTTPError:
+                st.session_state.chat_history.append(("System", "⚠️ Backend error"))
             except Exception as e:
                 st.session_state.chat_history.append(("System", f"Error: {e}"))
             st.rerun()
@@ -204,15 +224,12 @@ with col2:
         "AI Automation", "Data Science", "Agentic AI", "Generative AI"
     ])
     if st.button("Show Outline"):
-        q = f"Give a complete outline of the {course_choice} course."
-        payload = {"session_id": st.session_state.session_id, "message": q}
+        # Outlines are precomputed on the backend: no retrieval, no Gemini call, no chat turn per click.
         try:
-            r = requests.post(f"{API_URL}/chat", json=payload, timeout=15)
+            r = requests.get(f"{API_URL}/courses/{requests.utils.quote(course_choice)}/outline", timeout=15)
             if r.ok:
                 data = r.json()
-            
-                reply = data.get("reply") or data.get("text") or str(data)
-                st.info(reply)
+                st.info(data.get("outline") or str(data))
             else:
                 try:
                     msg = r.json()
@@ -224,20 +241,36 @@ with col2:
 
     st.markdown("---")
     st.subheader("🧾 Admin Panel (for you)")
-    if st.button("Show Latest Leads"):
+
+    def load_leads(older=False):
+        # One page per click; the backend hands back a cursor for the next (older) page.
+        params = {"limit": 10}
+        if older:
+            params["cursor"] = st.session_state.get("leads_cursor")
         try:
-            r = requests.get(f"{API_URL}/admin/leads")
-            if r.ok:
-                leads = r.json()
-                for lead in leads[:10]:
-                    st.write(
-                        f"**{lead['name']}** — {lead['email']} ({lead['interest']})  "
-                        f"<br><small>{lead['created_at']}</small>", unsafe_allow_html=True
-                    )
-            else:
-                st.warning("No leads found.")
+            r = requests.get(f"{API_URL}/admin/leads", params=params, timeout=8)
+            st.session_state.leads_page = r.json() if r.ok else []
+            st.session_state.leads_cursor = r.headers.get("X-Next-Cursor") if r.ok else None
+            st.session_state.leads_error = None
         except Exception as e:
-            st.error(f"Error fetching leads: {e}")
+            st.session_state.leads_page = []
+            st.session_state.leads_cursor = None
+            st.session_state.leads_error = f"Error fetching leads: {e}"
+
+    st.button("Show Latest Leads", on_click=load_leads)
+    if st.session_state.get("leads_error"):
+        st.error(st.session_state.leads_error)
+    elif "leads_page" in st.session_state:
+        if not st.session_state.leads_page:
+            st.warning("No leads found.")
+        for lead in st.session_state.leads_page:
+            st.write(
+                f"**{lead['name']}** — {lead['email']} ({lead['interest']})  "
+                f"<br><small>{lead['created_at']}</small>", unsafe_allow_html=True
+            )
+        if st.session_state.get("leads_cursor"):
+            st.button("Show Older Leads", on_click=load_leads, args=(True,))
+    st.markdown(f"[⬇️ Export all leads (CSV)]({API_URL}/admin/leads/export?format=csv)")
 
 st.markdown("""
 <div class="footer">
@@ -0,0 +1,70 @@
+import zlib
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend import app as app_module
+from backend import kb_ingest
+from backend.db import Base, get_db
+from backend.history_writer import ChatHistoryWriter
+from backend.session_cache import SessionHistoryCache
+
+
+@pytest.fixture
+def Session(tmp_path):
+    """Session factory for a fresh SQLite database in tmp_path, all tables created."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(bind=engine, autoflush=False, autocommit=False)
+
+
+@pytest.fixture
+def app_db(Session, monkeypatch):
+    """Point the app at the temp database: SessionLocal, get_db, a fresh history writer and session cache."""
+    monkeypatch.setattr(app_module, "SessionLocal", Session)
+    writer = ChatHistoryWriter(Session)
+    monkeypatch.setattr(app_module, "history_writer", writer)
+    monkeypatch.setattr(app_module, "session_history", SessionHistoryCache(app_module._load_session_turns))
+
+    def override():
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app_module.app.dependency_overrides[get_db] = override
+    yield Session
+    app_module.app.dependency_overrides.pop(get_db, None)
+    writer.close()
+
+
+class FakeEncoder:
+    """Deterministic stand-in for SentenceTransformer that counts encoded texts."""
+
+    def __init__(self):
+        self.encoded = 0
+
+    def encode(self, texts, convert_to_numpy=True):
+        self.encoded += len(texts)
+        out = np.zeros((len(texts), 64), dtype=np.float32)
+        for i, t in enumerate(texts):
+            for tok in t.lower().split():
+                out[i, zlib.crc32(tok.encode()) % 64] += 1.0
+        return out
+
+
+@pytest.fixture
+def kb_env(tmp_path, monkeypatch):
+    """kb_ingest on an empty kb/ folder and store in tmp_path, encoding with a FakeEncoder. Returns (kb_dir, encoder)."""
+    kb_dir = tmp_path / "kb"
+    kb_dir.mkdir()
+    monkeypatch.setattr(kb_ingest, "KB_DIR", str(kb_dir))
+    monkeypatch.setattr(kb_ingest, "KB_STORE_DIR", str(tmp_path / "kb_store"))
+    monkeypatch.setattr(kb_ingest, "LEGACY_PICKLE_PATH", str(tmp_path / "kb_vectors.pkl"))
+    monkeypatch.setattr(kb_ingest, "_snapshot", None)
+    encoder = FakeEncoder()
+    monkeypatch.setattr(kb_ingest, "model", encoder)
+    return kb_dir, encoder
@@ -0,0 +1,63 @@
+import numpy as np
+
+from backend.answer_cache import SemanticAnswerCache
+from backend.db import AnswerCacheEntry
+
+
+def _vec(*values):
+    return np.array(values, dtype=np.float32)
+
+
+def test_similar_query_with_same_context_hits():
+    cache = SemanticAnswerCache(threshold=0.9)
+    cache.store(_vec(1, 0, 0), "ctx", "v1", "answer")
+    assert cache.lookup(_vec(0.99, 0.05, 0), "ctx", "v1") == "answer"
+    assert cache.lookup(_vec(0, 1, 0), "ctx", "v1") is None
+    assert cache.lookup(_vec(1, 0, 0), "other ctx", "v1") is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 2
+
+
+def test_kb_version_change_invalidates():
+    cache = SemanticAnswerCache()
+    cache.store(_vec(1, 0), "ctx", "v1", "answer")
+    assert cache.lookup(_vec(1, 0), "ctx", "v2") is None
+    assert cache.stats()["size"] == 0
+
+
+def test_size_bound_evicts_oldest():
+    cache = SemanticAnswerCache(maxsize=2)
+    cache.store(_vec(1, 0, 0), "a", "v1", "A")
+    cache.store(_vec(0, 1, 0), "b", "v1", "B")
+    cache.store(_vec(0, 0, 1), "c", "v1", "C")
+    assert cache.lookup(_vec(1, 0, 0), "a", "v1") is None
+    assert cache.lookup(_vec(0, 0, 1), "c", "v1") == "C"
+
+
+def test_persisted_entries_survive_a_restart(Session):
+    SemanticAnswerCache(maxsize=1, session_factory=Session).store(_vec(1, 0), "ctx", "v1", "first")
+    cache = SemanticAnswerCache(maxsize=1, session_factory=Session)
+    cache.store(_vec(0, 1), "ctx", "v1", "second")  # evicts "first" in memory and on disk
+
+    restarted = SemanticAnswerCache(maxsize=1, session_factory=Session)
+    assert restarted.lookup(_vec(0, 1), "ctx", "v1") == "second"
+    db = Session()
+    assert db.query(AnswerCacheEntry).count() == 1
+    db.close()
+
+    restarted.lookup(_vec(0, 1), "ctx", "v2")
+    db = Session()
+    assert db.query(AnswerCacheEntry).count() == 0
+    db.close()
+
+
+def test_no_kb_version_bypasses_the_cache_and_keeps_persisted_entries(Session):
+    SemanticAnswerCache(session_factory=Session).store(_vec(1, 0), "ctx", "v1", "answer")
+
+    cache = SemanticAnswerCache(session_factory=Session)  # e.g. a worker whose KB failed to load
+    assert cache.lookup(_vec(1, 0), "ctx", None) is None
+    cache.store(_vec(1, 0), "ctx", None, "unversioned")
+    assert cache.stats()["size"] == 0
+    db = Session()
+    assert db.query(AnswerCacheEntry).count() == 1
+    db.close()
+    assert cache.lookup(_vec(1, 0), "ctx", "v1") == "answer"
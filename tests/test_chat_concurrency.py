@@ -0,0 +1,292 @@
+"""Load test: concurrent /chat throughput with a slow stubbed LLM.
+
+Run with ``python -m pytest -q -s tests/test_chat_concurrency.py`` to see the numbers.
+"""
+import asyncio
+import threading
+import time
+
+import httpx
+import numpy as np
+import pytest
+
+from backend import app as app_module
+from backend.answer_cache import SemanticAnswerCache
+from backend.db import ChatHistory
+
+LLM_LATENCY = 0.3
+RETRIEVAL_LATENCY = 0.02
+
+
+@pytest.fixture
+def stubbed_app(app_db, monkeypatch):
+    def slow_retrieval(query, top_k=3, **kwargs):
+        time.sleep(RETRIEVAL_LATENCY)  # stands in for the CPU-bound encoder
+        return [{"text": "Data Science: 10 Month", "source": "data_science.md"}]
+
+    async def slow_llm(user_input, context, history=""):
+        await asyncio.sleep(LLM_LATENCY)
+        return f"answer to {user_input}"
+
+    def fake_encode(query):
+        vec = np.zeros(8, dtype=np.float32)
+        vec[sum(map(ord, query)) % 8] = 1.0
+        return vec
+
+    monkeypatch.setattr(app_module, "encode_query", fake_encode)
+    # One-hot fake vectors would make centroid matches arbitrary; keep the router on rules.
+    monkeypatch.setattr(app_module.intent_router, "embed", None)
+    # Threshold above 1.0: the answer cache never hits unless a test swaps it out.
+    monkeypatch.setattr(app_module, "answer_cache", SemanticAnswerCache(threshold=1.01))
+    monkeypatch.setattr(app_module, "get_relevant_chunks", slow_retrieval)
+    monkeypatch.setattr(app_module, "generate_gemini_response_async", slow_llm)
+    return app_module.app, app_db
+
+
+async def _fire(app, n):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        t0 = time.perf_counter()
+        responses = await asyncio.gather(
+            *[client.post("/chat", json={"session_id": f"s{i}", "message": f"question {i}"}) for i in range(n)]
+        )
+        return time.perf_counter() - t0, responses
+
+
+def test_concurrent_chat_throughput_scales(stubbed_app):
+    app, Session = stubbed_app
+
+    single, _ = asyncio.run(_fire(app, 1))
+    n = 16
+    elapsed, responses = asyncio.run(_fire(app, n))
+
+    assert all(r.status_code == 200 for r in responses)
+    assert {r.json()["reply"] for r in responses} == {f"answer to question {i}" for i in range(n)}
+    print(f"\n/chat x1: {single:.2f}s   /chat x{n} concurrent: {elapsed:.2f}s "
+          f"({n / elapsed:.1f} req/s vs {1 / single:.1f} req/s serial)")
+    # Serialized on the event loop this would take n * LLM_LATENCY (4.8s).
+    assert elapsed < n * LLM_LATENCY / 4
+
+    assert app_module.history_writer.flush(5)
+    db = Session()
+    try:
+        assert db.query(ChatHistory).count() == n + 1
+    finally:
+        db.close()
+
+
+def test_chat_stream_emits_tokens_then_persists(stubbed_app, monkeypatch):
+    import json
+
+    app, Session = stubbed_app
+
+    async def fake_stream(user_input, context, history=""):
+        for piece in ["Data ", "Science ", "is 10 months."]:
+            await asyncio.sleep(0)
+            yield piece
+
+    monkeypatch.setattr(app_module, "stream_gemini_response", fake_stream)
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            r = await client.post("/chat/stream", json={"session_id": "stream", "message": "data science?"})
+            return r
+
+    r = asyncio.run(run())
+    assert r.headers["content-type"].startswith("text/event-stream")
+    events = [json.loads(line[len("data: "):]) for line in r.text.splitlines() if line.startswith("data: ")]
+    assert [e["type"] for e in events] == ["context", "token", "token", "token", "done"]
+    assert events[-1]["reply"] == "Data Science is 10 months."
+    assert events[0]["sources"] == ["data_science.md"]
+
+    assert app_module.history_writer.flush(5)
+    db = Session()
+    try:
+        row = db.query(ChatHistory).filter(ChatHistory.session_id == "stream").one()
+        assert row.bot_reply == "Data Science is 10 months."
+    finally:
+        db.close()
+
+
+def test_repeated_question_is_served_from_answer_cache(stubbed_app, monkeypatch):
+    app, Session = stubbed_app
+    monkeypatch.setattr(app_module, "answer_cache", SemanticAnswerCache(threshold=0.95))
+    # Retrieval is stubbed, so no KB is loaded; answers are only cached under a KB version.
+    monkeypatch.setattr(app_module, "get_kb_version", lambda: "v1")
+    calls = []
+
+    async def counting_llm(user_input, context, history=""):
+        calls.append(user_input)
+        return "Data Science runs for 10 months."
+
+    monkeypatch.setattr(app_module, "generate_gemini_response_async", counting_llm)
+
+    async def ask_twice():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            first = await client.post("/chat", json={"session_id": "a", "message": "how long is data science?"})
+            second = await client.post("/chat", json={"session_id": "b", "message": "how long is data science?"})
+            return first.json(), second.json()
+
+    first, second = asyncio.run(ask_twice())
+    assert first["reply"] == second["reply"]
+    assert len(calls) == 1
+    assert app_module.answer_cache.stats()["hits"] == 1
+
+
+def test_llm_failure_returns_structured_error(stubbed_app, monkeypatch):
+    from backend.llm_client import LLMError
+
+    app, Session = stubbed_app
+
+    async def open_circuit(user_input, context, history=""):
+        raise LLMError("circuit_open", "Gemini is failing", retryable=True)
+
+    monkeypatch.setattr(app_module, "generate_gemini_response_async", open_circuit)
+
+    async def ask():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post("/chat", json={"session_id": "x", "message": "What does the Data Science course cover?"})
+
+    r = asyncio.run(ask())
+    assert r.status_code == 503
+    assert r.json()["detail"] == {"error": "circuit_open", "message": "Gemini is failing", "retryable": True}
+    assert "retry-after" in r.headers
+
+
+def test_identical_concurrent_questions_share_one_llm_call(stubbed_app, monkeypatch):
+    from backend.singleflight import SingleFlight
+
+    app, Session = stubbed_app
+    monkeypatch.setattr(app_module, "llm_flights", SingleFlight())
+    calls = []
+
+    async def slow_counting_llm(user_input, context, history=""):
+        calls.append(user_input)
+        await asyncio.sleep(LLM_LATENCY)
+        return "shared answer"
+
+    monkeypatch.setattr(app_module, "generate_gemini_response_async", slow_counting_llm)
+
+    async def burst():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await asyncio.gather(
+                *[client.post("/chat", json={"session_id": f"user{i}", "message": "Price of Data Science?"}) for i in range(10)]
+            )
+
+    responses = asyncio.run(burst())
+    assert all(r.json()["reply"] == "shared answer" for r in responses)
+    assert len(calls) == 1
+    assert app_module.llm_flights.stats()["coalesced"] == 9
+
+    assert app_module.history_writer.flush(5)
+    db = Session()
+    try:
+        sessions = {row.session_id for row in db.query(ChatHistory).all()}
+        assert sessions == {f"user{i}" for i in range(10)}
+    finally:
+        db.close()
+
+
+def test_last_question_sees_turns_not_yet_flushed(stubbed_app, monkeypatch):
+    app, Session = stubbed_app
+    gate = threading.Event()
+    real_write = app_module.history_writer._write
+    monkeypatch.setattr(app_module.history_writer, "_write", lambda batch: (gate.wait(5), real_write(batch)))
+
+    async def conversation():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            await client.post("/chat", json={"session_id": "m", "message": "How long is data science?"})
+            return await client.post("/chat", json={"session_id": "m", "message": "What was my last question?"})
+
+    r = asyncio.run(conversation())
+    assert r.json()["reply"] == "Your last question was: How long is data science?"
+    db = Session()
+    try:
+        assert db.query(ChatHistory).count() == 0
+    finally:
+        db.close()
+
+    gate.set()
+    assert app_module.history_writer.flush(5)
+    db = Session()
+    try:
+        rows = db.query(ChatHistory).order_by(ChatHistory.created_at).all()
+        assert [r.user_message for r in rows] == ["How long is data science?", "What was my last question?"]
+    finally:
+        db.close()
+
+
+def test_follow_up_questions_carry_conversation_memory(stubbed_app, monkeypatch):
+    app, Session = stubbed_app
+    seen = []
+
+    async def remembering_llm(user_input, context, history=""):
+        seen.append(history)
+        return f"answer to {user_input}"
+
+    monkeypatch.setattr(app_module, "generate_gemini_response_async", remembering_llm)
+
+    async def conversation():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            await client.post("/chat", json={"session_id": "f", "message": "Tell me about Data Science"})
+            await client.post("/chat", json={"session_id": "f", "message": "How long is it?"})
+
+    asyncio.run(conversation())
+    assert seen[0] == ""
+    assert "User: Tell me about Data Science" in seen[1]
+    assert "Assistant: answer to Tell me about Data Science" in seen[1]
+
+
+def test_small_talk_and_enrollment_replies_skip_retrieval_and_llm(stubbed_app, monkeypatch):
+    app, Session = stubbed_app
+    llm_calls = []
+
+    async def enrolling_llm(user_input, context, history=""):
+        llm_calls.append(user_input)
+        return f"answer to {user_input}. Would you like to enroll?"
+
+    monkeypatch.setattr(app_module, "generate_gemini_response_async", enrolling_llm)
+    saved_before = app_module.intent_router.stats()["llm_calls_saved"]
+
+    async def conversation():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            replies = []
+            for message in ("Hello!", "Tell me about Data Science", "yes", "Thanks"):
+                r = await client.post("/chat", json={"session_id": "i", "message": message})
+                replies.append(r.json())
+            return replies
+
+    greeting, answer, yes, thanks = asyncio.run(conversation())
+    assert llm_calls == ["Tell me about Data Science"]
+    assert greeting["intent"] == "greeting" and answer["intent"] is None
+    assert yes["intent"] == "enroll_yes" and "Interested in a Course?" in yes["reply"]
+    assert thanks["intent"] == "thanks"
+    assert app_module.intent_router.stats()["llm_calls_saved"] - saved_before == 3
+
+
+def test_yes_to_an_llm_follow_up_is_not_taken_as_enrollment(stubbed_app, monkeypatch):
+    app, Session = stubbed_app
+    llm_calls = []
+
+    async def follow_up_llm(user_input, context, history=""):
+        llm_calls.append(user_input)
+        return "It runs 10 months.\nNext steps for enrollment: fill the form. Want the fee breakdown too?"
+
+    monkeypatch.setattr(app_module, "generate_gemini_response_async", follow_up_llm)
+
+    async def conversation():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            await client.post("/chat", json={"session_id": "y", "message": "How long is Data Science?"})
+            return (await client.post("/chat", json={"session_id": "y", "message": "yes"})).json()
+
+    reply = asyncio.run(conversation())
+    assert reply["intent"] is None
+    assert llm_calls == ["How long is Data Science?", "yes"]
@@ -0,0 +1,55 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend import app as app_module
+from backend.db import ChatHistory
+
+
+@pytest.fixture
+def client(app_db, monkeypatch):
+    monkeypatch.setattr(app_module, "CHAT_SAVE_CHUNK_ROWS", 2)
+    return TestClient(app_module.app), app_db
+
+
+def _rows(Session):
+    db = Session()
+    try:
+        return db.query(ChatHistory).order_by(ChatHistory.created_at).all()
+    finally:
+        db.close()
+
+
+def test_bulk_save_keeps_client_timestamps(client):
+    http, Session = client
+    turns = [
+        {"user_message": "second", "bot_reply": "b", "created_at": "2024-01-01T10:05:00"},
+        {"user_message": "first", "bot_reply": "a", "created_at": "2024-01-01T12:00:00+02:00"},
+        {"user_message": "third", "bot_reply": "c", "created_at": "2024-01-01T10:10:00Z"},
+    ]
+    r = http.post("/chat/save", json={"session_id": "offline", "turns": turns})
+    assert r.json() == {"status": "ok", "saved": 3}
+    rows = _rows(Session)
+    assert [row.user_message for row in rows] == ["first", "second", "third"]
+    assert rows[0].created_at.isoformat() == "2024-01-01T10:00:00"
+
+
+def test_ndjson_upload_is_inserted_in_chunks(client):
+    http, Session = client
+    lines = [json.dumps({"user_message": f"q{i}", "created_at": f"2024-01-01T00:00:0{i}"}) for i in range(5)]
+    r = http.post("/chat/save/ndjson?session_id=long", content=("\n".join(lines) + "\n").encode())
+    assert r.json() == {"status": "ok", "saved": 5}
+    rows = _rows(Session)
+    assert [row.user_message for row in rows] == [f"q{i}" for i in range(5)]
+    assert {row.session_id for row in rows} == {"long"}
+
+
+def test_ndjson_reports_the_bad_line(client):
+    http, Session = client
+    body = b'{"user_message": "ok1"}\n{"user_message": "ok2"}\n{"user_message": "ok3"}\nnot json\n{"user_message": "never"}\n'
+    r = http.post("/chat/save/ndjson?session_id=broken", content=body)
+    assert r.status_code == 400
+    assert r.json()["detail"]["line"] == 4
+    assert r.json()["detail"]["saved"] == 3
+    assert [row.user_message for row in _rows(Session)] == ["ok1", "ok2", "ok3"]
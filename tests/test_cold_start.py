@@ -0,0 +1,76 @@
+import json
+import subprocess
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend import app as app_module
+from backend.history_writer import ChatHistoryWriter
+
+ROOT = Path(__file__).resolve().parents[1]
+HEAVY_MODULES = ["google.generativeai", "sentence_transformers", "torch", "sklearn"]
+
+
+def test_importing_the_app_skips_heavy_modules():
+    code = (
+        "import sys, json; import backend.app; "
+        f"print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))"
+    )
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert json.loads(out.stdout.strip().splitlines()[-1]) == []
+
+
+def _lifespan_app(tmp_path, monkeypatch):
+    """Patch what the startup/shutdown hooks touch, so running the lifespan leaves the module state alone."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'app.db'}")
+    monkeypatch.setattr(app_module, "engine", engine)
+    monkeypatch.setattr(app_module, "history_writer", ChatHistoryWriter(sessionmaker(bind=engine)))
+    monkeypatch.setattr(app_module, "_blocking_pool", None)
+    monkeypatch.setattr(app_module, "_readiness", {"index": False, "encoder": False, "error": None})
+    monkeypatch.setattr(app_module, "_readiness_errors", {})
+    monkeypatch.setattr(app_module, "outline_store", SimpleNamespace(refresh_in_background=lambda: None))
+    monkeypatch.setattr(app_module, "load_kb", lambda: SimpleNamespace(status=lambda: {"documents": 0}))
+    return app_module.app
+
+
+def test_ready_flips_after_background_warmup(tmp_path, monkeypatch):
+    app = _lifespan_app(tmp_path, monkeypatch)
+    monkeypatch.setattr(app_module, "warm_encoder", lambda: time.sleep(0.2))
+
+    with TestClient(app) as client:
+        assert client.get("/health").status_code == 200
+        assert client.get("/ready").status_code == 503
+        deadline = time.monotonic() + 5
+        while client.get("/ready").status_code != 200:
+            assert time.monotonic() < deadline
+            time.sleep(0.02)
+        assert client.get("/ready").json() == {"ready": True, "index": True, "encoder": True, "error": None}
+
+
+def test_a_second_startup_gets_a_working_worker_pool(tmp_path, monkeypatch):
+    app = _lifespan_app(tmp_path, monkeypatch)
+    monkeypatch.setattr(app_module, "warm_encoder", lambda: None)
+
+    with TestClient(app):
+        pass
+    with TestClient(app) as client:
+        assert client.post("/admin/kb/reload").status_code == 200  # runs on the worker pool
+    assert app_module._blocking_pool is None
+
+
+def test_ingest_after_a_failed_startup_makes_the_worker_ready(monkeypatch):
+    monkeypatch.setattr(app_module, "_readiness", {"index": False, "encoder": True, "error": None})
+    monkeypatch.setattr(app_module, "_readiness_errors", {})
+    monkeypatch.setattr(app_module, "outline_store", SimpleNamespace(refresh_in_background=lambda: None))
+    app_module._set_ready("index", False, "KB load failed: no store")
+    monkeypatch.setattr(app_module, "ingest_kb", lambda full=False: {"total_chunks": 3})
+
+    client = TestClient(app_module.app)  # no lifespan: the startup warmup already ran and failed
+    assert client.get("/ready").status_code == 503
+    assert client.post("/admin/kb/ingest").status_code == 200
+    assert client.get("/ready").json() == {"ready": True, "index": True, "encoder": True, "error": None}
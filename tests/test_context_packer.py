@@ -0,0 +1,76 @@
+import numpy as np
+
+from backend.context_packer import assemble_prompt, pack_context
+from backend.conversation import count_tokens
+
+
+def _chunk(text, source, vec, start=None, end=None):
+    return {"text": text, "source": source, "start": start, "end": end, "vector": np.asarray(vec, dtype=np.float32)}
+
+
+def test_near_duplicates_and_overlapping_chunks_are_dropped():
+    query = [1.0, 0.0, 0.0]
+    chunks = [
+        _chunk("Data Science runs for ten months.", "ds.md", [1.0, 0.1, 0.0], 0, 40),
+        _chunk("Data Science runs for ten months!", "ds_copy.md", [1.0, 0.1, 0.001]),
+        _chunk("Months of Data Science: ten.", "ds.md", [0.6, 0.8, 0.0], 20, 60),
+        _chunk("Fees are paid in three installments.", "fees.md", [0.7, 0.0, 0.7]),
+    ]
+    packed, report = pack_context(chunks, query, max_chunks=3)
+
+    assert [c["source"] for c in packed] == ["ds.md", "fees.md"]
+    assert report["duplicates_dropped"] == 2
+    assert all("vector" not in c for c in packed)
+    assert "vector" in chunks[0]  # caller's chunks are untouched
+
+
+def test_budget_is_respected_and_report_counts_tokens_per_source():
+    chunks = [_chunk(f"chunk {i} " + "word " * 40, f"s{i % 2}.md", np.eye(4)[i]) for i in range(4)]
+    packed, report = pack_context(chunks, np.ones(4), budget=120, max_chunks=4)
+
+    assert report["tokens"] <= 120
+    assert report["over_budget_dropped"] == len(chunks) - len(packed)
+    assert sum(u["chunks"] for u in report["sources"]) == len(packed)
+    assert sum(u["tokens"] for u in report["sources"]) == report["tokens"]
+
+
+def test_oversized_best_chunk_is_truncated_rather_than_dropped():
+    chunks = [_chunk("long " * 400, "big.md", [1.0, 0.0])]
+    packed, report = pack_context(chunks, [1.0, 0.0], budget=50)
+    assert len(packed) == 1 and packed[0]["text"].endswith("…")
+    assert report["tokens"] <= 50
+    assert chunks[0]["text"] == "long " * 400
+
+
+def test_without_vectors_rank_order_and_text_overlap_are_used():
+    chunks = [{"text": "alpha beta gamma", "source": "a.md"}, {"text": "beta gamma", "source": "b.md"}, {"text": "delta", "source": "c.md"}]
+    packed, report = pack_context(chunks, max_chunks=3)
+    assert [c["source"] for c in packed] == ["a.md", "c.md"]
+    assert report["duplicates_dropped"] == 1
+
+
+def test_assemble_prompt_splits_one_budget_between_memory_and_context():
+    turns = [{"user_message": f"question {i}", "bot_reply": "x" * 800} for i in range(3)]
+    chunks = [{"text": f"doc {i} " * 50, "source": f"d{i}.md"} for i in range(3)]
+    packed, report, context, history = assemble_prompt(chunks, turns, budget=300, memory_budget=100)
+
+    assert report["memory_tokens"] == count_tokens(history) <= 100
+    assert count_tokens(context) + count_tokens(history) <= 300 + len(packed)
+    assert context.startswith("doc 0")
+
+    packed, report, context, history = assemble_prompt(chunks, [], budget=10_000)
+    assert history == "" and context == "\n\n".join(c["text"] for c in chunks)
+
+
+def test_lexical_top_hit_survives_packing():
+    query = [1.0, 0.0, 0.0, 0.0]
+    # RRF order from hybrid retrieval: the exact-code hit first although its embedding is far from the query.
+    chunks = [
+        {**_chunk("DS-101 costs 49.99.", "fees.md", [0.1, 0.0, 0.0, 1.0]), "score": 0.0328},
+        {**_chunk("Data Science covers Python.", "ds.md", [1.0, 0.3, 0.0, 0.0]), "score": 0.0320},
+        {**_chunk("Data Science covers Pandas.", "ds2.md", [1.0, 0.0, 0.3, 0.0]), "score": 0.0315},
+        {**_chunk("Data Science covers NLP.", "ds3.md", [1.0, 0.2, 0.2, 0.0]), "score": 0.0310},
+    ]
+    packed, _ = pack_context(chunks, query, max_chunks=3)
+    assert packed[0]["text"] == "DS-101 costs 49.99."
+    assert len(packed) == 3
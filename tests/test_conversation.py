@@ -0,0 +1,28 @@
+from backend.conversation import build_memory, count_tokens, truncate_tokens
+
+
+def _turns(n):
+    return [{"user_message": f"question number {i} about data science", "bot_reply": "x" * 800} for i in range(n)]
+
+
+def test_memory_stays_within_budget_however_long_the_session():
+    for n in (1, 5, 50, 2000):
+        assert count_tokens(build_memory(_turns(n), budget=300)) <= 300
+
+
+def test_recent_turns_are_quoted_and_older_ones_summarized():
+    memory = build_memory(_turns(10), budget=400, recent=2)
+    lines = memory.splitlines()
+    assert lines[0].startswith("Earlier in this conversation the user asked about:")
+    assert "question number 7" in lines[0]
+    assert "User: question number 8 about data science" in memory
+    assert memory.rstrip().endswith("…")  # long replies are capped
+    assert "question number 9" in lines[-2]
+
+
+def test_truncate_tokens_cuts_at_a_word():
+    text = "alpha beta gamma delta epsilon"
+    assert truncate_tokens(text, 100) == text
+    cut = truncate_tokens(text, 4)
+    assert cut.endswith("…") and count_tokens(cut) <= 5
+    assert truncate_tokens(text, 0) == ""
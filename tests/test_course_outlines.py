@@ -0,0 +1,109 @@
+import os
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend import app as app_module
+from backend import kb_ingest
+from backend.outlines import OutlineStore, course_slug
+
+
+@pytest.fixture
+def kb(kb_env):
+    kb_dir, _ = kb_env
+    (kb_dir / "data_science.md").write_text("# Data Science\n\nDuration: 10 Month\n\n\n\nModules:\n- Python\n- Pandas\n")
+    (kb_dir / "gen_ai.md").write_text("# Generative AI\n\nDuration: 3 Month\nModules:\n- GANs\n")
+    kb_ingest.ingest_kb()
+    return kb_dir, kb_dir.parent / "kb_store" / "outlines.json"
+
+
+def test_outlines_are_generated_once_per_course_file_version(kb):
+    kb_dir, path = kb
+    calls = []
+    started, release = threading.Event(), threading.Event()
+
+    def generate(course, text):
+        calls.append(course)
+        if len(calls) > 2:
+            started.set()
+            release.wait(5)
+        return f"{course} outline v{len(calls)}"
+
+    store = OutlineStore(generate=generate, path=str(path))
+    assert store.refresh()["regenerated"] == ["data_science.md", "gen_ai.md"]
+    assert store.refresh()["regenerated"] == []
+    # A fresh process serves the stored outlines without generating anything.
+    restarted = OutlineStore(generate=generate, path=str(path))
+    assert restarted.get("Data Science")["outline"] == "Data Science outline v1"
+    assert restarted.wait(5)  # its first get() starts a refresh; let it finish before the file changes
+    assert calls == ["Data Science", "Generative AI"]
+
+    (kb_dir / "gen_ai.md").write_text("# Generative AI\n\nDuration: 4 Month\nModules:\n- Diffusion\n")
+    os.utime(kb_dir / "gen_ai.md", (1, 1))
+    kb_ingest.ingest_kb()
+    store.refresh_in_background()
+    assert started.wait(5)
+    stale = store.get("generative-ai")  # old outline served while the new one is generated
+    assert stale["stale"] is True and stale["outline"] == "Generative AI outline v2"
+
+    release.set()
+    assert store.wait(5)
+    assert calls == ["Data Science", "Generative AI", "Generative AI"]
+    outline = store.get("gen_ai")
+    assert outline["outline"] == "Generative AI outline v3" and outline["stale"] is False
+    assert outline["kb_version"] == kb_ingest.get_kb_version()
+
+
+def test_extractive_outline_when_generation_fails_and_unknown_course(kb):
+    _, path = kb
+    store = OutlineStore(generate=lambda course, text: None, path=str(path))
+    store.refresh()
+    outline = store.get("DATA SCIENCE")
+    assert outline["method"] == "extractive"
+    assert outline["outline"].startswith("**Data Science — course outline**")
+    assert "\n\n\n" not in outline["outline"] and "- Pandas" in outline["outline"]
+    assert store.get("Cooking") is None
+    assert course_slug("data-science.md") == course_slug("Data Science") == "data_science"
+
+
+def test_edited_but_not_ingested_course_keeps_its_outline(kb):
+    kb_dir, path = kb
+    OutlineStore(generate=lambda course, text: f"{course} v1", path=str(path)).refresh()
+    (kb_dir / "data_science.md").write_text("# Data Science\n\nDuration: 12 Month\n")
+
+    # A new process refreshing on startup/reload, before anyone re-ingests.
+    store = OutlineStore(generate=lambda course, text: f"{course} v2", path=str(path))
+    report = store.refresh()
+    assert report["not_ingested"] == ["data_science.md"] and report["removed"] == []
+    outline = store.get("Data Science")
+    assert outline["outline"] == "Data Science v1" and outline["stale"] is True
+
+    (kb_dir / "data_science.md").unlink()
+    assert store.refresh()["removed"] == []
+    assert store.get("data_science")["stale"] is True
+
+    kb_ingest.ingest_kb()  # the file leaves the manifest only now
+    assert store.refresh()["removed"] == ["data_science.md"]
+    assert store.get("Data Science") is None
+
+
+def test_outline_endpoint_serves_without_llm_or_chat_turn(kb, monkeypatch):
+    _, path = kb
+    store = OutlineStore(path=str(path))
+    store.refresh()
+    monkeypatch.setattr(app_module, "outline_store", store)
+
+    async def no_llm(*args, **kwargs):
+        raise AssertionError("outline requests must not reach the LLM")
+
+    monkeypatch.setattr(app_module, "generate_gemini_response_async", no_llm)
+    saved = []
+    monkeypatch.setattr(app_module, "_save_chat_turn", lambda *args: saved.append(args))
+
+    http = TestClient(app_module.app)
+    r = http.get("/courses/Data Science/outline")
+    assert r.status_code == 200
+    assert r.json()["course"] == "Data Science" and r.json()["source"] == "data_science.md"
+    assert http.get("/courses/Cooking/outline").status_code == 404
+    assert saved == []
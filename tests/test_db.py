@@ -0,0 +1,37 @@
+from sqlalchemy import text
+
+from backend import db
+
+
+def _pragma(engine, name):
+    with engine.connect() as conn:
+        return conn.execute(text(f"PRAGMA {name}")).scalar()
+
+
+def test_sqlite_file_engine_is_tuned(tmp_path):
+    engine = db.make_engine(f"sqlite:///{tmp_path / 'tuned.db'}")
+    assert _pragma(engine, "journal_mode") == "wal"
+    assert _pragma(engine, "synchronous") == 1  # NORMAL
+    assert _pragma(engine, "busy_timeout") == db.SQLITE_BUSY_TIMEOUT_MS
+    assert engine.pool.size() == db.DB_POOL_SIZE
+
+
+def test_tuning_can_be_switched_off(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "SQLITE_TUNING", False)
+    engine = db.make_engine(f"sqlite:///{tmp_path / 'plain.db'}")
+    assert _pragma(engine, "journal_mode") == "delete"
+    assert _pragma(engine, "busy_timeout") == db.SQLITE_BUSY_TIMEOUT_MS
+
+
+def test_in_memory_sqlite_keeps_one_shared_connection():
+    engine = db.make_engine("sqlite://")
+    db.Base.metadata.create_all(bind=engine)
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT count(*) FROM chat_history")).scalar() == 0
+
+
+def test_default_database_keeps_an_existing_file_in_the_working_directory(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    assert db.default_database_path() == db.PROJECT_DB_PATH
+    (tmp_path / "chat_history.db").touch()  # a deployment started from backend/ before DATABASE_URL existed
+    assert db.default_database_path() == str(tmp_path / "chat_history.db")
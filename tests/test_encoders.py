@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from backend import encoders
+
+
+class ScaledEncoder:
+    """Fake encoder: fixed per-text vectors, optionally perturbed like a quantized backend would be."""
+
+    def __init__(self, table, noise=0.0, seed=0):
+        rng = np.random.default_rng(seed)
+        self.table = {t: v + noise * rng.normal(size=v.shape) for t, v in table.items()}
+
+    def encode(self, texts, convert_to_numpy=True):
+        return np.vstack([self.table[t] for t in texts]).astype(np.float32)
+
+
+def _table(n=40, dim=16):
+    rng = np.random.default_rng(1)
+    return {f"text {i}": rng.normal(size=dim) for i in range(n)}
+
+
+def test_parity_report_identical_encoders():
+    table = _table()
+    texts = list(table)
+    report = encoders.parity_report(ScaledEncoder(table), ScaledEncoder(table), texts[:30], texts[30:], k=5)
+    assert report["topk_overlap"] == 1.0
+    assert report["top1_agreement"] == 1.0
+    assert report["rank_correlation"] == pytest.approx(1.0)
+    assert report["min_cosine"] == pytest.approx(1.0, abs=1e-4)
+
+
+def test_parity_report_flags_a_drifting_encoder():
+    table = _table()
+    texts = list(table)
+    close = encoders.parity_report(ScaledEncoder(table), ScaledEncoder(table, noise=0.01), texts[:30], texts[30:])
+    far = encoders.parity_report(ScaledEncoder(table), ScaledEncoder(table, noise=2.0), texts[:30], texts[30:])
+    assert close["topk_overlap"] >= 0.9
+    assert far["topk_overlap"] < close["topk_overlap"]
+    assert far["rank_correlation"] < close["rank_correlation"]
+    assert far["min_cosine"] < close["min_cosine"]
+
+
+def test_rank_correlation_fails_where_topk_overlap_cannot():
+    table = _table()
+    texts = list(table)
+    # k as large as the document set: overlap is 1.0 even for an unrelated encoder.
+    far = encoders.parity_report(ScaledEncoder(table), ScaledEncoder(table, noise=2.0), texts[:4], texts[30:], k=5)
+    assert far["topk_overlap"] == 1.0
+    assert far["rank_correlation"] < 0.9
+
+
+def test_mean_pool_ignores_padding():
+    hidden = np.array([[[1.0, 1.0], [3.0, 3.0], [100.0, 100.0]]])
+    mask = np.array([[1, 1, 0]])
+    assert np.allclose(encoders.mean_pool(hidden, mask), [[2.0, 2.0]])
+
+
+def test_encoder_id_only_changes_for_int8():
+    assert encoders.encoder_id("m", "torch") == encoders.encoder_id("m", "onnx") == "m"
+    assert encoders.encoder_id("m", "int8") == "m:int8"
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError):
+        encoders.load_encoder("m", "tpu")
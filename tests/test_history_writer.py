@@ -0,0 +1,57 @@
+import threading
+
+from backend.db import ChatHistory
+from backend.history_writer import ChatHistoryWriter
+
+
+def _rows(Session):
+    db = Session()
+    try:
+        return db.query(ChatHistory).order_by(ChatHistory.created_at, ChatHistory.id).all()
+    finally:
+        db.close()
+
+
+def test_async_turns_are_batched_and_flushed_on_close(Session):
+    writer = ChatHistoryWriter(Session, durability="async")
+    gate = threading.Event()
+    real_write = writer._write
+    writer._write = lambda batch: (gate.wait(5), real_write(batch))
+
+    for i in range(50):
+        writer.submit("s", f"q{i}", f"a{i}")
+    assert writer.pending_turns("s")[-1]["user_message"] == "q49"
+    gate.set()
+    writer.close()
+
+    assert [r.user_message for r in _rows(Session)] == [f"q{i}" for i in range(50)]
+    stats = writer.stats()
+    assert stats["written"] == 50 and stats["unflushed"] == 0
+    assert stats["batches"] < 50
+    assert writer.pending_turns("s") == []
+
+
+def test_sync_durability_commits_before_returning(Session):
+    writer = ChatHistoryWriter(Session, durability="sync")
+    writer.submit("s", "hello", "hi")
+    assert [r.user_message for r in _rows(Session)] == ["hello"]
+    writer.close()
+
+
+def test_full_queue_falls_back_to_inline_writes(Session):
+    writer = ChatHistoryWriter(Session, durability="async", maxsize=1, put_timeout=0.01)
+    gate = threading.Event()
+    real_write = writer._write
+
+    def blocked_write(batch):
+        if threading.current_thread().name == "chat-history-writer":
+            gate.wait(5)
+        real_write(batch)
+
+    writer._write = blocked_write
+    for i in range(5):
+        writer.submit("s", f"q{i}", "a")
+    assert writer.stats()["inline_writes"] >= 1
+    gate.set()
+    writer.close()
+    assert len(_rows(Session)) == 5
@@ -0,0 +1,68 @@
+import numpy as np
+
+from backend.intent_router import IntentRouter, normalize_message, register_default_intents
+
+# Toy embedding: one axis per topic word, so centroid distances are predictable.
+_AXES = ["hello", "weather", "course", "fees", "joke"]
+
+
+def _embed(text):
+    vec = np.full(len(_AXES), 0.01, dtype=np.float32)
+    for i, word in enumerate(_AXES):
+        if word in text:
+            vec[i] = 1.0
+    return vec
+
+
+def test_rules_match_whole_messages_only():
+    router = register_default_intents(IntentRouter())
+    assert normalize_message("  Hello!!  ") == "hello"
+    assert router.match("Hello!") == ("greeting", "rule", None)
+    assert router.match("Thank you so much 🙏") == ("thanks", "rule", None)
+    assert router.match("hello, what are the fees for data science?") is None
+    assert router.route("s", "hey there").intent == "greeting"
+
+
+def test_nearest_centroid_routes_and_reject_class_passes_through():
+    router = IntentRouter(embed=_embed, threshold=0.8)
+    router.register("off_topic", lambda s, m: "off topic", examples=["weather today", "weather tomorrow"])
+    router.register("course_question", None, examples=["course fees", "course length"])
+
+    intent, method, score = router.match("what is the weather in lahore")
+    assert (intent, method) == ("off_topic", "centroid") and score > 0.8
+    assert router.route("s", "how much are the course fees") is None
+    assert router.route("s", "tell me a joke") is None  # nearest centroid is below threshold
+
+    stats = router.stats()
+    assert stats["passed_to_llm"] == 2 and stats["llm_calls_saved"] == 0
+
+
+def test_declining_handler_falls_through_and_is_counted():
+    router = IntentRouter()
+
+    @router.intent("yes", patterns=[r"yes"])
+    def maybe(session_id, message):
+        return "ok" if session_id == "offered" else None
+
+    assert router.route("other", "Yes.") is None
+    routed = router.route("offered", "yes")
+    assert (routed.intent, routed.reply, routed.method) == ("yes", "ok", "rule")
+    stats = router.stats()
+    assert stats["routed"] == {"yes": 1} and stats["declined"] == {"yes": 1} and stats["llm_calls_saved"] == 1
+
+
+def test_router_embeds_the_raw_message_and_batches_examples_at_warmup():
+    embedded, batches = [], []
+    router = IntentRouter(
+        embed=lambda t: embedded.append(t) or _embed(t),
+        embed_batch=lambda ts: batches.append(ts) or np.vstack([_embed(t) for t in ts]),
+        threshold=0.8,
+    )
+    router.register("off_topic", lambda s, m: "off topic", examples=["weather today", "weather tomorrow"])
+    router.register("course_question", None, examples=["course fees", "course length"])
+
+    router.warm()
+    assert batches == [["weather today", "weather tomorrow", "course fees", "course length"]] and embedded == []
+    # Retrieval encodes the message as sent; the router must ask for the same string to share its cache entry.
+    assert router.match("  weather in Lahore?")[0] == "off_topic"
+    assert embedded == ["  weather in Lahore?"] and len(batches) == 1
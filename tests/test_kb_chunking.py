@@ -0,0 +1,34 @@
+from backend.kb_ingest import chunk_markdown
+
+
+SAMPLE = (
+    "# Data Science\n\n"
+    "Duration: 10 Month\nPrerequisites: Python, statistics basics\n\n"
+    "## Modules\n\n"
+    + "".join(f"- Module number {i} with a description\n" for i in range(40))
+    + "\n## Learning outcomes\n\n- End-to-end data science projects and model deployment.\n"
+)
+
+
+def test_chunks_respect_size_and_offsets():
+    chunks = chunk_markdown(SAMPLE, "data_science.md", max_chars=300)
+    assert len(chunks) > 2
+    for c in chunks:
+        assert c["source"] == "data_science.md"
+        assert len(c["text"]) <= 300
+        assert SAMPLE[c["start"]:c["end"]] == c["text"]
+
+
+def test_chunks_carry_heading_trail():
+    chunks = chunk_markdown(SAMPLE, "data_science.md", max_chars=300)
+    headings = [c["heading"] for c in chunks]
+    assert headings[0] == "Data Science"
+    assert "Data Science > Modules" in headings
+    assert headings[-1] == "Data Science > Learning outcomes"
+
+
+def test_small_file_is_single_chunk():
+    text = "# Agentic AI\n\nDuration: 7 Month\nModules:\n- Agents foundations\n"
+    chunks = chunk_markdown(text, "agentic_ai.md")
+    assert len(chunks) == 1
+    assert chunks[0]["start"] == 0
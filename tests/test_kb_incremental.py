@@ -0,0 +1,257 @@
+import os
+import pickle
+
+import numpy as np
+import pytest
+
+from backend import kb_ingest
+
+
+@pytest.fixture
+def kb(kb_env):
+    kb_dir, _ = kb_env
+    (kb_dir / "a.md").write_text("# A\n\nDuration: 3 Month\nModules:\n- Alpha basics\n")
+    (kb_dir / "b.md").write_text("# B\n\nDuration: 5 Month\nModules:\n- Beta basics\n")
+    return kb_env
+
+
+def test_second_ingest_encodes_nothing(kb):
+    _, encoder = kb
+    first = kb_ingest.ingest_kb()
+    assert sorted(first["added"]) == ["a.md", "b.md"]
+    encoded = encoder.encoded
+
+    second = kb_ingest.ingest_kb()
+    assert second["encoded_chunks"] == 0
+    assert sorted(second["unchanged"]) == ["a.md", "b.md"]
+    assert encoder.encoded == encoded
+
+
+def test_only_changed_and_added_files_are_encoded(kb):
+    kb_dir, encoder = kb
+    kb_ingest.ingest_kb()
+    before = np.array(kb_ingest.get_snapshot().embeddings)
+
+    (kb_dir / "b.md").write_text("# B\n\nDuration: 6 Month\nModules:\n- Beta advanced\n")
+    os.utime(kb_dir / "b.md", (1, 1))
+    (kb_dir / "c.md").write_text("# C\n\nDuration: 1 Month\n")
+    (kb_dir / "a.md").unlink()
+
+    encoder.encoded = 0
+    report = kb_ingest.ingest_kb()
+    assert report["changed"] == ["b.md"]
+    assert report["added"] == ["c.md"]
+    assert report["removed"] == ["a.md"]
+    assert encoder.encoded == report["encoded_chunks"] == 2
+    snap = kb_ingest.get_snapshot()
+    assert [m["source"] for m in snap.metadata] == ["b.md", "c.md"]
+    assert not np.allclose(snap.embeddings[0], before[1])
+
+
+def test_touched_but_identical_file_is_not_reencoded(kb):
+    kb_dir, encoder = kb
+    kb_ingest.ingest_kb()
+    os.utime(kb_dir / "a.md", (1, 1))
+
+    encoder.encoded = 0
+    report = kb_ingest.ingest_kb()
+    assert report["encoded_chunks"] == 0
+    assert encoder.encoded == 0
+
+
+def test_store_loads_as_memory_map(kb):
+    kb_ingest.ingest_kb()
+    docs, embs, metas, built_at, _ = kb_ingest._read_stored_kb()
+    assert isinstance(embs, np.memmap)
+    assert len(docs) == len(metas) == embs.shape[0]
+    assert metas[0]["source"] == "a.md"
+
+
+def test_int8_scan_copy_is_stored_and_memory_mapped(kb, monkeypatch):
+    monkeypatch.setattr(kb_ingest, "INDEX_QUANT", "int8")
+    kb_ingest.ingest_kb()
+    expected = kb_ingest.get_relevant_chunks("beta basics", top_k=1, mode="dense")
+
+    snap = kb_ingest.load_kb()
+    assert snap.index.name == "quantized"
+    assert isinstance(snap.index.codes, np.memmap) and snap.index.codes.dtype == np.int8
+    assert kb_ingest.get_relevant_chunks("beta basics", top_k=1, mode="dense") == expected
+
+    monkeypatch.setattr(kb_ingest, "INDEX_QUANT", "none")
+    kb_ingest.ingest_kb(full=True)
+    assert not any(".int8." in name for name in os.listdir(kb_ingest.KB_STORE_DIR))
+
+
+def test_legacy_pickle_is_migrated_once(kb, tmp_path):
+    docs = ["# A\nAlpha", "# B\nBeta"]
+    embs = np.eye(2, 64, dtype=np.float32)
+    with open(tmp_path / "kb_vectors.pkl", "wb") as f:
+        pickle.dump((docs, embs), f)
+
+    loaded_docs, loaded_embs, metas, _, generation = kb_ingest._read_stored_kb()
+    assert loaded_docs == docs
+    assert np.array_equal(np.asarray(loaded_embs), embs)
+    assert metas[0]["source"] is None
+    assert not (tmp_path / "kb_vectors.pkl").exists()
+    assert os.path.exists(kb_ingest._matrix_path(generation))
+
+
+def test_repeated_queries_hit_the_embedding_cache(kb):
+    _, encoder = kb
+    kb_ingest.ingest_kb()
+    kb_ingest.query_cache.clear()
+    kb_ingest.query_cache.hits = kb_ingest.query_cache.misses = 0
+
+    encoder.encoded = 0
+    first = kb_ingest.get_relevant_chunks("Alpha basics", top_k=1)
+    second = kb_ingest.get_relevant_chunks("  alpha   BASICS ", top_k=1)
+    assert first == second
+    assert encoder.encoded == 1
+    assert kb_ingest.query_cache.stats()["hits"] == 1
+
+    kb_ingest.ingest_kb(full=True)
+    assert len(kb_ingest.query_cache) == 0
+
+
+def test_batch_search_encodes_misses_in_one_call(kb):
+    _, encoder = kb
+    kb_ingest.ingest_kb()
+    kb_ingest.query_cache.clear()
+
+    calls = []
+    original = encoder.encode
+    encoder.encode = lambda texts, **kw: calls.append(list(texts)) or original(texts, **kw)
+
+    queries = ["alpha basics", "beta basics", "Alpha basics", "duration"]
+    batch = kb_ingest.get_relevant_chunks_batch(queries, top_k=1)
+    assert len(calls) == 1 and sorted(calls[0]) == ["alpha basics", "beta basics", "duration"]
+    assert [r[0]["source"] for r in batch[:3]] == ["a.md", "b.md", "a.md"]
+    assert batch[0] == kb_ingest.get_relevant_chunks("alpha basics", top_k=1)
+    assert len(calls) == 1
+
+
+def test_lexical_mode_skips_the_encoder(kb):
+    _, encoder = kb
+    kb_ingest.ingest_kb()
+    kb_ingest.query_cache.clear()
+    encoder.encoded = 0
+
+    hits = kb_ingest.get_relevant_chunks("beta", top_k=2, mode="lexical")
+    assert [h["source"] for h in hits] == ["b.md"]
+    assert encoder.encoded == 0
+
+    hybrid = kb_ingest.get_relevant_chunks("beta basics", top_k=2, mode="hybrid")
+    assert hybrid[0]["source"] == "b.md"
+    assert encoder.encoded == 1
+
+
+def test_load_kb_restores_lexical_index(kb):
+    kb_ingest.ingest_kb()
+    built = kb_ingest.get_snapshot().lexical
+    os.remove(kb_ingest._lexical_path(kb_ingest._read_stored_kb()[4]))  # e.g. deleted by hand
+    snap = kb_ingest.load_kb()
+    assert snap is kb_ingest.get_snapshot(load=False)
+    assert snap.lexical is not built
+    assert len(snap.lexical) == len(snap.documents)
+
+
+def test_reload_swaps_snapshot_without_disturbing_readers(kb):
+    kb_dir, _ = kb
+    kb_ingest.ingest_kb()
+    before = kb_ingest.get_snapshot()
+
+    (kb_dir / "c.md").write_text("# C\n\nDuration: 1 Month\nModules:\n- Gamma basics\n")
+    kb_ingest.ingest_kb()
+    after = kb_ingest.get_snapshot()
+
+    assert after is not before
+    assert len(before) == 2 and len(after) == 3
+    assert before.version != after.version
+
+    status = after.status()
+    assert status["documents"] == 3
+    assert status["built_at"]
+    assert status["memory"]["heap_bytes"] > 0
+
+
+def test_get_snapshot_without_load_does_not_touch_disk(kb):
+    assert kb_ingest.get_snapshot(load=False) is None
+
+
+def test_search_endpoints_reject_out_of_range_top_k():
+    from fastapi.testclient import TestClient
+
+    from backend import app as app_module
+
+    client = TestClient(app_module.app)
+    for top_k in (0, -5, 10_000):
+        assert client.post("/kb/search", json={"query": "x", "top_k": top_k}).status_code == 422
+        assert client.post("/kb/search/batch", json={"queries": ["x"], "top_k": top_k}).status_code == 422
+
+
+def test_crash_between_store_and_manifest_forces_a_full_ingest(kb, monkeypatch):
+    kb_dir, encoder = kb
+    kb_ingest.ingest_kb()
+    (kb_dir / "a.md").write_text("# A\n\nDuration: 3 Month\nModules:\n- Alpha basics\n- Alpha advanced\n\nMore alpha.\n\n" + "alpha " * 200)
+    os.utime(kb_dir / "a.md", (1, 1))
+
+    def crash(manifest):
+        raise OSError("killed before the manifest was written")
+
+    with monkeypatch.context() as m:
+        m.setattr(kb_ingest, "_write_manifest", crash)
+        with pytest.raises(OSError):
+            kb_ingest.ingest_kb()
+
+    # The old manifest's row ranges no longer describe the store; b.md must not get a.md's rows.
+    report = kb_ingest.ingest_kb()
+    assert sorted(report["added"]) == ["a.md", "b.md"]
+    snap = kb_ingest.get_snapshot()
+    assert all("Beta" in d for d, m in zip(snap.documents, snap.metadata) if m["source"] == "b.md")
+
+
+def test_store_from_another_encoder_is_reingested_on_load(kb, monkeypatch):
+    _, encoder = kb
+    kb_ingest.ingest_kb()
+    monkeypatch.setattr(kb_ingest, "EMBEDDING_MODEL_ID", kb_ingest.EMBEDDING_MODEL_ID + ":int8")
+    monkeypatch.setattr(kb_ingest, "_snapshot", None)
+    encoded = encoder.encoded
+
+    snap = kb_ingest.load_kb()  # e.g. a restart after switching KB_ENCODER_BACKEND
+    assert snap is not None and len(snap) == 2
+    assert encoder.encoded > encoded
+    assert kb_ingest._read_stored_kb() is not None
+    assert kb_ingest.ingest_kb()["encoded_chunks"] == 0
+
+
+def test_crash_while_writing_the_store_keeps_the_previous_generation(kb, monkeypatch):
+    kb_dir, _ = kb
+    monkeypatch.setattr(kb_ingest, "INDEX_QUANT", "int8")
+    kb_ingest.ingest_kb()
+    documents, embeddings, _, _, generation = kb_ingest._read_stored_kb()
+    embeddings = np.array(embeddings)
+
+    # Same chunk count, so a row-count check alone could not tell the new files from the old ones.
+    (kb_dir / "b.md").write_text("# B\n\nDuration: 5 Month\nModules:\n- Gamma basics\n")
+    os.utime(kb_dir / "b.md", (1, 1))
+    write = kb_ingest._atomic_write
+
+    def crash_before_sidecar(path, fn):
+        if path.endswith("documents.json"):
+            raise OSError("killed before the sidecar was written")
+        write(path, fn)
+
+    with monkeypatch.context() as m:
+        m.setattr(kb_ingest, "_atomic_write", crash_before_sidecar)
+        with pytest.raises(OSError):
+            kb_ingest.ingest_kb()
+
+    snap = kb_ingest.load_kb()
+    assert list(snap.documents) == documents and np.array_equal(np.asarray(snap.embeddings), embeddings)
+    assert np.array_equal(np.asarray(snap.index.codes), np.load(kb_ingest._quant_paths(generation)[0]))
+    assert kb_ingest.get_relevant_chunks("beta basics", top_k=1, mode="lexical")[0]["source"] == "b.md"
+
+    kb_ingest.ingest_kb()
+    current = kb_ingest._read_stored_kb()[4]
+    data_files = [n for n in os.listdir(kb_ingest.KB_STORE_DIR) if n.startswith(("embeddings.", "lexical."))]
+    assert current != generation and all(f".{current}." in n for n in data_files)
@@ -0,0 +1,38 @@
+import numpy as np
+
+from backend.lexical_index import BM25Index, reciprocal_rank_fusion, tokenize
+
+
+DOCS = [
+    "Data Science: Python, Numpy, Pandas. Price 49.99",
+    "Agentic AI: agents, MCP servers, OpenAI SDK. Course code AG-201",
+    "Generative AI: LLMs, diffusion models, prompt engineering",
+]
+
+
+def test_tokenize_keeps_codes_and_prices():
+    assert tokenize("What is AG-201 and does it cost 49.99?") == ["ag-201", "cost", "49.99"]
+
+
+def test_bm25_ranks_exact_term_matches_first():
+    index = BM25Index.build(DOCS)
+    scores, idx = index.search(["ag-201", "pandas numpy", "kubernetes"], 2)
+    assert idx[0][0] == 1
+    assert idx[1][0] == 0
+    assert list(idx[2]) == [-1, -1]
+    assert scores[0][0] > 0
+
+
+def test_bm25_round_trips_through_npz(tmp_path):
+    index = BM25Index.build(DOCS)
+    path = tmp_path / "lexical.npz"
+    with open(path, "wb") as f:
+        index.save(f)
+    loaded = BM25Index.load(str(path))
+    assert np.allclose(loaded.score("mcp servers"), index.score("mcp servers"))
+
+
+def test_rrf_rewards_agreement():
+    fused = reciprocal_rank_fusion([[3, 1, 2], [1, 4, -1]])
+    assert fused[0][0] == 1
+    assert {doc for doc, _ in fused} == {1, 2, 3, 4}
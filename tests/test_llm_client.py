@@ -0,0 +1,151 @@
+import asyncio
+import time
+
+import pytest
+
+from backend.llm_client import CircuitBreaker, GeminiClient, LLMError
+
+
+class StubResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class StubModel:
+    """Local stand-in for genai.GenerativeModel with scripted failures and latency."""
+
+    def __init__(self, failures=(), latency=0.0):
+        self.failures = list(failures)
+        self.latency = latency
+        self.calls = 0
+        self.active = 0
+        self.max_active = 0
+
+    async def generate_content_async(self, prompt, stream=False, request_options=None):
+        self.calls += 1
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(self.latency)
+            if self.failures:
+                raise self.failures.pop(0)
+        finally:
+            self.active -= 1
+        if stream:
+            return _stream(["Hello ", "there"])
+        return StubResponse("ok: " + prompt.split("User Question: ")[1].strip())
+
+
+async def _stream(pieces):
+    for p in pieces:
+        yield StubResponse(p)
+
+
+def _client(model, **kwargs):
+    kwargs.setdefault("backoff_base", 0.001)
+    return GeminiClient(model_factory=lambda: model, **kwargs)
+
+
+def test_retries_retryable_errors_then_succeeds():
+    model = StubModel(failures=[ConnectionError("reset"), ConnectionError("reset")])
+    client = _client(model, max_retries=2)
+    assert asyncio.run(client.generate("hi", "ctx")) == "ok: hi"
+    assert model.calls == 3
+
+
+def test_non_retryable_error_is_not_retried():
+    model = StubModel(failures=[ValueError("bad request")])
+    client = _client(model, max_retries=3)
+    with pytest.raises(LLMError) as exc:
+        asyncio.run(client.generate("hi", "ctx"))
+    assert exc.value.code == "upstream_error" and model.calls == 1
+
+
+def test_deadline_bounds_slow_calls():
+    client = _client(StubModel(latency=1.0), timeout=0.1, max_retries=5)
+    t0 = time.perf_counter()
+    with pytest.raises(LLMError) as exc:
+        asyncio.run(client.generate("hi", "ctx"))
+    assert exc.value.code == "timeout"
+    assert time.perf_counter() - t0 < 0.5
+
+
+def test_breaker_opens_and_fails_fast_then_recovers():
+    model = StubModel(failures=[ConnectionError()] * 2)
+    client = _client(model, max_retries=0, breaker=CircuitBreaker(threshold=2, reset_timeout=0.05))
+    for _ in range(2):
+        with pytest.raises(LLMError):
+            asyncio.run(client.generate("hi", "ctx"))
+    with pytest.raises(LLMError) as exc:
+        asyncio.run(client.generate("hi", "ctx"))
+    assert exc.value.code == "circuit_open" and model.calls == 2
+
+    time.sleep(0.06)
+    assert asyncio.run(client.generate("hi", "ctx")) == "ok: hi"
+    assert client.breaker.state == "closed"
+
+
+def test_max_in_flight_is_enforced():
+    model = StubModel(latency=0.05)
+    client = _client(model, max_in_flight=2)
+
+    async def many():
+        return await asyncio.gather(*[client.generate(f"q{i}", "ctx") for i in range(6)])
+
+    assert len(asyncio.run(many())) == 6
+    assert model.max_active == 2
+
+
+def test_stream_yields_pieces():
+    client = _client(StubModel())
+
+    async def collect():
+        return [p async for p in client.stream("hi", "ctx")]
+
+    assert asyncio.run(collect()) == ["Hello ", "there"]
+
+
+def test_cancelled_half_open_trial_does_not_wedge_the_breaker():
+    model = StubModel(failures=[ConnectionError()] * 2)
+    client = _client(model, max_retries=0, breaker=CircuitBreaker(threshold=2, reset_timeout=0.05))
+    for _ in range(2):
+        with pytest.raises(LLMError):
+            asyncio.run(client.generate("hi", "ctx"))
+    time.sleep(0.06)
+
+    async def cancelled_trial():
+        model.latency = 1.0
+        task = asyncio.ensure_future(client.generate("hi", "ctx"))
+        await asyncio.sleep(0.02)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancelled_trial())
+    assert client.breaker.state == "half_open" and not client.breaker._trial_in_flight
+
+    async def abandoned_stream():
+        model.latency = 0.0
+        pieces = client.stream("hi", "ctx")
+        assert await pieces.__anext__() == "Hello "
+        await pieces.aclose()  # client disconnected mid-answer
+
+    asyncio.run(abandoned_stream())
+    assert not client.breaker._trial_in_flight
+    assert asyncio.run(client.generate("hi", "ctx")) == "ok: hi"
+    assert client.breaker.state == "closed"
+
+
+def test_local_overload_does_not_open_the_breaker():
+    model = StubModel()
+    client = _client(model, max_in_flight=1, timeout=0.05, max_retries=0, breaker=CircuitBreaker(threshold=1))
+
+    async def queued_out():
+        await client._semaphore().acquire()  # every slot taken by calls still in flight
+        with pytest.raises(LLMError) as exc:
+            await client.generate("queued", "ctx")
+        assert exc.value.code == "overloaded"
+
+    asyncio.run(queued_out())
+    assert model.calls == 0
+    assert client.breaker.state == "closed" and client.breaker.failures == 0
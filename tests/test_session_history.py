@@ -0,0 +1,102 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.orm import sessionmaker
+
+from backend.db import ChatHistory, init_db
+from backend.session_cache import SessionHistoryCache, recent_turns_query
+
+
+@pytest.fixture
+def engine(tmp_path):
+    return create_engine(f"sqlite:///{tmp_path / 'history.db'}", connect_args={"check_same_thread": False})
+
+
+def _plan(engine, query):
+    sql = str(query.statement.compile(engine, compile_kwargs={"literal_binds": True}))
+    with engine.connect() as conn:
+        return " | ".join(row[-1] for row in conn.execute(text("EXPLAIN QUERY PLAN " + sql)))
+
+
+def test_init_db_adds_missing_indexes_to_an_existing_database(engine):
+    # Schema as created before the created_at / (session_id, created_at) indexes existed.
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE chat_history (id INTEGER PRIMARY KEY, session_id VARCHAR(100), "
+            "user_message TEXT, bot_reply TEXT, created_at DATETIME)"
+        ))
+        conn.execute(text("CREATE INDEX ix_chat_history_session_id ON chat_history (session_id)"))
+        conn.execute(text("INSERT INTO chat_history (session_id, user_message) VALUES ('s', 'kept')"))
+
+    init_db(engine)
+    init_db(engine)  # idempotent
+
+    names = {ix["name"] for ix in inspect(engine).get_indexes("chat_history")}
+    assert {"ix_chat_history_session_created", "ix_chat_history_created_at"} <= names
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT user_message FROM chat_history")).scalar() == "kept"
+
+
+def test_history_queries_use_indexes(engine):
+    init_db(engine)
+    db = sessionmaker(bind=engine)()
+    try:
+        session_plan = _plan(engine, recent_turns_query(db, "s", 20))
+        top5_plan = _plan(engine, db.query(ChatHistory).order_by(ChatHistory.created_at.desc()).limit(5))
+    finally:
+        db.close()
+    assert "ix_chat_history_session_created" in session_plan
+    assert "ix_chat_history_created_at" in top5_plan
+    # No sort step: rows come off the index already in order.
+    assert "TEMP B-TREE" not in session_plan and "TEMP B-TREE" not in top5_plan
+
+
+class CountingLoader:
+    def __init__(self, turns=()):
+        self.turns = list(turns)
+        self.calls = 0
+
+    def __call__(self, session_id, limit):
+        self.calls += 1
+        return [t for t in self.turns if t["session"] == session_id][-limit:]
+
+
+def _turn(session, msg, minutes):
+    return {"session": session, "user_message": msg, "bot_reply": "r", "created_at": datetime(2024, 1, 1) + timedelta(minutes=minutes)}
+
+
+def test_ring_buffer_serves_repeat_lookups_from_memory():
+    loader = CountingLoader([_turn("s", "from db", 0)])
+    cache = SessionHistoryCache(loader, max_turns=3)
+    assert cache.last_user_message("s") == "from db"
+    cache.record("s", "new question", "answer", datetime(2024, 1, 2))
+    assert cache.last_user_message("s") == "new question"
+    assert loader.calls == 1
+
+    for i in range(5):
+        cache.record("s", f"q{i}", "a", datetime(2024, 1, 3) + timedelta(minutes=i))
+    assert [t["user_message"] for t in cache.recent("s")] == ["q2", "q3", "q4"]
+    assert cache.stats()["hits"] == 2
+
+
+def test_ring_buffer_reloads_after_ttl_and_invalidate():
+    loader = CountingLoader([_turn("s", "first", 0)])
+    cache = SessionHistoryCache(loader, ttl=0)
+    cache.recent("s")
+    cache.recent("s")
+    assert loader.calls == 2
+
+    cache = SessionHistoryCache(loader)
+    cache.recent("s")
+    loader.turns.append(_turn("s", "uploaded", 1))
+    cache.invalidate("s")
+    assert cache.last_user_message("s") == "uploaded"
+    assert loader.calls == 4
+
+
+def test_lru_eviction_bounds_sessions():
+    cache = SessionHistoryCache(CountingLoader(), max_sessions=2)
+    for sid in ("a", "b", "c"):
+        cache.record(sid, "q", "a", datetime(2024, 1, 1))
+    assert cache.stats()["sessions"] == 2
@@ -0,0 +1,78 @@
+import numpy as np
+
+from backend.vector_index import ExactIndex, IVFIndex, QuantizedIndex, build_index, normalize_rows, quantize_rows
+
+
+def _corpus(n=2000, dim=32, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(20, dim))
+    rows = centers[rng.integers(20, size=n)] + 0.3 * rng.normal(size=(n, dim))
+    queries = centers[rng.integers(20, size=50)] + 0.3 * rng.normal(size=(50, dim))
+    return rows.astype(np.float32), queries.astype(np.float32)
+
+
+def test_exact_index_matches_brute_force_cosine():
+    rows, queries = _corpus()
+    scores, idx = ExactIndex(rows).search(queries, 5)
+    sims = normalize_rows(queries) @ normalize_rows(rows).T
+    expected = np.argsort(-sims, axis=1)[:, :5]
+    assert np.array_equal(idx, expected)
+    assert np.all(np.diff(scores, axis=1) <= 0)
+
+
+def test_exact_index_clamps_k_to_corpus_size():
+    rows, queries = _corpus(n=3)
+    scores, idx = ExactIndex(rows).search(queries[0], 10)
+    assert idx.shape == (1, 3)
+
+
+def test_ivf_recall_against_exact():
+    rows, queries = _corpus()
+    truth = ExactIndex(rows).search(queries, 10)[1]
+    ivf = IVFIndex(rows, nprobe=4)
+    found = ivf.search(queries, 10)[1]
+    recall = np.mean([len(set(f) & set(t)) / 10 for f, t in zip(found, truth)])
+    assert recall >= 0.9
+    # Probing every list is exhaustive.
+    assert np.array_equal(ivf.search(queries, 10, nprobe=ivf.nlist)[1], truth)
+
+
+def test_build_index_selects_backend():
+    rows, _ = _corpus(n=100)
+    assert build_index(rows, "exact").name == "exact"
+    assert build_index(rows, "ivf").name == "ivf"
+    assert build_index(rows, "auto").name == "exact"
+    assert build_index(rows, "exact", quant="int8").name == "quantized"
+
+
+def test_quantized_index_rescoring_matches_exact():
+    rows, queries = _corpus()
+    truth_scores, truth = ExactIndex(rows).search(queries, 10)
+    for mode in ("float16", "int8"):
+        index = QuantizedIndex(rows, mode)
+        scores, found = index.search(queries, 10)
+        recall = np.mean([len(set(f) & set(t)) / 10 for f, t in zip(found, truth)])
+        assert recall >= 0.98
+        # Returned scores come from the float32 rows, not the codes.
+        hits = found == truth
+        assert np.allclose(scores[hits], truth_scores[hits], atol=1e-6)
+
+
+def test_int8_codes_are_a_quarter_of_the_matrix():
+    rows, _ = _corpus()
+    codes, scales = quantize_rows(normalize_rows(rows), "int8")
+    assert codes.dtype == np.int8 and codes.nbytes * 4 == normalize_rows(rows).nbytes
+    assert np.allclose(codes * scales[:, None], normalize_rows(rows), atol=scales.max())
+
+
+def test_float16_store_is_searched_in_place(tmp_path):
+    rows, queries = _corpus()
+    np.save(tmp_path / "emb.npy", normalize_rows(rows).astype(np.float16))
+    stored = np.load(tmp_path / "emb.npy", mmap_mode="r")
+
+    index = ExactIndex(stored, batch=300)
+    assert isinstance(index.matrix, np.memmap) and index.matrix.dtype == np.float16
+    assert isinstance(QuantizedIndex(stored, mode="int8").matrix, np.memmap)
+    found = index.search(queries, 10)[1]
+    truth = ExactIndex(rows).search(queries, 10)[1]
+    assert np.mean([len(set(f) & set(t)) / 10 for f, t in zip(found, truth)]) >= 0.98